@@ -21,7 +21,18 @@ def find(timeout=1.5):
             ctrl_url=ri.ctrl_url,
             model_name=ri.model_name,
             friendly_name=ri.friendly_name,
-            unit_desc_url=ri.unit_desc_url
+            unit_desc_url=ri.unit_desc_url,
+            location=ri.location
         )
         for ri in ssdp.discover(timeout=timeout)
     ]
+
+
+def gather(*futures, **kwargs):
+    """Wait for futures returned by RXV.submit(), returns their results.
+
+    Takes the timeout keyword argument of rxv.futures.gather().
+    """
+    from . import futures as _futures
+
+    return _futures.gather(*futures, **kwargs)
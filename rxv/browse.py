@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import logging
+import threading
+from collections import OrderedDict
+
+from .scheduler import CRAWL, priority
+
+logger = logging.getLogger('rxv')
+
+PAGE_SIZE = 8
+
+
+class MenuBrowser(object):
+    """Browse the menu of a NET RADIO or SERVER style input page by page.
+
+    The YNC menu only ever shows one page of 8 lines, and every page
+    costs a Jump_Line PUT plus List_Info GETs until the receiver reports
+    ready. The browser remembers the menu position, serves pages from a
+    bounded LRU cache and reads ahead the next and previous page in a
+    background thread, so scrolling back and forth does not wait on the
+    receiver.
+
+    All menu operations of one browser are serialized. The cache is
+    dropped whenever the browser navigates (select, back, home) or
+    notices that the input changed, see refresh().
+
+    Example:
+        browser = rx.browse()
+        page = browser.page()
+        page = browser.next_page()
+        browser.select(3)
+    """
+
+    def __init__(self, rxv, cache_size=32, prefetch=True):
+        self._rxv = rxv
+        self._cache_size = cache_size
+        self._prefetch_enabled = prefetch
+        self._pages = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # serializes all menu operations on the receiver
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._prefetcher = None
+        # first lines of the pages to read ahead next, see _start_prefetch()
+        self._pending = None
+        self._prefetching = False
+        self._input = rxv.input
+        self.src_name = rxv._menu_src_name(self._input)
+        self._rxv._wait_for_menu_ready(self.src_name)
+        status = self._rxv.menu_status(self.src_name)
+        self.layer = status.layer
+        self.name = status.name
+        self.max_line = status.max_line
+        self.first_line = page_start(status.current_line)
+
+    def _key(self, first_line):
+        return (self.layer, self.name, first_line)
+
+    def _cached(self, first_line):
+        with self._cache_lock:
+            key = self._key(first_line)
+            status = self._pages.get(key)
+            if status is not None:
+                self._pages[key] = self._pages.pop(key)
+            return status
+
+    def _store(self, generation, first_line, status):
+        with self._cache_lock:
+            if generation != self._generation:
+                # navigated away while this page was being read
+                return
+            self._pages[self._key(first_line)] = status
+            while len(self._pages) > self._cache_size:
+                self._pages.popitem(last=False)
+
+    def _fetch(self, first_line):
+        """Jump to first_line and read the page once the menu is ready."""
+        rxv = self._rxv
+        with self._lock:
+            with self._cache_lock:
+                generation = self._generation
+            rxv.menu_jump_line(first_line, self.src_name)
+            result = []
+
+            def page_ready():
+                status = rxv.menu_status(self.src_name)
+                result[:] = [status]
+                return status.ready and status.current_line == first_line
+
+            rxv._wait_for(page_ready)
+            status = result[0]
+            self.max_line = status.max_line
+            self._store(generation, first_line, status)
+            return status
+
+    def _prefetch(self):
+        with priority(CRAWL):
+            while True:
+                with self._cache_lock:
+                    first_lines, self._pending = self._pending, None
+                    if first_lines is None:
+                        self._prefetching = False
+                        return
+                for first_line in first_lines:
+                    if self._cached(first_line) is None:
+                        try:
+                            self._fetch(first_line)
+                        except Exception:
+                            logger.debug("Prefetching menu line %s failed", first_line,
+                                         exc_info=True)
+                            break
+
+    def _start_prefetch(self):
+        if not self._prefetch_enabled:
+            return
+        neighbours = [self.first_line + PAGE_SIZE, self.first_line - PAGE_SIZE]
+        neighbours = [line for line in neighbours if 1 <= line <= self.max_line]
+        with self._cache_lock:
+            # a running prefetcher picks up the latest request when done
+            self._pending = neighbours
+            if self._prefetching:
+                return
+            self._prefetching = True
+            self._prefetcher = threading.Thread(target=self._prefetch)
+            self._prefetcher.daemon = True
+            self._prefetcher.start()
+
+    def page(self, first_line=None):
+        """Return the MenuStatus of the page starting at first_line.
+
+        Defaults to the current page. Any line number is rounded down
+        to the start of its page.
+        """
+        if first_line is not None:
+            self.first_line = page_start(first_line)
+        status = self._cached(self.first_line)
+        if status is None:
+            with self._lock:
+                # the prefetcher may have read the page meanwhile
+                status = self._cached(self.first_line) or self._fetch(self.first_line)
+        self._start_prefetch()
+        return status
+
+    def next_page(self):
+        if self.first_line + PAGE_SIZE <= self.max_line:
+            self.first_line += PAGE_SIZE
+        return self.page()
+
+    def previous_page(self):
+        if self.first_line > PAGE_SIZE:
+            self.first_line -= PAGE_SIZE
+        return self.page()
+
+    def _navigated(self):
+        """Forget all pages and pick up the new menu position."""
+        rxv = self._rxv
+        with self._lock:
+            self.invalidate()
+            rxv._wait_for_menu_ready(self.src_name)
+            status = rxv.menu_status(self.src_name)
+            self.layer = status.layer
+            self.name = status.name
+            self.max_line = status.max_line
+            self.first_line = page_start(status.current_line)
+
+    def select(self, lineno):
+        """Select the absolute line number lineno, e.g. to enter a container."""
+        with self._lock:
+            self._rxv.menu_jump_line(lineno, self.src_name)
+            self._rxv._wait_for_menu_status(
+                lambda status: status.ready and status.current_line == lineno,
+                self.src_name)
+            self._rxv._menu_cursor("Sel", self.src_name)
+            self._navigated()
+        return self.page()
+
+    def back(self):
+        with self._lock:
+            self._rxv._menu_cursor("Return", self.src_name)
+            self._navigated()
+        return self.page()
+
+    def home(self):
+        with self._lock:
+            self._rxv._menu_cursor("Return to Home", self.src_name)
+            self._navigated()
+        return self.page()
+
+    def invalidate(self):
+        """Drop all cached pages."""
+        with self._cache_lock:
+            self._generation += 1
+            self._pages.clear()
+
+    def refresh(self):
+        """Re-read the current input and invalidate if it changed.
+
+        Returns True if the cache was dropped.
+        """
+        cur_input = self._rxv.input
+        if cur_input == self._input:
+            return False
+        with self._lock:
+            self._input = cur_input
+            self.src_name = self._rxv._menu_src_name(cur_input)
+            self._navigated()
+        return True
+
+
+def page_start(lineno):
+    """First line of the page that contains lineno."""
+    return (lineno - 1) // PAGE_SIZE * PAGE_SIZE + 1
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Capabilities of receiver models, as far as RXV needs them.
+
+Everything RXV reads from a receiver's desc.xml is extracted into a
+small Capabilities tuple. For the models in capabilities.json, which
+ships with the package, no desc.xml has to be downloaded and parsed at
+all. The database is generated from desc.xml files with:
+
+    $ python -m rxv.capabilities tests/samples/*-desc.xml
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import io
+import json
+import os
+import threading
+from collections import namedtuple
+
+from defusedxml import ElementTree as cElementTree
+
+DATABASE = os.path.join(os.path.dirname(__file__), 'capabilities.json')
+FORMAT_NAME = 'rxv-capabilities'
+FORMAT_VERSION = 1
+
+STRAIGHT = "Straight"
+DIRECT = "Direct"
+
+Capabilities = namedtuple("Capabilities", "model commands zones surround_programs play_methods")
+
+_bundled = None
+_bundled_lock = threading.Lock()
+
+
+def from_desc_xml(desc):
+    """Extract the Capabilities from a parsed desc.xml.
+
+    commands holds the Cmd_List definitions in document order, e.g.
+    "Main_Zone,Volume,Lvl"; surround_programs and play_methods map zone
+    and source names to the programs and Play_Control methods they
+    offer, surround_programs being False for zones without any.
+    """
+    commands = [item.text for cmd_list in desc.findall('.//Cmd_List') for item in cmd_list]
+    zones = [e.get("YNC_Tag") for e in desc.findall('.//*[@Func="Subunit"]')]
+
+    play_methods = {}
+    for source_xml in desc.iter():
+        source = source_xml.get("YNC_Tag")
+        # like find(), only the first element of a tag counts
+        if source is None or source in play_methods:
+            continue
+        play_control = source_xml.find('.//*[@Func="Play_Control"]')
+        play_methods[source] = [] if play_control is None else [
+            put.text for put in play_control.findall('.//Put_1')]
+
+    return Capabilities(
+        model=desc.get("Unit_Name"),
+        commands=commands,
+        zones=zones,
+        surround_programs=dict((zone, _surround_programs(desc, zone)) for zone in zones),
+        play_methods=dict((source, methods) for source, methods in play_methods.items()
+                          if methods),
+    )
+
+
+def _surround_programs(desc, zone):
+    source_xml = desc.find('.//*[@YNC_Tag="%s"]' % zone)
+    if source_xml is None:
+        return False
+
+    setup = source_xml.find('.//Menu[@Title_1="Setup"]')
+    if setup is None:
+        return False
+
+    programs = setup.find('.//*[@Title_1="Program"]/Put_2/Param_1')
+    if programs is None:
+        return False
+
+    surround_programs = [s.text for s in programs.findall('.//Direct')]
+
+    straight = setup.find('.//*[@Title_1="Straight"]/Put_1')
+    if straight is not None:
+        surround_programs.append(STRAIGHT)
+
+    direct = setup.find('.//*[@Title_1="Direct"]/Put_1')
+    if direct is not None:
+        surround_programs.append(DIRECT)
+
+    return surround_programs
+
+
+def bundled(model_name):
+    """Capabilities of model_name from the bundled database, or None."""
+    global _bundled
+    if _bundled is None:
+        with _bundled_lock:
+            if _bundled is None:
+                _bundled = load(DATABASE)
+    return _bundled.get(model_name)
+
+
+def load(filename):
+    """Read a capabilities database into a dict of model name to Capabilities."""
+    with io.open(filename, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('format') != FORMAT_NAME or data.get('version') != FORMAT_VERSION:
+        raise ValueError("Unsupported capabilities database {} version {}".format(
+            data.get('format'), data.get('version')))
+    return dict((model, Capabilities(model=model, **fields))
+                for model, fields in data['models'].items())
+
+
+def save(filename, models):
+    data = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'models': dict((caps.model, dict((field, value) for field, value in caps._asdict().items()
+                                         if field != 'model'))
+                       for caps in models),
+    }
+    with io.open(filename, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, sort_keys=True, separators=(',', ':')))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the capabilities database")
+    parser.add_argument('desc_xml', nargs='+', help='desc.xml files of receivers')
+    parser.add_argument('--output', default=DATABASE)
+    args = parser.parse_args(argv)
+
+    models = []
+    for filename in args.desc_xml:
+        with open(filename, 'rb') as f:
+            models.append(from_desc_xml(cElementTree.fromstring(f.read())))
+    save(args.output, models)
+    print("Wrote {} models to {}".format(len(models), args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import logging
+import threading
+from collections import OrderedDict
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .scheduler import CRAWL, priority
+
+logger = logging.getLogger('rxv')
+
+SERVER = "SERVER"
+
+
+def _line_number(current_line, display_lineno):
+    """Converts the displayed line name (Line_3) into the total line number"""
+    return current_line + int(display_lineno[5:]) - 1
+
+
+def _layer_slots(rxv, path_to_layer):
+    """
+    List one menu layer and split it into ordered result slots.
+
+    Every container becomes a slot of its own that still has to be
+    crawled; the items and unplayable items of a page are already
+    final. The order of the slots matches the order of
+    RXV.server_paths().
+
+    :return: list(either ('crawl', path_to_container) or ('done', entries))
+    """
+    slots = []
+    for current_line, current_list in rxv._menu_pages(path_to_layer):
+        for lineno, name in current_list.containers.items():
+            lineno = _line_number(current_line, lineno)
+            slots.append(('crawl', path_to_layer + [(lineno, name)]))
+        entries = []
+        for group in (current_list.items, current_list.unplayables):
+            entries.extend((name, _line_number(current_line, lineno))
+                           for lineno, name in group.items())
+        if entries and path_to_layer:
+            slots.append(('done', _prefixed(path_to_layer, entries)))
+        elif entries:
+            slots.append(('done', entries))
+    return slots
+
+
+def _prefixed(path_to_layer, entries):
+    """Prefix entries found below path_to_layer with the path itself."""
+    names = ">".join(name for _, name in path_to_layer)
+    indices = ">".join(str(lineno) for lineno, _ in path_to_layer)
+    return [("{}>{}".format(names, name), "{}>{}".format(indices, index))
+            for name, index in entries]
+
+
+def crawl_server_paths(receivers, servers=None):
+    """
+    Collect all SERVER paths using several receivers in parallel.
+
+    The YNC menu is stateful, so a single receiver has to walk the menu
+    tree one step at a time. Receivers that see the same media servers
+    can split the work though: the first receiver lists the media
+    servers and their top level folders, then every folder is crawled
+    by whichever receiver is idle next. Each receiver is only ever used
+    by one worker thread, so its menu operations stay serialized.
+
+    Without a servers filter the result is the same list that
+    RXV.server_paths() returns for a single receiver.
+
+    :param receivers: list(RXV), receivers that all see the same media servers
+    :param servers: optional list of media server names to restrict the crawl to
+    :return: list(pair(name_path, index_path))
+    """
+    # several controllers for one device would fight over its menu
+    receivers = list(OrderedDict((r.ctrl_url, r) for r in receivers).values())
+    if not receivers:
+        return []
+
+    lead = receivers[0]
+    slots = []
+    with priority(CRAWL):
+        for rxv in receivers:
+            rxv.input = SERVER
+
+        for kind, value in _layer_slots(lead, []):
+            if kind == 'done':
+                slots.append((kind, value))
+            elif servers is None or value[-1][1] in servers:
+                slots.extend(_layer_slots(lead, value))
+
+    results = [entries if kind == 'done' else None for kind, entries in slots]
+    work = queue.Queue()
+    for i, (kind, path_to_layer) in enumerate(slots):
+        if kind == 'crawl':
+            work.put((i, path_to_layer))
+
+    errors = []
+
+    def worker(rxv):
+        with priority(CRAWL):
+            while not errors:
+                try:
+                    i, path_to_layer = work.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    results[i] = _prefixed(path_to_layer, rxv._iter_menu(path_to_layer))
+                except Exception as e:
+                    logger.exception("Crawling %s on %s failed", path_to_layer, rxv)
+                    errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(rxv,)) for rxv in receivers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    paths = []
+    for entries in results:
+        paths.extend(entries)
+    return paths
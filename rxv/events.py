@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""UPnP GENA event subscriptions.
+
+Receivers advertise UPnP services (AVTransport, RenderingControl, ...)
+that push state changes to subscribers, which makes polling
+basic_status/play_status unnecessary for most changes:
+
+    >>> subscriber = EventSubscriber().start()
+    >>> subscriber.subscribe_device(location, print)
+
+location is the device description url from the SSDP LOCATION header.
+"""
+from __future__ import absolute_import, division, print_function
+
+import logging
+import re
+import socket
+import threading
+import uuid
+import xml
+from collections import namedtuple
+
+import requests
+from defusedxml import ElementTree as cElementTree
+
+from . import ssdp
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+logger = logging.getLogger('rxv')
+
+Event = namedtuple("Event", "service_id seq properties")
+
+PROPERTY_QUERY = '{urn:schemas-upnp-org:event-1-0}property'
+TIMEOUT_RE = re.compile(r'Second-(\d+)', re.IGNORECASE)
+# seconds between attempts to subscribe again after a renewal failed
+RETRY_INTERVAL = 30
+
+
+def parse_propertyset(body):
+    """Turn a NOTIFY body into a dict of changed state variables.
+
+    AVTransport and RenderingControl report their changes in a single
+    LastChange variable holding another XML document; its values are
+    merged into the result as well.
+    """
+    properties = {}
+    doc = cElementTree.XML(body)
+    for prop in doc.iterfind(PROPERTY_QUERY):
+        for var in prop:
+            properties[var.tag] = var.text
+            if var.tag == 'LastChange' and var.text:
+                properties.update(_parse_last_change(var.text))
+    return properties
+
+
+def _parse_last_change(text):
+    try:
+        doc = cElementTree.XML(text)
+    except xml.etree.ElementTree.ParseError:
+        logger.warning("Invalid LastChange: %s", text)
+        return {}
+    changes = {}
+    for instance in doc:
+        for var in instance:
+            # strip the namespace of the service
+            changes[var.tag.split('}')[-1]] = var.get('val')
+    return changes
+
+
+class EventSubscriber(object):
+    """Receives GENA events on a local callback HTTP server.
+
+    Subscriptions are renewed automatically before they time out. If a
+    renewal fails the service is subscribed again from scratch, every
+    RETRY_INTERVAL seconds until that succeeds.
+
+    :param callback_host: address the receiver can reach us on, found
+                          out from the routing table if not given
+    :param timeout: requested subscription timeout in seconds
+    """
+
+    def __init__(self, host='', port=0, callback_host=None, timeout=300):
+        self.timeout = timeout
+        self._callback_host = callback_host
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        # sid -> _Subscription
+        self._subscriptions = {}
+        # callback path -> _Subscription, known before the SID is
+        self._paths = {}
+        self._server = _ThreadingHTTPServer((host, port), _NotifyHandler)
+        self._server.subscriber = self
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Cancel all subscriptions and stop the callback server."""
+        self._stopped = True
+        for sid in list(self._subscriptions):
+            try:
+                self.unsubscribe(sid)
+            except requests.RequestException:
+                logger.warning("Failed to unsubscribe %s", sid, exc_info=True)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _callback_url(self, event_sub_url, path):
+        host = self._callback_host
+        if host is None:
+            # the interface we would use to talk to the receiver
+            target = urlparse(event_sub_url)
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.connect((target.hostname, target.port or 80))
+                host = sock.getsockname()[0]
+            finally:
+                sock.close()
+        return 'http://{}:{}{}'.format(host, self._server.server_address[1], path)
+
+    def subscribe(self, event_sub_url, callback, service_id=None):
+        """Subscribe to one service, callback(Event) is called on every NOTIFY.
+
+        Returns the subscription id.
+        """
+        path = '/' + uuid.uuid4().hex
+        subscription = _Subscription(event_sub_url, service_id, callback, path)
+        # the initial NOTIFY may arrive before the SUBSCRIBE response
+        with self._lock:
+            self._paths[path] = subscription
+        try:
+            res = self._session.request('SUBSCRIBE', event_sub_url, headers={
+                'CALLBACK': '<{}>'.format(self._callback_url(event_sub_url, path)),
+                'NT': 'upnp:event',
+                'TIMEOUT': 'Second-{}'.format(self.timeout),
+            })
+            res.raise_for_status()
+        except Exception:
+            with self._lock:
+                self._paths.pop(path, None)
+            raise
+        subscription.sid = res.headers['SID']
+        with self._lock:
+            self._subscriptions[subscription.sid] = subscription
+        self._schedule_renewal(subscription, res.headers.get('TIMEOUT'))
+        return subscription.sid
+
+    def subscribe_device(self, location, callback):
+        """Subscribe to all evented services of the device at location.
+
+        Returns the list of subscription ids.
+        """
+        return [self.subscribe(service.event_sub_url, callback, service.service_id)
+                for service in ssdp.upnp_services(location)
+                if service.event_sub_url]
+
+    def renew(self, sid):
+        with self._lock:
+            subscription = self._subscriptions.get(sid)
+        if subscription is None:
+            return
+        try:
+            res = self._session.request('SUBSCRIBE', subscription.event_sub_url, headers={
+                'SID': sid,
+                'TIMEOUT': 'Second-{}'.format(self.timeout),
+            })
+            res.raise_for_status()
+        except Exception:
+            # runs in a Timer thread, nothing would see the exception
+            logger.warning("Renewing %s failed, subscribing again", sid, exc_info=True)
+            with self._lock:
+                self._subscriptions.pop(sid, None)
+                self._paths.pop(subscription.path, None)
+            self._resubscribe(subscription)
+            return
+        self._schedule_renewal(subscription, res.headers.get('TIMEOUT'))
+
+    def _resubscribe(self, subscription):
+        if self._stopped:
+            return
+        try:
+            self.subscribe(subscription.event_sub_url, subscription.callback,
+                           subscription.service_id)
+        except Exception:
+            logger.exception("Subscribing to %s failed, retrying in %s seconds",
+                             subscription.event_sub_url, RETRY_INTERVAL)
+            subscription.timer = threading.Timer(RETRY_INTERVAL, self._resubscribe,
+                                                 (subscription,))
+            subscription.timer.daemon = True
+            subscription.timer.start()
+
+    def unsubscribe(self, sid):
+        with self._lock:
+            subscription = self._subscriptions.pop(sid, None)
+            if subscription is not None:
+                self._paths.pop(subscription.path, None)
+        if subscription is None:
+            return
+        if subscription.timer is not None:
+            subscription.timer.cancel()
+        self._session.request('UNSUBSCRIBE', subscription.event_sub_url,
+                              headers={'SID': sid})
+
+    def _schedule_renewal(self, subscription, timeout_header):
+        timeout = self.timeout
+        match = TIMEOUT_RE.search(timeout_header or '')
+        if match:
+            timeout = int(match.group(1))
+        if subscription.timer is not None:
+            subscription.timer.cancel()
+        # renew well before the receiver drops us
+        subscription.timer = threading.Timer(timeout * 0.8, self.renew, (subscription.sid,))
+        subscription.timer.daemon = True
+        subscription.timer.start()
+
+    def _notify(self, path, sid, seq, body):
+        with self._lock:
+            subscription = self._paths.get(path)
+        if subscription is None or subscription.sid not in (None, sid):
+            return False
+        try:
+            properties = parse_propertyset(body)
+        except xml.etree.ElementTree.ParseError:
+            logger.warning("Invalid NOTIFY body for %s: %s", sid, body)
+            return True
+        try:
+            subscription.callback(Event(subscription.service_id, seq, properties))
+        except Exception:
+            logger.exception("Event callback for %s failed", sid)
+        return True
+
+
+class _Subscription(object):
+
+    def __init__(self, event_sub_url, service_id, callback, path):
+        self.event_sub_url = event_sub_url
+        self.service_id = service_id
+        self.callback = callback
+        self.path = path
+        self.sid = None
+        self.timer = None
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _NotifyHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        logger.debug("GENA: " + format, *args)
+
+    def do_NOTIFY(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        seq = self.headers.get('SEQ')
+        known = self.server.subscriber._notify(
+            self.path, self.headers.get('SID'), int(seq) if seq else None, body)
+        self.send_response(200 if known else 412)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
@@ -9,7 +9,10 @@ class RXVException(Exception):
 
 class ResponseException(RXVException):
     """Exception raised when yamaha receiver responded with an error code"""
-    pass
+    def __init__(self, message, rc=None):
+        super(ResponseException, self).__init__(message)
+        # the RC attribute of the response, as a string
+        self.rc = rc
 
 
 ReponseException = ResponseException
@@ -34,3 +37,9 @@ class UnknownPort(RXVException):
     """Raised when an unknown port is found."""
     def __init__(self, port):
         super().__init__('port {} is not supported'.format(port))
+
+
+class TraceMismatch(RXVException):
+    """Raised when a replayed request is not part of the trace."""
+    def __init__(self, method, url, data):
+        super().__init__('{} {} not in trace: {!r}'.format(method, url, data))
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Run RXV operations in the background and get futures back.
+
+Every receiver gets a worker thread of its own that runs the operations
+submitted for it one after the other, in the order they were submitted,
+while the workers of different receivers run in parallel. This lets
+plain blocking code read several receivers at once:
+
+    >>> volumes = rxv.gather(*[rx.submit('volume') for rx in rxv.find()])
+
+An operation is the name of a property, read without arguments and
+set with one, the name of a method, or a callable taking the RXV:
+
+    >>> rx.submit('volume', -40)
+    >>> rx.submit('net_radio', 'Bookmarks>Radio Paradise')
+    >>> rx.submit(lambda rx: (rx.on, rx.input))
+
+Futures are concurrent.futures.Future objects. Python 2 lacks that
+module and gets a small stand-in with the same methods instead.
+"""
+from __future__ import absolute_import, division, print_function
+
+import logging
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+from .scheduler import current_priority, priority
+
+logger = logging.getLogger('rxv')
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+_PENDING = 'pending'
+_RUNNING = 'running'
+_CANCELLED = 'cancelled'
+_FINISHED = 'finished'
+
+
+class _TimeoutError(Exception):
+    """An operation did not finish in time."""
+
+
+class _CancelledError(Exception):
+    """An operation was cancelled."""
+
+
+class _Future(object):
+    """Stand-in for concurrent.futures.Future on Python 2."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._state = _PENDING
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def cancel(self):
+        with self._lock:
+            if self._state in (_RUNNING, _FINISHED):
+                return False
+            if self._state == _PENDING:
+                self._state = _CANCELLED
+                self._done.set()
+        self._call_callbacks()
+        return True
+
+    def cancelled(self):
+        return self._state == _CANCELLED
+
+    def running(self):
+        return self._state == _RUNNING
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+        return self._result
+
+    def exception(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise _TimeoutError("Operation did not finish in {} seconds".format(timeout))
+        if self._state == _CANCELLED:
+            raise _CancelledError()
+        return self._exception
+
+    def add_done_callback(self, fn):
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def set_running_or_notify_cancel(self):
+        with self._lock:
+            if self._state == _CANCELLED:
+                return False
+            self._state = _RUNNING
+            return True
+
+    def set_result(self, result):
+        self._finish(result, None)
+
+    def set_exception(self, exception):
+        self._finish(None, exception)
+
+    def _finish(self, result, exception):
+        with self._lock:
+            self._result = result
+            self._exception = exception
+            self._state = _FINISHED
+            self._done.set()
+        self._call_callbacks()
+
+    def _call_callbacks(self):
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:
+                logger.exception("Done callback of %r failed", self)
+
+
+def _wait_futures(futures, timeout=None):
+    """concurrent.futures.wait() for _Futures, returns (done, not_done)."""
+    deadline = None if timeout is None else time.time() + timeout
+    for future in futures:
+        remaining = None if deadline is None else max(0, deadline - time.time())
+        if not future._done.wait(remaining):
+            break
+    done = set(future for future in futures if future.done())
+    return done, set(futures) - done
+
+
+try:
+    from concurrent.futures import CancelledError, Future, TimeoutError, wait as _wait_all
+except ImportError:
+    CancelledError, Future, TimeoutError = _CancelledError, _Future, _TimeoutError
+    _wait_all = _wait_futures
+
+
+class _Worker(object):
+    """A thread running the functions queued for it one after the other."""
+
+    def __init__(self, name):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._work, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    def shutdown(self, wait=True):
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def _work(self):
+        while True:
+            work = self._queue.get()
+            if work is None:
+                return
+            future, fn, args = work
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+
+def submit(rx, operation, *args, **kwargs):
+    """Run operation on rx in the worker of its receiver, returns a Future.
+
+    The operation runs at the priority of the submitting thread, see
+    rxv.scheduler.
+    """
+    level = current_priority()
+    # under the lock, so shutdown() cannot stop the worker in between
+    with _workers_lock:
+        worker = _workers.get(rx.ctrl_url)
+        if worker is None:
+            worker = _workers[rx.ctrl_url] = _Worker(
+                'rxv-{}'.format(urlparse(rx.ctrl_url).netloc))
+        return worker.submit(_run, rx, operation, level, args, kwargs)
+
+
+def _run(rx, operation, level, args, kwargs):
+    with priority(level):
+        if callable(operation):
+            return operation(rx, *args, **kwargs)
+        if isinstance(getattr(type(rx), operation, None), property):
+            if kwargs or len(args) > 1:
+                raise TypeError("{} takes one value to set".format(operation))
+            if args:
+                setattr(rx, operation, args[0])
+                return None
+            return getattr(rx, operation)
+        return getattr(rx, operation)(*args, **kwargs)
+
+
+def gather(*futures, **kwargs):
+    """Wait for all futures and return their results in the same order.
+
+    If operations failed, the exception of the first of them in the
+    order given is raised once all have finished, so none is left
+    running.
+
+    :param timeout: seconds to wait for all of them together, raises
+                    TimeoutError when exceeded
+    """
+    timeout = kwargs.pop('timeout', None)
+    if kwargs:
+        raise TypeError("gather() got unexpected keyword arguments: {}".format(
+            ', '.join(sorted(kwargs))))
+    _, not_done = _wait_all(futures, timeout)
+    if not_done:
+        raise TimeoutError("{} of {} operations did not finish".format(
+            len(not_done), len(futures)))
+    return [future.result() for future in futures]
+
+
+def shutdown(wait=True):
+    """Stop the workers of all receivers; new submissions start new ones."""
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        worker.shutdown(wait=wait)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Caching gateway that multiplexes many clients onto one receiver.
+
+The gateway speaks the same /YamahaRemoteControl/ctrl protocol as the
+receiver, so existing clients only need a different ctrl_url:
+
+    $ python -m rxv.gateway http://192.168.1.116/YamahaRemoteControl/ctrl --port 8080
+
+    >>> rx = rxv.RXV("http://localhost:8080/YamahaRemoteControl/ctrl")
+
+GETs are answered from a cache that a background poller keeps fresh,
+PUTs are forwarded to the receiver one at a time, ahead of the poller's
+requests (see rxv.scheduler), and every change seen
+by the poller is pushed to subscribers, either in process through
+Gateway.subscribe() or over HTTP as server-sent events on /events.
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import logging
+import re
+import threading
+import time
+
+import requests
+
+from .scheduler import POLL, priority, scheduler_for
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+logger = logging.getLogger('rxv')
+
+CTRL_PATH = '/YamahaRemoteControl/ctrl'
+DESC_PATH = '/YamahaRemoteControl/desc.xml'
+EVENTS_PATH = '/events'
+
+COMMAND_RE = re.compile(br'<YAMAHA_AV\s+cmd="(\w+)"')
+SUCCESS_RE = re.compile(br'<YAMAHA_AV[^>]*\sRC="0"')
+CTRL_SUFFIX_RE = re.compile('ctrl$')
+
+
+class Gateway(object):
+    """Local HTTP service in front of a single receiver.
+
+    :param ctrl_url: control URL of the real receiver
+    :param poll_interval: seconds between refreshes of each cached GET
+    :param idle_timeout: GETs nobody asked for in this many seconds are
+                         no longer polled
+    """
+
+    def __init__(self, ctrl_url, host='127.0.0.1', port=0,
+                 poll_interval=1.0, idle_timeout=60.0, unit_desc_url=None):
+        self.ctrl_url = ctrl_url
+        self.unit_desc_url = unit_desc_url or CTRL_SUFFIX_RE.sub('desc.xml', ctrl_url)
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self._session = requests.Session()
+        # one request at a time towards the receiver, clients first
+        self._scheduler = scheduler_for(ctrl_url)
+        self._lock = threading.Lock()
+        # request body -> [response body, fetched at, last asked for]
+        self._cache = {}
+        # bumped by every write, see _store()
+        self._generation = 0
+        self._desc_xml = None
+        self._subscribers = []
+        self._stopped = threading.Event()
+        self._poller = None
+        self._server = _ThreadingHTTPServer((host, port), _GatewayHandler)
+        self._server.gateway = self
+        self._server_thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    @property
+    def url(self):
+        return 'http://{}:{}{}'.format(self.address[0], self.address[1], CTRL_PATH)
+
+    def _start_poller(self):
+        self._poller = threading.Thread(target=self._poll_loop)
+        self._poller.daemon = True
+        self._poller.start()
+
+    def start(self):
+        """Serve and poll in background threads."""
+        self._start_poller()
+        self._server_thread = threading.Thread(target=self._server.serve_forever)
+        self._server_thread.daemon = True
+        self._server_thread.start()
+        return self
+
+    def serve_forever(self):
+        self._start_poller()
+        self._server.serve_forever()
+
+    def stop(self):
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def subscribe(self, callback):
+        """Call callback(request_body, response_body) on every change."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers.remove(callback)
+
+    def _notify(self, request_body, response_body):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(request_body, response_body)
+            except Exception:
+                logger.exception("Gateway subscriber %s failed", callback)
+
+    def _upstream(self, body):
+        with self._scheduler.slot():
+            logger.debug("GW: POST | {} | {}".format(self.ctrl_url, body))
+            res = self._session.post(self.ctrl_url, data=body,
+                                     headers={"Content-Type": "text/xml"})
+            return res.status_code, res.content
+
+    def desc_xml(self):
+        if self._desc_xml is None:
+            with self._scheduler.slot():
+                self._desc_xml = self._session.get(self.unit_desc_url).content
+        return self._desc_xml
+
+    def handle(self, body):
+        """Answer one ctrl request body, returns (status, response body)."""
+        match = COMMAND_RE.search(body)
+        if match is None or match.group(1) != b'GET':
+            status, response = self._upstream(body)
+            with self._lock:
+                # refetch everything on next use, but keep polling it
+                self._generation += 1
+                for entry in self._cache.values():
+                    entry[1] = 0
+            return status, response
+
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(body)
+            if entry is not None:
+                entry[2] = now
+                if now - entry[1] < self.poll_interval * 2:
+                    return 200, entry[0]
+
+        with self._lock:
+            generation = self._generation
+        status, response = self._upstream(body)
+        self._store(body, status, response, generation, now)
+        return status, response
+
+    def _store(self, body, status, response, generation, asked_at=None):
+        """Cache a GET response, returns True if it changed.
+
+        Responses to GETs sent before the latest write are dropped.
+        """
+        if status != 200 or not SUCCESS_RE.search(response):
+            return False
+        with self._lock:
+            if generation != self._generation:
+                return False
+            entry = self._cache.get(body)
+            changed = entry is not None and entry[0] != response
+            if entry is None:
+                self._cache[body] = [response, time.time(), asked_at or time.time()]
+            else:
+                entry[0] = response
+                entry[1] = time.time()
+                if asked_at:
+                    entry[2] = asked_at
+        if changed:
+            self._notify(body, response)
+        return changed
+
+    def poll(self):
+        """Refresh every cached GET once."""
+        now = time.time()
+        with self._lock:
+            for body in [b for b, entry in self._cache.items()
+                         if now - entry[2] > self.idle_timeout]:
+                del self._cache[body]
+            bodies = list(self._cache)
+        for body in bodies:
+            with self._lock:
+                generation = self._generation
+            try:
+                status, response = self._upstream(body)
+            except requests.RequestException:
+                logger.warning("Gateway poll of %s failed", self.ctrl_url, exc_info=True)
+                return
+            self._store(body, status, response, generation)
+
+    def _poll_loop(self):
+        with priority(POLL):
+            while not self._stopped.wait(self.poll_interval):
+                self.poll()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug("GW: " + format, *args)
+
+    def _reply(self, status, body, content_type='text/xml'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != CTRL_PATH:
+            return self._reply(404, b'')
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            status, response = self.server.gateway.handle(body)
+        except requests.RequestException:
+            logger.exception("Gateway request failed")
+            return self._reply(502, b'')
+        self._reply(status, response)
+
+    def do_GET(self):
+        gateway = self.server.gateway
+        if self.path == DESC_PATH:
+            return self._reply(200, gateway.desc_xml())
+        if self.path != EVENTS_PATH:
+            return self._reply(404, b'')
+
+        events = queue.Queue()
+
+        def push(request_body, response_body):
+            events.put((request_body, response_body))
+
+        gateway.subscribe(push)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            while not gateway._stopped.is_set():
+                try:
+                    event = events.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                data = json.dumps({'request': event[0].decode('utf-8'),
+                                   'response': event[1].decode('utf-8')})
+                self.wfile.write(('data: ' + data + '\n\n').encode('utf-8'))
+                self.wfile.flush()
+        except (IOError, OSError):
+            # client went away
+            pass
+        finally:
+            gateway.unsubscribe(push)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('ctrl_url', help='control URL of the receiver')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    gateway = Gateway(args.ctrl_url, host=args.host, port=args.port,
+                      poll_interval=args.poll_interval)
+    logger.info("Serving %s at %s", args.ctrl_url, gateway.url)
+    try:
+        gateway.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
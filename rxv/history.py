@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compact history of receiver state, per zone.
+
+Keeping every basic_status and play_status result around as Python
+objects gets expensive quickly when a whole house of receivers is
+polled all day. A History only stores changes, in fixed size ring
+buffers of typed arrays: a timestamp and the volume as numbers, every
+other field as the index of the value in a table of interned strings.
+Attach one to an RXV and everything it reads is recorded:
+
+    >>> history = History(capacity=10000)
+    >>> rx = rxv.RXV(ctrl_url, history=history)
+    >>> rx.start_reconciling()
+    >>> ...
+    >>> history.state_at('Main_Zone', nine_pm).song
+
+History.save() writes it to a gzip compressed file that History.load()
+reads back.
+"""
+from __future__ import absolute_import, division, print_function
+
+import gzip
+import io
+import json
+import math
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+FORMAT_NAME = 'rxv-history'
+FORMAT_VERSION = 1
+
+BASIC_FIELDS = ('on', 'volume', 'mute', 'input')
+PLAY_FIELDS = ('playing', 'artist', 'album', 'song', 'station')
+FIELDS = BASIC_FIELDS + PLAY_FIELDS
+# fields stored as indices into the string table
+INTERNED_FIELDS = tuple(field for field in FIELDS if field != 'volume')
+
+HistoryEntry = namedtuple("HistoryEntry", ("time",) + FIELDS)
+
+_EMPTY = (None,) * len(FIELDS)
+
+
+class History(object):
+    """State changes of the zones of one or more receivers.
+
+    Each zone keeps its last capacity changes; recording a state equal
+    to the previous one of the zone costs nothing. Strings seen once
+    stay in the table after their entries were overwritten, which is
+    bounded by the number of distinct inputs, songs, artists, ...
+    """
+
+    def __init__(self, capacity=4096):
+        assert capacity > 0
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # code 0 is None
+        self._strings = [None]
+        self._codes = {}
+        # zone -> _Ring
+        self._rings = {}
+
+    def record(self, zone, basic_status=None, play_status=None, at=None):
+        """Record the state of zone, returns True if it changed.
+
+        Fields of a status that is not given keep their previous
+        values. at defaults to now; a time older than the last change
+        recorded for the zone, as when reads of several threads finish
+        out of order, is moved up to the time of that change.
+        """
+        with self._lock:
+            if at is None:
+                at = time.time()
+            ring = self._rings.get(zone)
+            if ring is None:
+                ring = self._rings[zone] = _Ring(self.capacity)
+            state = list(ring.last)
+            if basic_status is not None:
+                state[:len(BASIC_FIELDS)] = basic_status
+            if play_status is not None:
+                state[len(BASIC_FIELDS):] = play_status
+            state = tuple(state)
+            if state == ring.last:
+                return False
+            if ring.size:
+                at = max(at, ring.time(ring.size - 1))
+            volume = state[FIELDS.index('volume')]
+            codes = [self._intern(value) for field, value in zip(FIELDS, state)
+                     if field != 'volume']
+            ring.append(at, volume, codes)
+            ring.last = state
+            return True
+
+    def _intern(self, value):
+        if value is None:
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+        return code
+
+    def zones(self):
+        with self._lock:
+            return sorted(self._rings)
+
+    def __len__(self):
+        with self._lock:
+            return sum(ring.size for ring in self._rings.values())
+
+    def state_at(self, zone, when):
+        """The HistoryEntry in effect at time when, or None."""
+        with self._lock:
+            ring = self._rings.get(zone)
+            if ring is None:
+                return None
+            index = ring.bisect(when) - 1
+            if index < 0:
+                return None
+            return self._entry(ring, index)
+
+    def between(self, zone, start=None, end=None):
+        """The HistoryEntries of zone recorded from start until before end."""
+        with self._lock:
+            ring = self._rings.get(zone)
+            if ring is None:
+                return []
+            first = 0 if start is None else ring.bisect(start, left=True)
+            last = ring.size if end is None else ring.bisect(end, left=True)
+            return [self._entry(ring, index) for index in range(first, last)]
+
+    def _entry(self, ring, index):
+        at, volume, codes = ring.get(index)
+        values = iter(self._strings[code] for code in codes)
+        return HistoryEntry(at, *[volume if field == 'volume' else next(values)
+                                  for field in FIELDS])
+
+    def save(self, filename):
+        """Write the history to a gzip compressed file.
+
+        Timestamps are stored as milliseconds since the previous entry of
+        the zone, so the file stays small as well.
+        """
+        with self._lock:
+            zones = {}
+            for zone, ring in self._rings.items():
+                times = [int(round(ring.time(index) * 1000)) for index in range(ring.size)]
+                zones[zone] = {
+                    'start': times[0] if times else 0,
+                    'deltas': [b - a for a, b in zip(times, times[1:])],
+                    'volumes': [ring.get(index)[1] for index in range(ring.size)],
+                    'codes': [code for index in range(ring.size) for code in ring.get(index)[2]],
+                }
+            data = json.dumps({
+                'format': FORMAT_NAME,
+                'version': FORMAT_VERSION,
+                'capacity': self.capacity,
+                'strings': self._strings,
+                'zones': zones,
+            }, separators=(',', ':'))
+        with io.TextIOWrapper(gzip.open(filename, 'wb'), encoding='utf-8') as f:
+            # json.dumps() returns a byte str on Python 2
+            f.write(u'{}\n'.format(data))
+
+    @classmethod
+    def load(cls, filename):
+        """Read a history written by save().
+
+        Raises ValueError if the file is not a supported history.
+        """
+        try:
+            with io.TextIOWrapper(gzip.open(filename, 'rb'), encoding='utf-8') as f:
+                data = json.load(f)
+        except (ValueError, OSError, IOError):
+            raise ValueError("{} is not an rxv history".format(filename))
+        if data.get('format') != FORMAT_NAME or data.get('version') != FORMAT_VERSION:
+            raise ValueError("Unsupported history {} version {}".format(
+                data.get('format'), data.get('version')))
+
+        history = cls(data['capacity'])
+        history._strings = data['strings']
+        history._codes = dict((value, code) for code, value in enumerate(history._strings)
+                              if code)
+        width = len(INTERNED_FIELDS)
+        for zone, columns in data['zones'].items():
+            ring = history._rings[zone] = _Ring(history.capacity)
+            at = columns['start']
+            deltas = [0] + columns['deltas']
+            for index, volume in enumerate(columns['volumes']):
+                at += deltas[index]
+                ring.append(at / 1000, volume, columns['codes'][index * width:(index + 1) * width])
+            if ring.size:
+                ring.last = history._entry(ring, ring.size - 1)[1:]
+        return history
+
+
+class _Ring(object):
+    """Fixed size ring buffer of (time, volume, codes) rows.
+
+    Rows are addressed by their age, 0 being the oldest one still kept.
+    A volume of None is stored as NaN.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.width = len(INTERNED_FIELDS)
+        self.times = array('d', [0.0]) * capacity
+        # volumes come in steps of 0.5 dB, which single precision holds exactly
+        self.volumes = array('f', [0.0]) * capacity
+        self.codes = array('I', [0]) * (capacity * self.width)
+        self.start = 0
+        self.size = 0
+        # last state recorded, as a tuple of FIELDS values
+        self.last = _EMPTY
+
+    def _slot(self, index):
+        return (self.start + index) % self.capacity
+
+    def append(self, at, volume, codes):
+        if self.size < self.capacity:
+            slot = self._slot(self.size)
+            self.size += 1
+        else:
+            # overwrite the oldest row
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.times[slot] = at
+        self.volumes[slot] = float('nan') if volume is None else volume
+        self.codes[slot * self.width:(slot + 1) * self.width] = array('I', codes)
+
+    def time(self, index):
+        return self.times[self._slot(index)]
+
+    def get(self, index):
+        slot = self._slot(index)
+        volume = self.volumes[slot]
+        return (self.times[slot], None if math.isnan(volume) else volume,
+                self.codes[slot * self.width:(slot + 1) * self.width])
+
+    def bisect(self, when, left=False):
+        """Index of the first row later than when, or not earlier if left."""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            at = self.time(middle)
+            if at < when or (not left and at == when):
+                low = middle + 1
+            else:
+                high = middle
+        return low
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import bisect
+import gzip
+import io
+import json
+import time
+
+FORMAT_NAME = 'rxv-server-paths'
+FORMAT_VERSION = 1
+
+
+class ServerPathIndex(object):
+    """Name path to index path lookup for SERVER content.
+
+    Holds the (name_path, index_path) pairs returned by
+    RXV.server_paths() together with the receiver they were crawled on
+    and the time of the crawl. The index can be saved to and loaded
+    from a gzip compressed, versioned file so the slow crawl does not
+    have to be repeated after every restart, and it resolves names for
+    RXV.server_select() without touching the network.
+
+    File format: a JSON header line followed by one
+    "name_path<TAB>index_path" line per entry.
+
+    Example:
+        index = ServerPathIndex.crawl(rx)
+        index.save('server-paths.gz')
+        index = ServerPathIndex.load('server-paths.gz')
+        rx.server_select('Fancy Server>Radio>Stream 17', index=index)
+    """
+
+    def __init__(self, paths=(), receiver=None, crawled_at=None):
+        self.receiver = receiver
+        self.crawled_at = crawled_at
+        self._paths = dict((name_path, str(index_path)) for name_path, index_path in paths)
+        self._names = sorted(self._paths)
+
+    @classmethod
+    def crawl(cls, rxv):
+        """Crawl the SERVER menu of rxv. This may be really slow!"""
+        crawled_at = time.time()
+        return cls(rxv.server_paths(), receiver=rxv.ctrl_url, crawled_at=crawled_at)
+
+    def add(self, name_path, index_path):
+        if name_path not in self._paths:
+            bisect.insort(self._names, name_path)
+        self._paths[name_path] = str(index_path)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, name_path):
+        return name_path in self._paths
+
+    def __iter__(self):
+        for name_path in self._names:
+            yield name_path, self._paths[name_path]
+
+    def servers(self):
+        """Names of all media servers in the index."""
+        return sorted(set(name.split(">", 1)[0] for name in self._names))
+
+    def get(self, name_path):
+        """Index path of name_path as a string, or None."""
+        return self._paths.get(name_path)
+
+    def resolve(self, name_path):
+        """Index path of name_path as a list of line numbers, or None.
+
+        The result can be passed to RXV.server_select() directly.
+        """
+        index_path = self._paths.get(name_path)
+        if index_path is None:
+            return None
+        return [int(lineno) for lineno in index_path.split(">")]
+
+    def prefix(self, prefix):
+        """All entries whose name path starts with prefix, sorted by name."""
+        start = bisect.bisect_left(self._names, prefix)
+        for name_path in self._names[start:]:
+            if not name_path.startswith(prefix):
+                break
+            yield name_path, self._paths[name_path]
+
+    def search(self, text):
+        """All entries whose name path contains text, ignoring case."""
+        text = text.lower()
+        for name_path in self._names:
+            if text in name_path.lower():
+                yield name_path, self._paths[name_path]
+
+    def save(self, filename):
+        header = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'receiver': self.receiver,
+            'crawled_at': self.crawled_at,
+            'entries': len(self._paths),
+        }
+        with io.TextIOWrapper(gzip.open(filename, 'wb'), encoding='utf-8') as f:
+            f.write(u'{}\n'.format(json.dumps(header)))
+            for name_path, index_path in self:
+                f.write(u'{}\t{}\n'.format(name_path, index_path))
+
+    @classmethod
+    def load(cls, filename):
+        header, entries = iter_index_file(filename)
+        return cls(entries, receiver=header.get('receiver'),
+                   crawled_at=header.get('crawled_at'))
+
+
+def iter_index_file(filename):
+    """Read an index file without building a ServerPathIndex.
+
+    Returns the header dict and a generator over the
+    (name_path, index_path) entries, which streams the file so even
+    large libraries can be processed in constant memory.
+
+    Raises ValueError if the file is not a supported index file.
+    """
+    f = io.TextIOWrapper(gzip.open(filename, 'rb'), encoding='utf-8')
+    try:
+        header = json.loads(f.readline())
+    except (ValueError, OSError, IOError):
+        f.close()
+        raise ValueError("{} is not a server path index".format(filename))
+    if header.get('format') != FORMAT_NAME or header.get('version') != FORMAT_VERSION:
+        f.close()
+        raise ValueError("Unsupported server path index {} version {}".format(
+            header.get('format'), header.get('version')))
+
+    def entries():
+        with f:
+            for line in f:
+                name_path, index_path = line.rstrip('\n').rsplit('\t', 1)
+                yield name_path, index_path
+
+    return header, entries()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Learned latencies of receiver state transitions.
+
+Receivers ignore commands for a while after being switched on or to
+another input, and how long differs a lot between models. The profiles
+kept here remember, per model and kind of transition, how long that
+took in the past, so RXV.wait_until_ready() can sleep through most of
+it instead of polling all the time:
+
+    >>> profiles = LatencyProfiles('~/.cache/rxv-latency.json')
+    >>> rx.on = True
+    >>> rx.wait_until_ready(profiles=profiles)
+
+With a filename the profiles are loaded from and saved to that file.
+"""
+from __future__ import absolute_import, division, print_function
+
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger('rxv')
+
+FORMAT_NAME = 'rxv-latency'
+FORMAT_VERSION = 1
+
+POWER_ON = 'power_on'
+INPUT = 'input'
+
+# weight of a new observation in the running average
+SMOOTHING = 0.3
+
+# seconds after which a transition is over whether it was waited for or
+# not; longer latencies are learned as this
+MAX_LATENCY = 60.0
+
+
+class LatencyProfiles(object):
+    """Exponentially weighted average latency per (model, transition)."""
+
+    def __init__(self, filename=None):
+        self.filename = filename and os.path.expanduser(filename)
+        self._lock = threading.Lock()
+        # model -> transition -> {'mean': seconds, 'count': observations}
+        self._profiles = {}
+        if self.filename and os.path.exists(self.filename):
+            self._profiles = self._load(self.filename)
+
+    @staticmethod
+    def _load(filename):
+        try:
+            with open(filename) as f:
+                data = json.load(f)
+        except (ValueError, IOError, OSError):
+            logger.warning("Ignoring unreadable latency profiles %s", filename, exc_info=True)
+            return {}
+        if data.get('format') != FORMAT_NAME or data.get('version') != FORMAT_VERSION:
+            logger.warning("Ignoring latency profiles %s of format %s version %s",
+                           filename, data.get('format'), data.get('version'))
+            return {}
+        return data.get('profiles', {})
+
+    def save(self, filename=None):
+        filename = filename or self.filename
+        with self._lock:
+            data = json.dumps({
+                'format': FORMAT_NAME,
+                'version': FORMAT_VERSION,
+                'profiles': self._profiles,
+            }, indent=1, sort_keys=True)
+        # never leave a half written file behind
+        tmp = filename + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(data)
+        try:
+            os.replace(tmp, filename)
+        except AttributeError:
+            # Python 2 has no os.replace, and its rename does not
+            # overwrite on Windows
+            if os.path.exists(filename):
+                os.remove(filename)
+            os.rename(tmp, filename)
+
+    def expected(self, model, transition):
+        """Typical latency in seconds, or None if never observed."""
+        with self._lock:
+            profile = self._profiles.get(model, {}).get(transition)
+        return profile and profile['mean']
+
+    def observe(self, model, transition, latency):
+        """Add one observed latency and save if there is a file."""
+        with self._lock:
+            profile = self._profiles.setdefault(model, {}).get(transition)
+            if profile is None:
+                profile = self._profiles[model][transition] = {'mean': latency, 'count': 0}
+            profile['mean'] += SMOOTHING * (latency - profile['mean'])
+            profile['count'] += 1
+        if self.filename:
+            try:
+                self.save()
+            except (IOError, OSError):
+                logger.warning("Failed to save latency profiles", exc_info=True)
+
+
+# used by RXV.wait_until_ready() unless it is given other profiles
+default_profiles = LatencyProfiles()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Declarative routines of receiver commands.
+
+A Macro is a list of Steps. Each step names the state it needs before
+it can run, and the engine polls exactly that state, quickly at first
+and less often the longer it takes, instead of sleeping a fixed
+pessimistic time:
+
+    >>> macro = Macro([
+    ...     Step('power', assign('on', True)),
+    ...     Step('input', assign('input', 'NET RADIO'), requires=[POWER_ON]),
+    ...     Step('volume', assign('volume', -40), requires=[POWER_ON]),
+    ...     Step('station', call('net_radio', 'Bookmarks>Radio Paradise'),
+    ...          requires=[READY, MENU_READY]),
+    ...     Step('zone 2', assign('on', False), zone='Zone_2'),
+    ... ])
+    >>> for result in macro.run(rx):
+    ...     print(result.name, result.waited, result.elapsed)
+
+Steps of one zone run in the order given; steps of different zones run
+concurrently unless a step lists others in after. Their requests are
+sent at AUTOMATION priority, see rxv.scheduler.
+"""
+from __future__ import absolute_import, division, print_function
+
+import copy
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from .exceptions import RXVException, Timeout
+from .rxv import POLL_INTERVALS
+from .scheduler import AUTOMATION, priority
+
+logger = logging.getLogger('rxv')
+
+Condition = namedtuple("Condition", "name check")
+StepResult = namedtuple("StepResult", "name zone started waited elapsed error")
+
+POWER_ON = Condition('power on', lambda rx: rx.on)
+READY = Condition('ready', lambda rx: rx.is_ready())
+MENU_READY = Condition('menu ready', lambda rx: rx.menu_status().ready)
+
+
+def assign(attribute, value):
+    """Action setting an RXV property, e.g. assign('volume', -40)."""
+    def action(rx):
+        setattr(rx, attribute, value)
+    action.__name__ = 'assign_{}'.format(attribute)
+    return action
+
+
+def call(method, *args, **kwargs):
+    """Action calling an RXV method, e.g. call('net_radio', 'Bookmarks>X')."""
+    def action(rx):
+        return getattr(rx, method)(*args, **kwargs)
+    action.__name__ = 'call_{}'.format(method)
+    return action
+
+
+class MacroError(RXVException):
+    """Raised when a step of a macro failed.
+
+    results holds the StepResult of every step; steps depending on a
+    failed step were not run and carry a MacroError themselves.
+    """
+    def __init__(self, results):
+        failed = [r.name for r in results if r.error is not None]
+        super().__init__('steps failed: {}'.format(', '.join(failed)))
+        self.results = results
+
+
+class Step(object):
+    """One action of a macro.
+
+    :param action: callable taking the RXV controller of the step's zone
+    :param requires: Conditions that have to hold before action runs
+    :param zone: zone to run in, the zone of the RXV passed to run() by
+                 default
+    :param after: names of steps of other zones to wait for
+    :param timeout: seconds to wait for the conditions
+    """
+
+    def __init__(self, name, action, requires=(), zone=None, after=(), timeout=30.0):
+        self.name = name
+        self.action = action
+        self.requires = tuple(requires)
+        self.zone = zone
+        self.after = tuple(after)
+        self.timeout = timeout
+
+    def __repr__(self):
+        return '<Step {}>'.format(self.name)
+
+
+class Macro(object):
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        names = [step.name for step in self.steps]
+        if len(set(names)) != len(names):
+            raise ValueError("Step names must be unique")
+        for step in self.steps:
+            unknown = set(step.after) - set(names)
+            if unknown:
+                raise ValueError("{} runs after unknown steps {}".format(step, sorted(unknown)))
+        # steps without a zone are checked as one zone of their own here,
+        # and again in run() once it is known
+        self._dependencies(None)
+
+    def _dependencies(self, default_zone):
+        """Names of the steps each step has to wait for.
+
+        Raises ValueError if steps wait for each other in a cycle.
+        """
+        last_of_zone = {}
+        dependencies = {}
+        for step in self.steps:
+            zone = step.zone or default_zone
+            dependencies[step.name] = set(step.after)
+            if zone in last_of_zone:
+                dependencies[step.name].add(last_of_zone[zone])
+            last_of_zone[zone] = step.name
+        _check_acyclic(dependencies)
+        return dependencies
+
+    def run(self, rx):
+        """Run all steps, returns their StepResults in the order given.
+
+        Raises MacroError once every step has finished or was skipped
+        if any of them failed.
+        """
+        dependencies = self._dependencies(rx.zone)
+        controllers = {}
+        for step in self.steps:
+            zone = step.zone or rx.zone
+            if zone not in controllers:
+                controller = copy.copy(rx)
+                controller.zone = zone
+                controllers[zone] = controller
+
+        started = time.time()
+        done = dict((step.name, threading.Event()) for step in self.steps)
+        results = {}
+
+        def run_step(step):
+            try:
+                with priority(AUTOMATION):
+                    run_when_ready(step)
+            finally:
+                done[step.name].set()
+
+        def run_when_ready(step):
+            for name in dependencies[step.name]:
+                done[name].wait()
+            failed = [name for name in dependencies[step.name]
+                      if results[name].error is not None]
+            if failed:
+                error = MacroError([results[name] for name in failed])
+                results[step.name] = StepResult(
+                    step.name, step.zone or rx.zone, time.time() - started, 0, 0, error)
+                return
+            results[step.name] = self._run_step(
+                step, controllers[step.zone or rx.zone], started)
+
+        threads = [threading.Thread(target=run_step, args=(step,)) for step in self.steps]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ordered = [results[step.name] for step in self.steps]
+        if any(result.error is not None for result in ordered):
+            raise MacroError(ordered)
+        return ordered
+
+    @staticmethod
+    def _run_step(step, rx, started):
+        begin = time.time()
+        ready = error = None
+        try:
+            for condition in step.requires:
+                try:
+                    rx._wait_for(lambda: condition.check(rx), step.timeout, POLL_INTERVALS)
+                except Timeout:
+                    raise Timeout("{} not reached".format(condition.name))
+            ready = time.time()
+            step.action(rx)
+        except Exception as e:
+            logger.warning("Macro step %s failed", step.name, exc_info=True)
+            error = e
+        finished = time.time()
+        if ready is None:
+            ready = finished
+        return StepResult(step.name, rx.zone, begin - started,
+                          ready - begin, finished - ready, error)
+
+
+def _check_acyclic(dependencies):
+    """Sort the steps topologically, raises ValueError on a cycle."""
+    waiting = dict((name, set(after)) for name, after in dependencies.items())
+    ready = [name for name, after in waiting.items() if not after]
+    while ready:
+        name = ready.pop()
+        del waiting[name]
+        for other, after in waiting.items():
+            if name in after:
+                after.discard(name)
+                if not after:
+                    ready.append(other)
+    if waiting:
+        raise ValueError("Steps wait for each other in a cycle: {}".format(sorted(waiting)))
+
@@ -5,25 +5,55 @@ from __future__ import absolute_import, division, print_function
 import copy
 import logging
 import re
+import threading
 import time
 import warnings
 import xml
 from collections import namedtuple
 from math import floor
 
-import requests
-from defusedxml import cElementTree
+from defusedxml import ElementTree as cElementTree
 
+from . import capabilities, latency
+from .browse import MenuBrowser, page_start
+from .capabilities import DIRECT, STRAIGHT
+from .scheduler import CRAWL, POLL, iter_at_priority, priority, scheduler_for
+from .tracing import HTTP, NO_SPAN, OPERATION, PARSE, WAIT
+from .transport import RequestsTransport
 from .exceptions import (MenuUnavailable, Timeout, PlaybackUnavailable,
                          ResponseException, UnknownPort)
 
 try:
-    from urllib.parse import urlparse
+    from urllib.parse import urljoin, urlparse
 except ImportError:
-    from urlparse import urlparse
+    from urlparse import urljoin, urlparse
+
+try:
+    # python 3.x
+    from html import unescape
+except ImportError:
+    # python 2.7
+    from HTMLParser import HTMLParser
+    unescape = HTMLParser().unescape
 
 logger = logging.getLogger('rxv')
 
+IP_ADDRESS_RE = re.compile(r"\d{1,3}\.\d{1,3}\.\d{1,3}.\d{1,3}")
+CTRL_SUFFIX_RE = re.compile('ctrl$')
+PORT_NUMBER_RE = re.compile(r'.*_(\d+)$')
+HDMI_PORT_RE = re.compile(r'hdmi(\d+)')
+# RC codes of requests the firmware does not understand, as opposed to
+# ones it cannot carry out at the moment
+UNSUPPORTED_RC = ('3', '4')
+NET_RADIO = 'NET_RADIO'
+# seconds between two polls of a state being waited for, growing up to
+# the last one
+POLL_INTERVALS = (0.05, 0.1, 0.2, 0.5)
+# how net_radio() waits for each step of the menu
+NET_RADIO_WAIT = {'timeout': 20.0, 'intervals': POLL_INTERVALS}
+COMMAND_RE = re.compile(r'cmd="(\w+)"')
+TAG_RE = re.compile(r'<(\w+)>')
+
 
 class PlaybackSupport:
     """Container for Playback support.
@@ -44,8 +74,13 @@ class PlaybackSupport:
 
 BasicStatus = namedtuple("BasicStatus", "on volume mute input")
 PlayStatus = namedtuple("PlayStatus", "playing artist album song station")
+PlayInfo = namedtuple("PlayInfo", "playing artist album song station "
+                                  "album_art_url band frequency frequency_unit")
 CurrentList = namedtuple("CurrentList", "all containers items unplayables unselectables")
 MenuStatus = namedtuple("MenuStatus", "ready layer name current_line max_line current_list")
+SoundSettings = namedtuple("SoundSettings", "program sound_program straight direct enhancer "
+                                            "bass treble adaptive_drc cinema_dsp_3d "
+                                            "dialogue_lift dialogue_level extra_bass")
 
 GetParam = 'GetParam'
 YamahaCommand = '<YAMAHA_AV cmd="{command}">{payload}</YAMAHA_AV>'
@@ -71,48 +106,311 @@ SelectNetRadioLine = '<NET_RADIO><List_Control><Direct_Sel>Line_{lineno}'\
 
 HdmiOut = '<System><Sound_Video><HDMI><Output><OUT_{port}>{command}</OUT_{port}>'\
           '</Output></HDMI></Sound_Video></System>'
+HdmiOutputs = '<System><Sound_Video><HDMI><Output>{ports}</Output></HDMI></Sound_Video></System>'
+HdmiPort = '<OUT_{port}>{command}</OUT_{port}>'
 AvailableScenes = '<Config>GetParam</Config>'
 Scene = '<Scene><Scene_Sel>{parameter}</Scene_Sel></Scene>'
 SurroundProgram = '<Surround><Program_Sel><Current>{parameter}</Current></Program_Sel></Surround>'
 DirectMode = '<Sound_Video><Direct>{parameter}</Direct></Sound_Video>'
-
-# String constants
-STRAIGHT = "Straight"
-DIRECT = "Direct"
+ToneLevel = '<Val>{val}</Val><Exp>1</Exp><Unit>dB</Unit>'
+# where zones keep their bass and treble, e.g. Zone_2 of the RX-A2060
+# has Sound_Video,Tone,Manual,Bass
+TONE_COMMANDS = (('Sound_Video', 'Tone'), ('Sound_Video', 'Tone', 'Manual'))
+
+# SoundSettings field -> (command in desc.xml below the zone, PUT template)
+SOUND_SETTING_COMMANDS = {
+    'enhancer': (('Surround', 'Program_Sel', 'Current', 'Enhancer'),
+                 '<Surround><Program_Sel><Current><Enhancer>{}</Enhancer>'
+                 '</Current></Program_Sel></Surround>'),
+    'adaptive_drc': (('Sound_Video', 'Adaptive_DRC'),
+                     '<Sound_Video><Adaptive_DRC>{}</Adaptive_DRC></Sound_Video>'),
+    'cinema_dsp_3d': (('Surround', '_3D_Cinema_DSP'),
+                      '<Surround><_3D_Cinema_DSP>{}</_3D_Cinema_DSP></Surround>'),
+    'dialogue_lift': (('Sound_Video', 'Dialogue_Adjust', 'Dialogue_Lift'),
+                      '<Sound_Video><Dialogue_Adjust><Dialogue_Lift>{}</Dialogue_Lift>'
+                      '</Dialogue_Adjust></Sound_Video>'),
+    'dialogue_level': (('Sound_Video', 'Dialogue_Adjust', 'Dialogue_Lvl'),
+                       '<Sound_Video><Dialogue_Adjust><Dialogue_Lvl>{}</Dialogue_Lvl>'
+                       '</Dialogue_Adjust></Sound_Video>'),
+    'extra_bass': (('Sound_Video', 'Extra_Bass'),
+                   '<Sound_Video><Extra_Bass>{}</Extra_Bass></Sound_Video>'),
+}
 
 # PlayStatus options
 ARTIST_OPTIONS = ["Artist", "Program_Type"]
 ALBUM_OPTIONS = ["Album", "Radio_Text_A"]
 SONG_OPTIONS = ["Song", "Track", "Radio_Text_B"]
 STATION_OPTIONS = ["Station", "Program_Service"]
+PLAY_INFO_TAGS = frozenset(
+    ["Playback_Info"] + ARTIST_OPTIONS + ALBUM_OPTIONS + SONG_OPTIONS + STATION_OPTIONS
+)
+
+
+def _first_text(found, names):
+    """Return the first non-empty text of names, like RXV.safe_get."""
+    for name in names:
+        text = found.get(name)
+        if text is not None:
+            return text
+    return ""
+
+
+def decode_play_info(src_name, doc):
+    """Decode a Play_Info response into a PlayInfo.
+
+    All metadata tags are collected in a single pass over the tree
+    instead of one descendant search per option name. Album art is
+    returned as the URL path reported by the receiver; band and
+    frequency are only filled in for the Tuner.
+    """
+    found = {}
+    for elt in doc.iter():
+        if elt.tag in PLAY_INFO_TAGS and elt.tag not in found:
+            # Tuner and Net Radio sometimes respond with escaped entities
+            found[elt.tag] = None if elt.text is None else unescape(elt.text).strip()
+
+    playing = found.get("Playback_Info") == "Play" or src_name == "Tuner"
+
+    album_art_url = doc.find(".//Album_ART/URL")
+    if album_art_url is not None:
+        album_art_url = album_art_url.text or None
+
+    band = frequency = frequency_unit = None
+    tuning = doc.find(".//Tuning")
+    if tuning is not None:
+        band = tuning.findtext("Band")
+        current = tuning.find("Freq/Current")
+        if current is not None and current.findtext("Val") and current.findtext("Exp"):
+            frequency = int(current.findtext("Val")) / 10.0 ** int(current.findtext("Exp"))
+            frequency_unit = current.findtext("Unit")
+
+    return PlayInfo(
+        playing,
+        artist=_first_text(found, ARTIST_OPTIONS),
+        album=_first_text(found, ALBUM_OPTIONS),
+        song=_first_text(found, SONG_OPTIONS),
+        station=_first_text(found, STATION_OPTIONS),
+        album_art_url=album_art_url,
+        band=band,
+        frequency=frequency,
+        frequency_unit=frequency_unit,
+    )
+
+
+def decode_basic_status(zone_xml):
+    """Decode the zone element of a Basic_Status response into a BasicStatus."""
+    on = zone_xml.find("Basic_Status/Power_Control/Power").text
+    inp = zone_xml.find("Basic_Status/Input/Input_Sel").text
+    mute = zone_xml.find("Basic_Status/Volume/Mute").text
+    volume = zone_xml.find("Basic_Status/Volume/Lvl/Val").text
+    volume = int(volume) / 10.0
+    return BasicStatus(on, volume, mute, inp)
+
+
+def _on_off(text):
+    return None if text is None else text == "On"
+
+
+def _int_or_none(text):
+    return None if text is None else int(text)
+
+
+def _level(elt):
+    if elt is None or elt.findtext("Val") is None:
+        return None
+    return int(elt.findtext("Val")) / 10.0 ** int(elt.findtext("Exp") or 1)
+
+
+def decode_sound_settings(zone_xml):
+    """Decode the zone element of a Basic_Status response into SoundSettings.
+
+    Settings the model does not report are None. program is what
+    RXV.surround_program returns: Direct or Straight if active,
+    otherwise the selected sound program.
+    """
+    status = zone_xml.find("Basic_Status")
+    current = status.find("Surround/Program_Sel/Current")
+    sound_program = straight = enhancer = None
+    if current is not None:
+        sound_program = current.findtext("Sound_Program")
+        straight = _on_off(current.findtext("Straight"))
+        enhancer = _on_off(current.findtext("Enhancer"))
+    direct = _on_off(status.findtext("Sound_Video/Direct/Mode") or
+                     status.findtext("Sound_Video/Pure_Direct/Mode"))
+
+    # see TONE_COMMANDS
+    tone = "Sound_Video/Tone"
+    if status.find("Sound_Video/Tone/Manual") is not None:
+        tone = "Sound_Video/Tone/Manual"
+
+    if direct:
+        program = DIRECT
+    elif straight:
+        program = STRAIGHT
+    else:
+        program = sound_program
+
+    return SoundSettings(
+        program=program,
+        sound_program=sound_program,
+        straight=straight,
+        direct=direct,
+        enhancer=enhancer,
+        bass=_level(status.find(tone + "/Bass")),
+        treble=_level(status.find(tone + "/Treble")),
+        adaptive_drc=status.findtext("Sound_Video/Adaptive_DRC"),
+        cinema_dsp_3d=status.findtext("Surround/_3D_Cinema_DSP"),
+        dialogue_lift=_int_or_none(status.findtext("Sound_Video/Dialogue_Adjust/Dialogue_Lift")),
+        dialogue_level=_int_or_none(status.findtext("Sound_Video/Dialogue_Adjust/Dialogue_Lvl")),
+        extra_bass=status.findtext("Sound_Video/Extra_Bass"),
+    )
+
+
+def _request_label(request_text):
+    """Short description of a request, e.g. "GET Main_Zone,Volume,Lvl"."""
+    path = TAG_RE.findall(request_text.split('</', 1)[0])
+    command = COMMAND_RE.search(request_text)
+    return "{} {}".format(command.group(1) if command else '?', ",".join(path))
+
+
+def _index_tuple(index_path):
+    """Convert an index path like "1>2>17" or [1, 2, 17] into a tuple."""
+    if index_path is None:
+        return ()
+    if isinstance(index_path, str):
+        index_path = index_path.split(">")
+    return tuple(int(x) for x in index_path)
+
+
+class _Flight(object):
+    """A GET request in progress that other threads can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class _SharedGets(object):
+    """GETs in flight and recent responses, shared by all zone controllers.
+
+    Every write bumps the generation, drops the stored responses and
+    stops new GETs from joining flights that started before it; a GET
+    started in an older generation does not store its response.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = 0
+        # request text -> _Flight
+        self.flights = {}
+        # request text -> (time, response)
+        self.responses = {}
+
+
+class _Shadow(object):
+    """Locally mirrored receiver state, shared by all zone controllers.
+
+    Entries are keyed by (zone, name) and hold the time they were last
+    confirmed or set. Any write to the receiver bumps the epoch and
+    drops everything, since e.g. a scene change can touch any value;
+    reads that started before a write do not store their result.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.epoch = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def set(self, key, value, epoch=None):
+        with self._lock:
+            if epoch is None or epoch == self.epoch:
+                self._entries[key] = (time.time(), value)
+
+    def items(self, zone):
+        with self._lock:
+            return dict((key[1], entry[1]) for key, entry in self._entries.items()
+                        if key[0] == zone)
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
 
 
 class RXV(object):
 
     def __init__(self, ctrl_url, model_name="Unknown",
                  zone="Main_Zone", friendly_name='Unknown',
-                 unit_desc_url=None):
-        if re.match(r"\d{1,3}\.\d{1,3}\.\d{1,3}.\d{1,3}", ctrl_url):
+                 unit_desc_url=None, lazy=False, cache_ttl=None,
+                 cache_revalidate=False, response_ttl=0, transport=None,
+                 shadow_ttl=0, history=None, tracer=None, location=None):
+        if IP_ADDRESS_RE.match(ctrl_url):
             # backward compatibility: accept ip address as a contorl url
             warnings.warn("Using IP address as a Control URL is deprecated")
             ctrl_url = 'http://%s/YamahaRemoteControl/ctrl' % ctrl_url
         self.ctrl_url = ctrl_url
-        self.unit_desc_url = unit_desc_url or re.sub('ctrl$', 'desc.xml', ctrl_url)
+        self.unit_desc_url = unit_desc_url or CTRL_SUFFIX_RE.sub('desc.xml', ctrl_url)
         self.model_name = model_name
         self.friendly_name = friendly_name
-        self._inputs_cache = None
-        self._zones_cache = None
+        # UPnP device description url from SSDP, see subscribe_events()
+        self.location = location
         self._zone = zone
-        self._surround_programs_cache = None
-        self._scenes_cache = None
-        self._session = requests.Session()
-        self._discover_features()
+        # metadata cache shared by all zone controllers, see _cached()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._revalidating = set()
+        self.cache_ttl = cache_ttl
+        self.cache_revalidate = cache_revalidate
+        self._transport = transport or RequestsTransport()
+        # serializes and prioritizes requests of all controllers of the receiver
+        self._scheduler = scheduler_for(self.ctrl_url)
+        # shared by all zone controllers, see _shared_get()
+        self._gets = _SharedGets()
+        self.response_ttl = response_ttl
+        # see _shadowed(), disabled with a ttl of 0
+        self._shadow = _Shadow(shadow_ttl)
+        self._reconciler = None
+        # rxv.history.History recording every status read, shared as well
+        self.history = history
+        # rxv.tracing.Tracer timing requests and composite operations
+        self.tracer = tracer
+        # (kind, time) of the last power on or input change, see wait_until_ready()
+        self._transition = None
+        self._desc_xml_cache = None
+        self._desc_lock = threading.Lock()
+        # known models need no desc.xml at all, see _capabilities
+        if not lazy and capabilities.bundled(model_name) is None:
+            self._discover_features()
+
+    @property
+    def _desc_xml(self):
+        """The parsed desc.xml, fetched on first use in lazy mode."""
+        if self._desc_xml_cache is None:
+            with self._desc_lock:
+                if self._desc_xml_cache is None:
+                    self._discover_features()
+        return self._desc_xml_cache
 
     def _discover_features(self):
         """Pull and parse the desc.xml so we can query it later."""
         try:
             logger.debug("REQ: GET | {}".format(self.unit_desc_url))
-            desc_xml = self._session.get(self.unit_desc_url).content
+            desc_xml = self._transport.get(self.unit_desc_url)
             logger.debug("RES: GET | {} | {}".format(self.unit_desc_url, desc_xml))
             if not desc_xml:
                 logger.error(
@@ -120,7 +418,7 @@ class RXV(object):
                         self.unit_desc_url
                     ))
                 return
-            self._desc_xml = cElementTree.fromstring(desc_xml)
+            self._desc_xml_cache = cElementTree.fromstring(desc_xml)
         except xml.etree.ElementTree.ParseError:
             logger.exception("Invalid XML returned for request %s: %s",
                              self.unit_desc_url, desc_xml)
@@ -129,6 +427,59 @@ class RXV(object):
             logger.exception("Failed to fetch %s" % self.unit_desc_url)
             raise
 
+    def _cached(self, name, loader, ttl=None, zone=True):
+        """Return the cached result of loader, calling it if needed.
+
+        Results are cached per zone unless zone is False, including
+        empty ones, so a receiver without scenes is not asked again on
+        every call. Entries older than ttl seconds are reloaded; with
+        cache_revalidate set the stale value is returned right away and
+        reloaded in a background thread instead.
+        """
+        key = (name, self._zone if zone else None)
+        entry = self._cache.get(key)
+        if entry is not None:
+            loaded_at, value = entry
+            if ttl is None or time.time() - loaded_at < ttl:
+                return value
+            if self.cache_revalidate:
+                self._revalidate(key, loader)
+                return value
+
+        value = loader()
+        self._cache[key] = (time.time(), value)
+        return value
+
+    def _revalidate(self, key, loader):
+        with self._cache_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def reload():
+            try:
+                self._cache[key] = (time.time(), loader())
+            except Exception:
+                logger.exception("Failed to revalidate %s", key[0])
+            finally:
+                with self._cache_lock:
+                    self._revalidating.discard(key)
+
+        thread = threading.Thread(target=reload)
+        thread.daemon = True
+        thread.start()
+
+    def refresh(self, *names):
+        """Drop cached metadata so it is fetched again on next use.
+
+        Without arguments everything is dropped, otherwise only the
+        given entries of all zones: 'inputs', 'scenes',
+        'surround_programs', 'zones' or 'net_radio_lines'.
+        """
+        for key in list(self._cache):
+            if not names or key[0] in names:
+                self._cache.pop(key, None)
+
     def __unicode__(self):
         return ('<{cls} model_name="{model}" zone="{zone}" '
                 'ctrl_url="{ctrl_url}" at {addr}>'.format(
@@ -152,40 +503,236 @@ class RXV(object):
             payload = request_text
 
         request_text = YamahaCommand.format(command=command, payload=payload)
+        if command == 'GET':
+            return self._shared_get(request_text)
+
+        gets = self._gets
+        with gets.lock:
+            # anything read before this write may be outdated now
+            gets.generation += 1
+            gets.responses.clear()
+            gets.flights.clear()
+        if self._shadow.ttl:
+            self._shadow.clear()
+        return self._post(request_text)
+
+    def _shared_get(self, request_text):
+        """Send a GET, sharing the response with identical concurrent GETs.
+
+        Threads asking for the same payload while a request is on the
+        wire wait for its response instead of sending their own. With
+        response_ttl set, responses are also reused for that many
+        seconds unless a PUT was sent in the meantime.
+        """
+        gets = self._gets
+        with gets.lock:
+            cached = gets.responses.get(request_text)
+            if cached is not None and time.time() - cached[0] < self.response_ttl:
+                return cached[1]
+            flight = gets.flights.get(request_text)
+            leader = flight is None
+            if leader:
+                flight = gets.flights[request_text] = _Flight()
+                generation = gets.generation
+
+        if not leader:
+            with self._span('shared GET', WAIT):
+                return flight.wait()
+
+        try:
+            flight.response = self._post(request_text)
+            return flight.response
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with gets.lock:
+                if gets.flights.get(request_text) is flight:
+                    del gets.flights[request_text]
+                if (self.response_ttl and flight.error is None
+                        and generation == gets.generation):
+                    gets.responses[request_text] = (time.time(), flight.response)
+            flight.done.set()
+
+    def _post(self, request_text):
         try:
             logger.debug("REQ: POST | {} | {}".format(self.ctrl_url, request_text))
-            res = self._session.post(
-                self.ctrl_url,
-                data=request_text,
-                headers={"Content-Type": "text/xml"}
-            )
-            logger.debug("RES: POST | {} | {}".format(self.ctrl_url, res.content))
-            # releases connection to the pool
-            response = cElementTree.XML(res.content)
+            with self._span('slot', WAIT):
+                self._scheduler.acquire()
+            try:
+                with self._span('POST', HTTP,
+                                request=self.tracer and _request_label(request_text)):
+                    content = self._transport.post(self.ctrl_url, request_text)
+            finally:
+                self._scheduler.release()
+            logger.debug("RES: POST | {} | {}".format(self.ctrl_url, content))
+            with self._span('parse', PARSE):
+                response = cElementTree.XML(content)
             if response.get("RC") != "0":
                 logger.error("Request %s failed with %s",
-                             request_text, res.content)
-                raise ResponseException(res.content)
+                             request_text, content)
+                raise ResponseException(content, response.get("RC"))
             return response
         except xml.etree.ElementTree.ParseError:
             logger.exception("Invalid XML returned for request %s: %s",
-                             request_text, res.content)
+                             request_text, content)
             raise
 
+    def submit(self, operation, *args, **kwargs):
+        """Run operation in the background, returns a Future.
+
+        Operations of one receiver run one at a time in submission
+        order, those of different receivers in parallel; see
+        rxv.futures for what operation can be.
+        """
+        from . import futures
+        return futures.submit(self, operation, *args, **kwargs)
+
+    def _span(self, name, category=OPERATION, **args):
+        """A span of the tracer, if any, see rxv.tracing."""
+        if self.tracer is None:
+            return NO_SPAN
+        return self.tracer.span(name, category, **args)
+
+    def _sleep(self, seconds):
+        with self._span('sleep', WAIT):
+            time.sleep(seconds)
+
     @property
     def basic_status(self):
         response = self._request('GET', BasicStatusGet)
-        on = response.find("%s/Basic_Status/Power_Control/Power" % self.zone).text
-        inp = response.find("%s/Basic_Status/Input/Input_Sel" % self.zone).text
-        mute = response.find("%s/Basic_Status/Volume/Mute" % self.zone).text
-        volume = response.find("%s/Basic_Status/Volume/Lvl/Val" % self.zone).text
-        volume = int(volume) / 10.0
-
-        status = BasicStatus(on, volume, mute, inp)
+        status = decode_basic_status(response.find(self.zone))
+        if self.history is not None:
+            self.history.record(self._zone, basic_status=status)
         return status
 
+    def zones_status(self):
+        """basic_status of all zones, as a dict of zone name to BasicStatus.
+
+        All zones are asked for in a single request. Firmware that
+        rejects requests spanning several zones as unsupported is
+        remembered and asked one zone at a time instead; other errors
+        fall back for this call only. The results also refresh the local
+        mirror (see shadow_ttl), so a poller calling this keeps all zone
+        controllers up to date.
+        """
+        zones = self.zones()
+        epoch = self._shadow.epoch
+        statuses = {}
+        if len(zones) > 1 and self._cached('multi_zone_get', lambda: True, zone=False):
+            request_text = "".join(
+                Zone.format(zone=zone, request_text=BasicStatusGet) for zone in zones)
+            try:
+                response = self._request('GET', request_text, zone_cmd=False)
+            except ResponseException as e:
+                if e.rc in UNSUPPORTED_RC:
+                    logger.info("%s rejects multi-zone requests", self)
+                    self._cache[('multi_zone_get', None)] = (time.time(), False)
+            else:
+                for zone_xml in response:
+                    if zone_xml.tag in zones and zone_xml.find("Basic_Status") is not None:
+                        statuses[zone_xml.tag] = decode_basic_status(zone_xml)
+
+        for zone in zones:
+            if zone not in statuses:
+                request_text = Zone.format(zone=zone, request_text=BasicStatusGet)
+                response = self._request('GET', request_text, zone_cmd=False)
+                statuses[zone] = decode_basic_status(response.find(zone))
+
+        for zone, status in statuses.items():
+            self._mirror_status(zone, status, epoch)
+            if self.history is not None:
+                self.history.record(zone, basic_status=status)
+        return statuses
+
+    def _mirror_status(self, zone, status, epoch):
+        """Store a BasicStatus in the local mirror, returns the values."""
+        values = {
+            'on': status.on == "On",
+            'volume': status.volume,
+            'mute': status.mute == "On",
+            'input': status.input,
+        }
+        if self._shadow.ttl:
+            for name, value in values.items():
+                self._shadow.set((zone, name), value, epoch)
+        return values
+
+    @property
+    def shadow_ttl(self):
+        """Seconds a value set or read is served from the local mirror.
+
+        With a ttl of 0, the default, every read goes to the receiver.
+        Changes made on the front panel or with the IR remote show up
+        once an entry expires or on the next reconcile().
+        """
+        return self._shadow.ttl
+
+    @shadow_ttl.setter
+    def shadow_ttl(self, ttl):
+        self._shadow.ttl = ttl
+        self._shadow.clear()
+
+    def _shadowed(self, name, loader):
+        """Return the mirrored value of name, or load and mirror it."""
+        if not self._shadow.ttl:
+            return loader()
+        key = (self._zone, name)
+        value = self._shadow.get(key)
+        if value is None:
+            epoch = self._shadow.epoch
+            value = loader()
+            self._shadow.set(key, value, epoch)
+        return value
+
+    def _mirror(self, name, value):
+        """Remember a value just written to the receiver."""
+        if self._shadow.ttl:
+            self._shadow.set((self._zone, name), value)
+
+    def reconcile(self):
+        """Check the mirrored state against basic_status and fix drift.
+
+        Returns the names of the mirrored values that were wrong.
+        """
+        epoch = self._shadow.epoch
+        status = self.basic_status
+        mirrored = self._shadow.items(self._zone)
+        actual = self._mirror_status(self._zone, status, epoch)
+        drifted = [name for name, value in actual.items()
+                   if name in mirrored and mirrored[name] != value]
+        if drifted:
+            logger.info("Receiver state changed behind our back: %s", drifted)
+        return drifted
+
+    def start_reconciling(self, interval=5.0):
+        """Call reconcile() every interval seconds in a background thread."""
+        self.stop_reconciling()
+        stopped = threading.Event()
+
+        def loop():
+            while not stopped.wait(interval):
+                try:
+                    with priority(POLL):
+                        self.reconcile()
+                except Exception:
+                    logger.warning("Reconciling %s failed", self, exc_info=True)
+
+        thread = threading.Thread(target=loop)
+        thread.daemon = True
+        thread.start()
+        self._reconciler = stopped
+
+    def stop_reconciling(self):
+        if self._reconciler is not None:
+            self._reconciler.set()
+            self._reconciler = None
+
     @property
     def on(self):
+        return self._shadowed('on', self._load_on)
+
+    def _load_on(self):
         request_text = PowerControl.format(state=GetParam)
         response = self._request('GET', request_text)
         power = response.find("%s/Power_Control/Power" % self._zone).text
@@ -197,7 +744,11 @@ class RXV(object):
         assert state in [True, False]
         new_state = "On" if state else "Standby"
         request_text = PowerControl.format(state=new_state)
+        was_on = self._shadow.get((self._zone, 'on'))
         response = self._request('PUT', request_text)
+        self._mirror('on', state)
+        if state and not was_on:
+            self._transition = (latency.POWER_ON, time.time())
         return response
 
     def get_playback_support(self, input_source=None):
@@ -257,6 +808,9 @@ class RXV(object):
 
     @property
     def input(self):
+        return self._shadowed('input', self._load_input)
+
+    def _load_input(self):
         request_text = Input.format(input_name=GetParam)
         response = self._request('GET', request_text)
         return response.find("%s/Input/Input_Sel" % self.zone).text
@@ -266,51 +820,107 @@ class RXV(object):
         assert input_name in self.inputs()
         request_text = Input.format(input_name=input_name)
         self._request('PUT', request_text)
+        self._mirror('input', input_name)
+        transition = self._recent_transition()
+        if transition is None or transition[0] != latency.POWER_ON:
+            self._transition = (latency.INPUT, time.time())
+
+    def _recent_transition(self):
+        """(kind, time) of the last transition, None if it is long over."""
+        transition = self._transition
+        if transition is not None and time.time() - transition[1] > latency.MAX_LATENCY:
+            self._transition = transition = None
+        return transition
 
     def inputs(self):
-        if not self._inputs_cache:
-            request_text = InputSelItem.format(input_name=GetParam)
-            res = self._request('GET', request_text)
-            self._inputs_cache = dict(zip((elt.text
-                                           for elt in res.iter('Param')),
-                                          (elt.text
-                                           for elt in res.iter("Src_Name"))))
-        return self._inputs_cache
+        return self._cached('inputs', self._load_inputs, self.cache_ttl)
+
+    def _load_inputs(self):
+        request_text = InputSelItem.format(input_name=GetParam)
+        res = self._request('GET', request_text)
+        return dict(zip((elt.text for elt in res.iter('Param')),
+                        (elt.text for elt in res.iter("Src_Name"))))
 
     @property
     def outputs(self):
-        outputs = {}
+        """State of all HDMI outputs, e.g. {'hdmi1': 'on', 'hdmi2': 'off'}.
 
+        All ports are read with a single request; firmware that rejects
+        GetParam for the whole Output element as unsupported is
+        remembered and asked port by port.
+        """
+        ports = self._hdmi_ports()
+        states = {}
+        if len(ports) > 1 and self._cached('combined_output_get', lambda: True, zone=False):
+            try:
+                response = self._request(
+                    'GET', HdmiOutputs.format(ports=GetParam), zone_cmd=False)
+            except ResponseException as e:
+                if e.rc in UNSUPPORTED_RC:
+                    logger.info("%s rejects combined HDMI output requests", self)
+                    self._cache[('combined_output_get', None)] = (time.time(), False)
+            else:
+                output = response.find('System/Sound_Video/HDMI/Output')
+                for port in ports:
+                    state = None if output is None else output.findtext('OUT_' + port)
+                    if state:
+                        states[port] = state
+
+        for port in ports:
+            if port not in states:
+                request = HdmiOut.format(port=port, command=GetParam)
+                response = self._request('GET', request, zone_cmd=False)
+                states[port] = response.find(
+                    'System/Sound_Video/HDMI/Output/OUT_' + port).text
+
+        return dict(('hdmi' + port, state.lower()) for port, state in states.items())
+
+    def _hdmi_ports(self):
+        """Numbers of the HDMI outputs listed in desc.xml, as strings."""
+        return self._cached('hdmi_ports', self._load_hdmi_ports, zone=False)
+
+    def _load_hdmi_ports(self):
+        # An output typically looks like this:
+        #   System,Sound_Video,HDMI,Output,OUT_1
+        ports = []
         for cmd in self._find_commands('System,Sound_Video,HDMI,Output'):
-            # An output typically looks like this:
-            #   System,Sound_Video,HDMI,Output,OUT_1
-            # Extract the index number at the end as it is needed when
-            # requesting its current state.
-            m = re.match(r'.*_(\d+)$', cmd)
-            if m is None:
-                continue
+            m = PORT_NUMBER_RE.match(cmd)
+            if m is not None and m.group(1) not in ports:
+                ports.append(m.group(1))
+        return ports
 
-            port_number = m.group(1)
-            request = HdmiOut.format(port=port_number, command='GetParam')
-            response = self._request('GET', request, zone_cmd=False)
-            port_state = response.find(cmd.replace(',', '/')).text.lower()
-            outputs['hdmi' + str(port_number)] = port_state
+    def enable_output(self, port, enabled):
+        self.enable_outputs({port: enabled})
 
-        return outputs
+    def enable_outputs(self, outputs):
+        """Switch several HDMI outputs at once, e.g. {'hdmi1': True, 'hdmi2': False}.
 
-    def enable_output(self, port, enabled):
-        m = re.match(r'hdmi(\d+)', port.lower())
-        if m is None:
-            raise UnknownPort(port)
+        All ports are switched with a single request, unless the
+        firmware rejected that as unsupported before.
+        """
+        commands = []
+        for port, enabled in sorted(outputs.items()):
+            m = HDMI_PORT_RE.match(port.lower())
+            if m is None:
+                raise UnknownPort(port)
+            commands.append(HdmiPort.format(port=m.group(1), command='On' if enabled else 'Off'))
 
-        request = HdmiOut.format(port=m.group(1),
-                                 command='On' if enabled else 'Off')
-        self._request('PUT', request, zone_cmd=False)
+        if len(commands) > 1 and self._cached('combined_output_put', lambda: True, zone=False):
+            try:
+                self._request('PUT', HdmiOutputs.format(ports=''.join(commands)), zone_cmd=False)
+                return
+            except ResponseException as e:
+                if e.rc in UNSUPPORTED_RC:
+                    logger.info("%s rejects combined HDMI output changes", self)
+                    self._cache[('combined_output_put', None)] = (time.time(), False)
+
+        for command in commands:
+            self._request('PUT', HdmiOutputs.format(ports=command), zone_cmd=False)
 
     def _find_commands(self, cmd_name):
-        for cmd in self._desc_xml.findall('.//Cmd_List/Define'):
-            if cmd.text.startswith(cmd_name):
-                yield cmd.text
+        for cmd in self._capabilities.commands:
+            if cmd.startswith(cmd_name):
+                yield cmd
 
     @property
     def direct_mode(self):
@@ -340,72 +950,112 @@ class RXV(object):
         If a STRAIGHT or DIRECT mode is supported and active, returns that mode.
         Otherwise returns the currently active surround program.
         """
-        request_text = SurroundProgram.format(parameter=GetParam)
-        response = self._request('GET', request_text)
-        straight = response.find(
-            "%s/Surround/Program_Sel/Current/Straight" % self.zone
-        ).text == "On"
-        program = response.find(
-            "%s/Surround/Program_Sel/Current/Sound_Program" % self.zone
-        ).text
-
-        if self.direct_mode:
-            return DIRECT
-        elif straight:
-            return STRAIGHT
-        else:
-            return program
+        return self.sound_settings().program
 
     @surround_program.setter
     def surround_program(self, surround_name):
         assert surround_name in self.surround_programs()
-        if surround_name == DIRECT:
-            self.direct_mode = True
-        else:
-            if self.direct_mode:
-                # Disable direct mode before changing any other settings,
-                # otherwise they don't have an effect
-                self.direct_mode = False
+        self.update_sound_settings(program=surround_name)
 
-            if surround_name == STRAIGHT:
-                parameter = "<Straight>On</Straight>"
-            else:
-                parameter = "<Sound_Program>{parameter}</Sound_Program>".format(
-                    parameter=surround_name
-                )
-            request_text = SurroundProgram.format(parameter=parameter)
-            self._request('PUT', request_text)
+    def sound_settings(self):
+        """Surround program, tone and dialogue settings as SoundSettings.
 
-    def surround_programs(self):
-        if not self._surround_programs_cache:
-            source_xml = self._desc_xml.find(
-                './/*[@YNC_Tag="%s"]' % self._zone
-            )
-            if source_xml is None:
-                return False
+        Everything comes from a single Basic_Status request. Served
+        from the local mirror within shadow_ttl.
+        """
+        return self._shadowed('sound_settings', self._load_sound_settings)
 
-            setup = source_xml.find('.//Menu[@Title_1="Setup"]')
-            if setup is None:
-                return False
+    def _load_sound_settings(self):
+        response = self._request('GET', BasicStatusGet)
+        return decode_sound_settings(response.find(self.zone))
 
-            programs = setup.find('.//*[@Title_1="Program"]/Put_2/Param_1')
-            if programs is None:
-                return False
+    def update_sound_settings(self, **changes):
+        """Change some of the SoundSettings, e.g. program='Straight', bass=-1.5.
 
-            supports = programs.findall('.//Direct')
-            self._surround_programs_cache = list()
-            for s in supports:
-                self._surround_programs_cache.append(s.text)
+        Only settings that differ from the current ones are sent, one
+        PUT each. Direct mode is left first when changing the program,
+        otherwise the other settings have no effect. Returns the new
+        SoundSettings.
+        """
+        unknown = set(changes) - set(SoundSettings._fields)
+        assert not unknown, unknown
+        current = self.sound_settings()
+        puts, settings = self._sound_setting_puts(current, changes)
+        for request_text in puts:
+            self._request('PUT', request_text)
+        self._mirror('sound_settings', settings)
+        return settings
+
+    def _direct_mode_put(self, mode):
+        # newer models call it Pure Direct
+        tag = "Direct"
+        if (not self.supports_method(self._zone, "Sound_Video", "Direct", "Mode") and
+                self.supports_method(self._zone, "Sound_Video", "Pure_Direct", "Mode")):
+            tag = "Pure_Direct"
+        return "<Sound_Video><{0}><Mode>{1}</Mode></{0}></Sound_Video>".format(
+            tag, "On" if mode else "Off")
+
+    def _tone_put(self, tone, value):
+        """PUT setting tone, 'Bass' or 'Treble', to value dB in this zone."""
+        paths = [path + (tone,) for path in TONE_COMMANDS
+                 if self.supports_method(self._zone, *(path + (tone,)))]
+        assert paths, tone
+        return "".join("<{}>".format(tag) for tag in paths[0]) + \
+            ToneLevel.format(val=int(round(value * 10))) + \
+            "".join("</{}>".format(tag) for tag in reversed(paths[0]))
+
+    def _sound_setting_puts(self, current, changes):
+        """Minimal list of PUTs turning current into changes, and the result."""
+        puts = []
+        settings = current
+        program = changes.pop('program', None)
+        for name in ('sound_program', 'straight', 'direct'):
+            assert name not in changes, "use program= to change " + name
+        if program is not None and program != current.program:
+            if program == DIRECT:
+                puts.append(self._direct_mode_put(True))
+                settings = settings._replace(direct=True)
+            else:
+                if current.direct:
+                    puts.append(self._direct_mode_put(False))
+                if program == STRAIGHT:
+                    if not current.straight:
+                        puts.append(SurroundProgram.format(parameter="<Straight>On</Straight>"))
+                    settings = settings._replace(direct=False, straight=True)
+                else:
+                    if current.straight or current.sound_program != program:
+                        puts.append(SurroundProgram.format(
+                            parameter="<Sound_Program>{}</Sound_Program>".format(program)))
+                    settings = settings._replace(direct=False, straight=False,
+                                                 sound_program=program)
+            settings = settings._replace(program=program)
+
+        for tone in ('bass', 'treble'):
+            value = changes.pop(tone, None)
+            if value is not None and value != getattr(current, tone):
+                puts.append(self._tone_put(tone.capitalize(), value))
+                settings = settings._replace(**{tone: value})
+
+        for name, value in sorted(changes.items()):
+            if value is None or value == getattr(current, name):
+                continue
+            command, template = SOUND_SETTING_COMMANDS[name]
+            assert self.supports_method(self._zone, *command), name
+            if isinstance(value, bool):
+                text = "On" if value else "Off"
+            else:
+                text = value
+            puts.append(template.format(text))
+            settings = settings._replace(**{name: value})
 
-            straight = setup.find('.//*[@Title_1="Straight"]/Put_1')
-            if straight is not None:
-                self._surround_programs_cache.append(STRAIGHT)
+        return puts, settings
 
-            direct = setup.find('.//*[@Title_1="Direct"]/Put_1')
-            if direct is not None:
-                self._surround_programs_cache.append(DIRECT)
+    def surround_programs(self):
+        # derived from desc.xml, which does not change
+        return self._cached('surround_programs', self._load_surround_programs)
 
-        return self._surround_programs_cache
+    def _load_surround_programs(self):
+        return self._capabilities.surround_programs.get(self._zone, False)
 
     @property
     def scene(self):
@@ -415,22 +1065,22 @@ class RXV(object):
 
     @scene.setter
     def scene(self, scene_name):
-        assert scene_name in self.scenes()
-        scene_number = self._scenes_cache.get(scene_name)
+        scenes = self.scenes()
+        assert scene_name in scenes
+        scene_number = scenes.get(scene_name)
         request_text = Scene.format(parameter=scene_number)
         self._request('PUT', request_text)
 
     def scenes(self):
-        if not self._scenes_cache:
-            res = self._request('GET', AvailableScenes)
-            scenes = res.find('.//Scene')
-            if scenes is None:
-                return False
+        return self._cached('scenes', self._load_scenes, self.cache_ttl)
+
+    def _load_scenes(self):
+        res = self._request('GET', AvailableScenes)
+        scenes = res.find('.//Scene')
+        if scenes is None:
+            return False
 
-            self._scenes_cache = {}
-            for scene in scenes:
-                self._scenes_cache[scene.text] = scene.tag.replace("_", " ")
-        return self._scenes_cache
+        return dict((scene.text, scene.tag.replace("_", " ")) for scene in scenes)
 
     @property
     def zone(self):
@@ -442,12 +1092,10 @@ class RXV(object):
         self._zone = zone_name
 
     def zones(self):
-        if self._zones_cache is None:
-            xml = self._desc_xml
-            self._zones_cache = [
-                e.get("YNC_Tag") for e in xml.findall('.//*[@Func="Subunit"]')
-            ]
-        return self._zones_cache
+        return self._cached('zones', self._load_zones, zone=False)
+
+    def _load_zones(self):
+        return list(self._capabilities.zones)
 
     def zone_controllers(self):
         """Return separate RXV controller for each available zone."""
@@ -458,38 +1106,28 @@ class RXV(object):
             controllers.append(zone_ctrl)
         return controllers
 
-    def supports_method(self, source, *args):
-        # if there was a complete xpath implementation we could do
-        # this all with xpath, but without it it's lots of
-        # iteration. This is probably not worth optimizing, these
-        # loops are cheep in the long run.
-        commands = self._desc_xml.findall('.//Cmd_List')
-        for c in commands:
-            for item in c:
-                parts = item.text.split(",")
-                if parts[0] == source and parts[1:] == list(args):
-                    return True
-        return False
+    @property
+    def _capabilities(self):
+        """What the model supports, from the bundled database if it is known."""
+        return self._cached('capabilities', self._load_capabilities, zone=False)
 
-    def supports_play_method(self, source, method):
-        # if there was a complete xpath implementation we could do
-        # this all with xpath, but without it it's lots of
-        # iteration. This is probably not worth optimizing, these
-        # loops are cheep in the long run.
-        source_xml = self._desc_xml.find('.//*[@YNC_Tag="%s"]' % source)
-        if source_xml is None:
-            return False
+    def _load_capabilities(self):
+        known = capabilities.bundled(self.model_name)
+        if known is not None:
+            return known
+        return capabilities.from_desc_xml(self._desc_xml)
 
-        play_control = source_xml.find('.//*[@Func="Play_Control"]')
-        if play_control is None:
-            return False
+    @property
+    def _commands(self):
+        """All Cmd_List definitions of desc.xml as a set of tuples."""
+        return self._cached('commands', lambda: frozenset(
+            tuple(cmd.split(",")) for cmd in self._capabilities.commands), zone=False)
 
-        # built in Element Tree does not support search by text()
-        supports = play_control.findall('.//Put_1')
-        for s in supports:
-            if s.text == method:
-                return True
-        return False
+    def supports_method(self, source, *args):
+        return (source,) + args in self._commands
+
+    def supports_play_method(self, source, method):
+        return method in self._capabilities.play_methods.get(source, ())
 
     def _src_name(self, cur_input):
         if cur_input not in self.inputs():
@@ -507,54 +1145,119 @@ class RXV(object):
         avail = next(config.iter('Feature_Availability'))
         return avail.text == 'Ready'
 
-    @staticmethod
-    def safe_get(doc, names):
+    def wait_until_ready(self, timeout=30.0, profiles=None):
+        """Block until the receiver is on and its input is ready.
+
+        After switching on or changing the input, the receiver is probed
+        once; if it is not ready yet, most of the time this took on
+        earlier occasions for the same model is slept through in one go
+        before it is probed at short intervals. Without any record the
+        probes start close together and spread out. The observed
+        latency is learned for next time, see rxv.latency.
+
+        Raises Timeout if the receiver is not ready after timeout seconds.
+        """
+        with self._span('wait_until_ready'):
+            self._wait_until_ready(timeout, profiles)
+
+    def _wait_until_ready(self, timeout, profiles):
+        profiles = profiles or latency.default_profiles
+        transition, since = self._recent_transition() or (None, time.time())
+        # waited for now, even if that times out
+        self._transition = None
+        deadline = time.time() + timeout
+        if self._probe_ready():
+            # nothing to learn, e.g. switched on when it already was
+            return
+        model = self.model_name if self.model_name != "Unknown" else self.ctrl_url
+        expected = transition and profiles.expected(model, transition)
+        if expected:
+            self._sleep(max(0, min(since + 0.8 * expected, deadline) - time.time()))
+            interval, growth = min(max(expected / 20, 0.05), 0.5), 1.2
+        else:
+            interval, growth = 0.1, 1.5
+
+        while not self._probe_ready():
+            if time.time() + interval > deadline:
+                raise Timeout()
+            self._sleep(interval)
+            interval = min(interval * growth, 1.0)
+
+        if transition:
+            profiles.observe(model, transition,
+                             min(time.time() - since, latency.MAX_LATENCY))
+
+    def _probe_ready(self):
+        # receivers reject commands or drop connections for a while
+        # after being switched on, which only means not ready yet
         try:
-            # python 3.x
-            import html
-        except ImportError:
-            # python 2.7
-            import HTMLParser
-            html = HTMLParser.HTMLParser()
+            return self.on and self.is_ready()
+        except (ResponseException, IOError, OSError):
+            logger.debug("%s not ready yet", self.ctrl_url, exc_info=True)
+            return False
 
+    @staticmethod
+    def safe_get(doc, names):
         for name in names:
             tag = doc.find(".//%s" % name)
             if tag is not None and tag.text is not None:
                 # Tuner and Net Radio sometimes respond
                 # with escaped entities
-                return html.unescape(tag.text).strip()
+                return unescape(tag.text).strip()
         return ""
 
-    def play_status(self):
+    def play_info(self):
+        """Get typed play information of the current input.
 
+        Like play_status but also reports the album art URL and, for
+        the Tuner, band and frequency. Returns None if the current
+        input does not provide Play_Info.
+        """
         src_name = self._src_name(self.input)
 
         if not src_name:
             return None
 
         if not self.supports_method(src_name, 'Play_Info'):
-            return
+            return None
 
         request_text = PlayGet.format(src_name=src_name)
         res = self._request('GET', request_text, zone_cmd=False)
 
-        playing = RXV.safe_get(res, ["Playback_Info"]) == "Play" \
-            or src_name == "Tuner"
+        info = decode_play_info(src_name, res)
+        if info.album_art_url:
+            info = info._replace(album_art_url=urljoin(self.ctrl_url, info.album_art_url))
+        return info
 
-        status = PlayStatus(
-            playing,
-            artist=RXV.safe_get(res, ARTIST_OPTIONS),
-            album=RXV.safe_get(res, ALBUM_OPTIONS),
-            song=RXV.safe_get(res, SONG_OPTIONS),
-            station=RXV.safe_get(res, STATION_OPTIONS)
-        )
+    def play_status(self):
+        info = self.play_info()
+        if info is None:
+            return None
+        status = PlayStatus(info.playing, info.artist, info.album, info.song, info.station)
+        if self.history is not None:
+            self.history.record(self._zone, play_status=status)
         return status
 
-    def menu_status(self):
-        cur_input = self.input
+    def _menu_src_name(self, cur_input=None):
+        """Source name of the current input, if it has a menu.
+
+        Pass cur_input if the current input is already known.
+        """
+        if cur_input is None:
+            cur_input = self.input
         src_name = self._src_name(cur_input)
         if not src_name:
             raise MenuUnavailable(cur_input)
+        return src_name
+
+    def menu_status(self, src_name=None):
+        """Get the menu status of the current input.
+
+        Pass src_name if the current input is already known to save
+        the round trip that looks it up.
+        """
+        if src_name is None:
+            src_name = self._menu_src_name()
 
         request_text = ListGet.format(src_name=src_name)
         res = self._request('GET', request_text, zone_cmd=False)
@@ -589,11 +1292,13 @@ class RXV(object):
         status = MenuStatus(ready, layer, name, current_line, max_line, cl)
         return status
 
-    def menu_jump_line(self, lineno):
-        cur_input = self.input
-        src_name = self._src_name(cur_input)
-        if not src_name:
-            raise MenuUnavailable(cur_input)
+    def browse(self, cache_size=32, prefetch=True):
+        """Return a MenuBrowser for the menu of the current input."""
+        return MenuBrowser(self, cache_size=cache_size, prefetch=prefetch)
+
+    def menu_jump_line(self, lineno, src_name=None):
+        if src_name is None:
+            src_name = self._menu_src_name()
 
         request_text = ListControlJumpLine.format(
             src_name=src_name,
@@ -601,11 +1306,9 @@ class RXV(object):
         )
         return self._request('PUT', request_text, zone_cmd=False)
 
-    def _menu_cursor(self, action):
-        cur_input = self.input
-        src_name = self._src_name(cur_input)
-        if not src_name:
-            raise MenuUnavailable(cur_input)
+    def _menu_cursor(self, action, src_name=None):
+        if src_name is None:
+            src_name = self._menu_src_name()
 
         request_text = ListControlCursor.format(
             src_name=src_name,
@@ -636,6 +1339,9 @@ class RXV(object):
 
     @property
     def volume(self):
+        return self._shadowed('volume', self._load_volume)
+
+    def _load_volume(self):
         request_text = VolumeLevel.format(value=GetParam)
         response = self._request('GET', request_text)
         vol = response.find('%s/Volume/Lvl/Val' % self.zone).text
@@ -660,6 +1366,7 @@ class RXV(object):
         volume_val = VolumeLevelValue.format(val=value, exp=exp, unit=unit)
         request_text = VolumeLevel.format(value=volume_val)
         self._request('PUT', request_text)
+        self._mirror('volume', int(value) / 10.0)
 
     def volume_fade(self, final_vol, sleep=0.5):
         start_vol = int(floor(self.volume))
@@ -668,10 +1375,13 @@ class RXV(object):
 
         for val in range(start_vol, final_vol, step):
             self.volume = val
-            time.sleep(sleep)
+            self._sleep(sleep)
 
     @property
     def mute(self):
+        return self._shadowed('mute', self._load_mute)
+
+    def _load_mute(self):
         request_text = VolumeMute.format(state=GetParam)
         response = self._request('GET', request_text)
         mute = response.find('%s/Volume/Mute' % self.zone).text
@@ -684,34 +1394,47 @@ class RXV(object):
         new_state = "On" if state else "Off"
         request_text = VolumeMute.format(state=new_state)
         response = self._request('PUT', request_text)
+        self._mirror('mute', state)
         return response
 
-    @staticmethod
-    def _wait_for(predicate):
-        """Waits until the predicate returns True"""
-        if not predicate():
-            for attempt in range(10):
-                if predicate():
-                    break
-                time.sleep(0.1)
-            else:
-                raise Timeout()
+    def _wait_for(self, predicate, timeout=1.0, intervals=(0.1,)):
+        """Waits until the predicate returns a true value, returns it.
 
-    def _wait_for_menu_status(self, predicate):
-        """Waits until the predicate returns True"""
-        self._wait_for(lambda: predicate(self.menu_status()))
-
-    def _wait_for_menu_ready(self):
+        Polls after each of intervals seconds, the last one repeating,
+        and raises Timeout once the next poll would be after timeout.
+        """
+        deadline = time.time() + timeout
+        attempt = 0
+        with self._span('wait_for'):
+            while True:
+                result = predicate()
+                if result:
+                    return result
+                interval = intervals[min(attempt, len(intervals) - 1)]
+                if time.time() + interval > deadline:
+                    raise Timeout()
+                self._sleep(interval)
+                attempt += 1
+
+    def _wait_for_menu_status(self, predicate, src_name=None, **kwargs):
+        """Waits until the predicate returns True, returns the MenuStatus"""
+        def check():
+            status = self.menu_status(src_name)
+            return status if predicate(status) else None
+        return self._wait_for(check, **kwargs)
+
+    def _wait_for_menu_ready(self, src_name=None, **kwargs):
         """Waits until the menu reports ready status"""
-        self._wait_for(lambda: self.menu_status().ready)
+        return self._wait_for_menu_status(lambda status: status.ready, src_name, **kwargs)
 
-    def _server_sel_line(self, lineno):
+    def _server_sel_line(self, lineno, src_name=None):
         """Selects the given line number in the menu"""
         lineno = int(lineno)
-        self.menu_jump_line(lineno)
-        self._wait_for_menu_status(lambda status: status.ready and status.current_line == lineno)
-        self.menu_sel()
-        self._wait_for_menu_ready()
+        self.menu_jump_line(lineno, src_name)
+        self._wait_for_menu_status(
+            lambda status: status.ready and status.current_line == lineno, src_name)
+        self._menu_cursor("Sel", src_name)
+        return self._wait_for_menu_ready(src_name)
 
     def server_paths(self):
         """
@@ -722,24 +1445,122 @@ class RXV(object):
 
         :return: list(strings)
         """
-        return self._iter_menu([])
+        with priority(CRAWL):
+            return self._iter_menu([])
 
-    def _browse_to_target_layer(self, path_to_layer):
+    def iter_server_paths(self, root=None, max_depth=None, resume_after=None):
+        """
+        Generator variant of server_paths that yields each SERVER path as soon
+        as the layer containing it has been read.
+
+        Entries are yielded in menu line order as pairs of name path and index
+        path, both strings, e.g. ("Fancy Server>Radio>Stream 1", "1>2>1").
+
+        :param root: index path (list of line numbers or "1>2" string) of the
+                     container to start from, defaults to the ROOT
+        :param max_depth: number of layers below root to crawl, None for all
+        :param resume_after: index path of the last entry processed by an
+                             interrupted crawl; everything up to and including
+                             it is skipped without browsing into it again
+        """
+        return iter_at_priority(CRAWL, self._iter_server_paths(root, max_depth, resume_after))
+
+    def _iter_server_paths(self, root, max_depth, resume_after):
+        root = _index_tuple(root)
+        checkpoint = _index_tuple(resume_after)
+
+        src_name = self._menu_src_name()
+        # walk down to root once, learning the names of its layers
+        self._browse_to_target_layer([], src_name)
+        path_to_layer = []
+        for lineno in root:
+            status = self._server_sel_line(lineno, src_name)
+            path_to_layer.append((lineno, status.name))
+
+        for entry in self._iter_layer(path_to_layer, max_depth, checkpoint, src_name):
+            yield entry
+
+    def _iter_layer(self, path_to_layer, max_depth, checkpoint, src_name):
+        """Yield the entries of the layer the menu shows, page by page.
+
+        Containers are recursed into when they come up, after which the
+        menu is browsed back to this layer for its next page.
+        """
+        status = self.menu_status(src_name)
+        # False once a container was entered
+        here = True
+        while True:
+            current_line, current_list = status.current_line, status.current_list
+            entries = []
+            for group, is_container in ((current_list.containers, True),
+                                        (current_list.items, False),
+                                        (current_list.unplayables, False)):
+                entries.extend((current_line + int(display_lineno[5:]) - 1, name, is_container)
+                               for display_lineno, name in group.items())
+
+            for lineno, name, is_container in sorted(entries):
+                path = path_to_layer + [(lineno, name)]
+                index = tuple(x[0] for x in path)
+                if is_container:
+                    if checkpoint and index < checkpoint[:len(index)]:
+                        continue
+                    if max_depth is not None and max_depth <= 1:
+                        continue
+                    if not here:
+                        self._browse_to_target_layer(path_to_layer, src_name)
+                    self._server_sel_line(lineno, src_name)
+                    here = False
+                    for entry in self._iter_layer(
+                            path, max_depth and max_depth - 1, checkpoint, src_name):
+                        yield entry
+                elif not checkpoint or index > checkpoint:
+                    yield (">".join(x[1] for x in path),
+                           ">".join(str(x) for x in index))
+
+            next_line = current_line + len(current_list.all)
+            if next_line > status.max_line:
+                break
+            if not here:
+                self._browse_to_target_layer(path_to_layer, src_name)
+                here = True
+            self.menu_jump_line(next_line, src_name)
+            status = self._wait_for_menu_status(
+                lambda status: status.ready and status.current_line == next_line, src_name)
+
+    def _browse_to_target_layer(self, path_to_layer, src_name=None):
         """
         Browse to the layer specified by path_to_layer by selecting
         the respective lines of the menu starting from the ROOT.
 
         :param path_to_layer: list(pair(#, name))
         """
-        self._wait_for_menu_ready()
-        self.menu_home()
-        self._wait_for_menu_status(lambda status: status.ready and status.layer == 1)
+        self._wait_for_menu_ready(src_name)
+        self._menu_cursor("Return to Home", src_name)
+        self._wait_for_menu_status(lambda status: status.ready and status.layer == 1, src_name)
 
         for lineno in [x[0] for x in path_to_layer]:
-            self.menu_jump_line(lineno)
-            self._wait_for_menu_status(lambda status: status.ready and status.current_line == lineno)
-            self.menu_sel()
-            self._wait_for_menu_ready()
+            self._server_sel_line(lineno, src_name)
+
+    def _menu_pages(self, path_to_layer):
+        """
+        Browse to the layer specified by path_to_layer and yield the
+        current line and current list of each of its pages.
+
+        :param path_to_layer: list(pair(#, name))
+        """
+        src_name = self._menu_src_name()
+        self._browse_to_target_layer(path_to_layer)
+
+        while True:
+            status = self.menu_status(src_name)
+            yield status.current_line, status.current_list
+
+            next_line = status.current_line + len(status.current_list.all)
+            if next_line > status.max_line:
+                break
+            self.menu_jump_line(next_line, src_name)
+            self._wait_for_menu_status(
+                lambda status: status.ready and status.current_line == next_line, src_name)
 
     def _iter_menu(self, path_to_layer):
         """
@@ -751,7 +1572,10 @@ class RXV(object):
         :param path_to_layer: list(pair(#, name))
         :return: list(items)
         """
+        with self._span('iter_menu', path=">".join(name for _, name in path_to_layer)):
+            return self._iter_menu_layer(path_to_layer)
 
+    def _iter_menu_layer(self, path_to_layer):
         # go to target layer
         self._browse_to_target_layer(path_to_layer)
 
@@ -853,7 +1677,7 @@ class RXV(object):
                     else:
                         raise FileNotFoundError("Layer %s not found", layer)
 
-    def server_select(self, path):
+    def server_select(self, path, index=None):
         """Play the specified path in SERVER mode.
 
         This lets you play a SERVER address in a single command. Supports name based
@@ -861,6 +1685,9 @@ class RXV(object):
         which returns all available SERVER paths. NOTE: name based lookup may be slow, so
         prefer the index based lookup if you can.
 
+        If a ServerPathIndex is given as index, names found in it are resolved to
+        index paths locally instead of being searched for page by page.
+
         Examples:
             server_select('AVM FRITZ!Mediaserver>Internetradio>AlternativeFM>AlternativeFM Stream 2')
             server_select([1, 4, 18, 1])
@@ -871,6 +1698,13 @@ class RXV(object):
 
         TODO: better error handling if we some how time out
         """
+        if isinstance(path, str) and index is not None:
+            path = index.resolve(path) or path
+
+        with self._span('server_select', path=path):
+            self._server_select(path)
+
+    def _server_select(self, path):
         self.input = "SERVER"
 
         # go to the ROOT first
@@ -899,29 +1733,66 @@ class RXV(object):
 
             Bookmarks>Internet>Radio Paradise
 
-        It does this by push commands, then looping and making sure
-        the menu is in a ready state before we try to push the next
-        one. A sufficient number of iterations are allowed for to
-        ensure we give it time to get there.
+        The menu is walked from its top layer, looking each name up page
+        by page. The line numbers found are remembered per receiver, so
+        playing the same path again selects them directly, only checking
+        that the names still match; refresh('net_radio_lines') forgets
+        them. The menu is polled between steps, quickly at first, see
+        POLL_INTERVALS.
 
-        TODO: better error handling if we some how time out
+        Raises FileNotFoundError if a name is not in its layer, or
+        Timeout if the menu does not become ready.
         """
+        with self._span('net_radio', path=path):
+            self._net_radio(path)
+
+    def _net_radio(self, path):
         layers = path.split(">")
+        known = self._cached('net_radio_lines', dict, zone=False)
+        lines = known.get(path, ())
         self.input = "NET RADIO"
 
-        for attempt in range(20):
-            menu = self.menu_status()
-            if menu.ready:
-                for line, value in menu.current_list.all.items():
-                    if value == layers[menu.layer - 1]:
-                        lineno = line[5:]
-                        self._net_radio_direct_sel(lineno)
-                        if menu.layer == len(layers):
-                            return
-                        break
-            else:
-                # print("Sleeping because we are not ready yet")
-                time.sleep(1)
+        self._wait_for_menu_ready(NET_RADIO, **NET_RADIO_WAIT)
+        self._menu_cursor("Return to Home", NET_RADIO)
+        found = []
+        for depth, name in enumerate(layers, 1):
+            status = self._wait_for_menu_status(
+                lambda status: status.ready and status.layer == depth, NET_RADIO, **NET_RADIO_WAIT)
+            lineno = lines[depth - 1] if depth <= len(lines) else None
+            if lineno is not None:
+                status = self._net_radio_page(status, lineno)
+                if status.current_list.all.get(
+                        "Line_{}".format(lineno - status.current_line + 1)) != name:
+                    logger.info("NET RADIO menu changed, looking up %s again", path)
+                    lines = ()
+                    lineno = None
+            if lineno is None:
+                status, lineno = self._net_radio_find(status, name)
+            self._net_radio_direct_sel(lineno - status.current_line + 1)
+            found.append(lineno)
+        known[path] = tuple(found)
+
+    def _net_radio_page(self, status, lineno):
+        """Show the page holding lineno, returns its MenuStatus."""
+        if status.current_line <= lineno < status.current_line + len(status.current_list.all):
+            return status
+        page = page_start(lineno)
+        self.menu_jump_line(page, NET_RADIO)
+        return self._wait_for_menu_status(
+            lambda status: status.ready and status.current_line == page, NET_RADIO,
+            **NET_RADIO_WAIT)
+
+    def _net_radio_find(self, status, name):
+        """Page through the current layer, returns (MenuStatus, lineno) of name."""
+        status = self._net_radio_page(status, 1)
+        while True:
+            for line, value in status.current_list.all.items():
+                if value == name:
+                    return status, status.current_line + int(line[5:]) - 1
+            next_line = status.current_line + len(status.current_list.all)
+            if not status.current_list.all or next_line > status.max_line:
+                raise FileNotFoundError("{} not found in {}".format(name, status.name))
+            status = self._net_radio_page(status, next_line)
 
     @property
     def sleep(self):
@@ -935,6 +1806,28 @@ class RXV(object):
         request_text = PowerControlSleep.format(sleep_value=value)
         self._request('PUT', request_text)
 
+    def subscribe_events(self, callback, location=None, subscriber=None):
+        """Get UPnP events of this receiver instead of polling.
+
+        callback(event) is called with an rxv.events.Event for every
+        change reported by any evented service of the UPnP device
+        described at location (the SSDP LOCATION url), which defaults to
+        the one the receiver was discovered at by rxv.find(). Pass an
+        already started EventSubscriber to share its callback server
+        between receivers. Returns the subscriber; stop() it to
+        unsubscribe.
+        """
+        from .events import EventSubscriber
+
+        location = location or self.location
+        if location is None:
+            raise ValueError("UPnP location of {} unknown, pass the SSDP LOCATION url".format(
+                self.ctrl_url))
+        if subscriber is None:
+            subscriber = EventSubscriber().start()
+        subscriber.subscribe_device(location, callback)
+        return subscriber
+
     @property
     def small_image_url(self):
         host = urlparse(self.ctrl_url).hostname
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Per-receiver request scheduling.
+
+A receiver handles one request at a time, so everything talking to it
+queues up somewhere. The Scheduler makes that queue explicit: requests
+wait for their turn by priority class, and within a class the clients
+(threads) take turns, so a long crawl cannot starve a single volume
+change. Composite operations like server_select() or server_paths()
+send one request per step, which lets higher priority requests in at
+every step boundary.
+
+Code runs at INTERACTIVE priority unless it says otherwise:
+
+    >>> with priority(AUTOMATION):
+    ...     rx.scene = 'Movie'
+"""
+from __future__ import absolute_import, division, print_function
+
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+INTERACTIVE = 0
+AUTOMATION = 1
+POLL = 2
+CRAWL = 3
+PRIORITIES = (INTERACTIVE, AUTOMATION, POLL, CRAWL)
+
+_local = threading.local()
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def current_priority():
+    """Priority class requests of the calling thread are sent with."""
+    return getattr(_local, 'priority', INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    """Send all requests of the calling thread in this block at level."""
+    assert level in PRIORITIES
+    previous = current_priority()
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def iter_at_priority(level, iterable):
+    """Iterate at level without changing the priority of the consumer.
+
+    A generator running inside a priority() block would leak the level
+    into the code consuming it between two items.
+    """
+    iterator = iter(iterable)
+    while True:
+        with priority(level):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def scheduler_for(ctrl_url):
+    """The Scheduler shared by all controllers of the receiver at ctrl_url."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(ctrl_url)
+        if scheduler is None:
+            scheduler = _schedulers[ctrl_url] = Scheduler()
+        return scheduler
+
+
+class Scheduler(object):
+    """Hands out the receiver to one request at a time.
+
+    The waiting request with the best priority class goes next; within
+    a class the waiting clients are served round robin, each client's
+    own requests in order.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._busy = False
+        # one queue per priority class: client -> deque of waiting turns
+        self._queues = [OrderedDict() for _ in PRIORITIES]
+
+    @contextmanager
+    def slot(self, client=None):
+        self.acquire(client)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, client=None):
+        if client is None:
+            client = threading.current_thread()
+        with self._lock:
+            if not self._busy:
+                self._busy = True
+                return
+            turn = threading.Event()
+            self._queues[current_priority()].setdefault(client, deque()).append(turn)
+        turn.wait()
+
+    def release(self):
+        with self._lock:
+            for queue in self._queues:
+                if queue:
+                    client, turns = queue.popitem(last=False)
+                    turn = turns.popleft()
+                    if turns:
+                        # to the back of its class
+                        queue[client] = turns
+                    # the slot passes on without becoming free in between
+                    turn.set()
+                    return
+            self._busy = False
+
+    def waiting(self):
+        """Number of requests waiting for their turn, per priority class."""
+        with self._lock:
+            return [sum(len(turns) for turns in queue.values()) for queue in self._queues]
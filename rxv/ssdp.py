@@ -7,8 +7,7 @@ import socket
 import xml
 from collections import namedtuple
 
-import requests
-from defusedxml import cElementTree
+from defusedxml import ElementTree as cElementTree
 
 try:
     from urllib.parse import urljoin
@@ -38,7 +37,16 @@ FRIENDLY_NAME_QUERY = (
     "/{urn:schemas-upnp-org:device-1-0}friendlyName"
 )
 
-RxvDetails = namedtuple("RxvDetails", "ctrl_url unit_desc_url, model_name friendly_name")
+SERVICE_QUERY = ".//{urn:schemas-upnp-org:device-1-0}service"
+UPNP_URL_BASE_QUERY = "{urn:schemas-upnp-org:device-1-0}URLBase"
+UPNP_NS = "{urn:schemas-upnp-org:device-1-0}"
+
+LOCATION_RE = re.compile(r"LOCATION:(.+)", re.IGNORECASE)
+
+RxvDetails = namedtuple("RxvDetails", "ctrl_url unit_desc_url, model_name friendly_name location")
+# the UPnP device description url, needed to subscribe to events
+RxvDetails.__new__.__defaults__ = (None,)
+UpnpService = namedtuple("UpnpService", "service_type service_id control_url event_sub_url")
 
 
 def discover(timeout=1.5):
@@ -58,7 +66,7 @@ def discover(timeout=1.5):
 
     results = []
     for res in responses:
-        m = re.search(r"LOCATION:(.+)", res.decode('utf-8'), re.IGNORECASE)
+        m = LOCATION_RE.search(res.decode('utf-8'))
         if not m:
             continue
         url = m.group(1).strip()
@@ -73,7 +81,7 @@ def rxv_details(location):
     """Looks under given UPNP url, and checks if Yamaha amplituner lives there
        returns RxvDetails if yes, None otherwise"""
     try:
-        res = cElementTree.XML(requests.get(location).content)
+        res = _get_xml(location)
     except xml.etree.ElementTree.ParseError:
         return None
     url_base_el = res.find(URL_BASE_QUERY)
@@ -86,7 +94,37 @@ def rxv_details(location):
     model_name = res.find(MODEL_NAME_QUERY).text
     friendly_name = res.find(FRIENDLY_NAME_QUERY).text
 
-    return RxvDetails(ctrl_url, unit_desc_url, model_name, friendly_name)
+    return RxvDetails(ctrl_url, unit_desc_url, model_name, friendly_name, location)
+
+
+def upnp_services(location):
+    """Lists the UPnP services advertised in the device description
+       under given url, including those of embedded devices.
+       Returns a list of UpnpService objects with absolute urls, None
+       where the device does not provide one"""
+    res = _get_xml(location)
+    url_base = res.findtext(UPNP_URL_BASE_QUERY) or location
+
+    def absolute(url):
+        return urljoin(url_base, url) if url else None
+
+    services = []
+    for service in res.iterfind(SERVICE_QUERY):
+        services.append(UpnpService(
+            service.findtext(UPNP_NS + 'serviceType'),
+            service.findtext(UPNP_NS + 'serviceId'),
+            absolute(service.findtext(UPNP_NS + 'controlURL')),
+            absolute(service.findtext(UPNP_NS + 'eventSubURL')),
+        ))
+    return services
+
+
+def _get_xml(location):
+    # requests is only imported when a description is fetched, so
+    # importing rxv stays cheap
+    import requests
+
+    return cElementTree.XML(requests.get(location).content)
 
 
 if __name__ == '__main__':
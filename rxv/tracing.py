@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Hierarchical timing of what RXV spends its time on.
+
+Composite operations like server_select() send dozens of requests and
+wait for the menu in between. With a Tracer attached, each of them is
+recorded as a span, with child spans for every round trip, the wait
+for the receiver's request slot, XML parsing and sleeping:
+
+    >>> tracer = Tracer()
+    >>> rx = rxv.RXV(ctrl_url, tracer=tracer)
+    >>> rx.server_select('NAS>Music>Album')
+    >>> tracer.save('server_select.json')
+
+The file is in Chrome's trace event format; open it in chrome://tracing
+or https://ui.perfetto.dev to see where the time went.
+"""
+from __future__ import absolute_import, division, print_function
+
+import collections
+import io
+import itertools
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+# categories of spans
+OPERATION = 'operation'
+HTTP = 'http'
+PARSE = 'parse'
+WAIT = 'wait'
+
+Span = namedtuple("Span", "id parent name category start duration thread args")
+
+
+class Tracer(object):
+    """Collects the spans of the controllers it is attached to.
+
+    Only the last max_spans finished spans are kept.
+    """
+
+    def __init__(self, max_spans=100000):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._spans = collections.deque(maxlen=max_spans)
+        self._ids = itertools.count(1)
+        # thread ident -> thread name, for the trace file
+        self._threads = {}
+
+    def span(self, name, category=OPERATION, **args):
+        """Context manager recording the time spent in its block."""
+        return _ActiveSpan(self, name, category, args)
+
+    def spans(self):
+        """Finished spans in the order they finished."""
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _finish(self, span):
+        thread = threading.current_thread()
+        with self._lock:
+            self._threads[thread.ident] = thread.name
+            self._spans.append(span)
+
+    def save(self, filename):
+        """Write the spans to filename as Chrome trace event JSON."""
+        pid = os.getpid()
+        spans = self.spans()
+        with self._lock:
+            threads = dict(self._threads)
+        events = [{
+            'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': ident,
+            'args': {'name': name},
+        } for ident, name in threads.items()]
+        for span in spans:
+            args = dict((key, str(value)) for key, value in span.args.items())
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': int(span.start * 1e6),
+                'dur': int(span.duration * 1e6),
+                'pid': pid,
+                'tid': span.thread,
+                'args': args,
+            })
+        with io.open(filename, 'w', encoding='utf-8') as f:
+            # json.dumps() returns a byte str on Python 2
+            f.write(u'{}\n'.format(json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})))
+
+
+class _ActiveSpan(object):
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.parent = stack[-1] if stack else None
+        self.id = next(self.tracer._ids)
+        stack.append(self.id)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        duration = time.time() - self.start
+        self.tracer._stack().pop()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer._finish(Span(self.id, self.parent, self.name, self.category,
+                                 self.start, duration, threading.current_thread().ident,
+                                 self.args))
+        return False
+
+
+class _NoSpan(object):
+    """Stands in for a span when no Tracer is attached."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+NO_SPAN = _NoSpan()
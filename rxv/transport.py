@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""HTTP transports used by RXV to talk to the receiver.
+
+A transport has two methods, get(url) and post(url, data), both
+returning the response body as bytes. RequestsTransport is the
+default; SocketTransport trades the features of requests for the
+lowest possible per-call overhead:
+
+    >>> rx = rxv.RXV(ctrl_url, transport=SocketTransport())
+
+RecordingTransport wraps another transport and writes every exchange
+to a trace file that ReplayTransport serves back later, without a
+receiver:
+
+    >>> recorder = RecordingTransport('session.trace.gz')
+    >>> rx = rxv.RXV(ctrl_url, transport=recorder)
+    >>> ...
+    >>> recorder.close()
+    >>> rx = rxv.RXV(ctrl_url, transport=ReplayTransport('session.trace.gz'))
+"""
+from __future__ import absolute_import, division, print_function
+
+import collections
+import gzip
+import io
+import json
+import logging
+import socket
+import threading
+import time
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+from .exceptions import TraceMismatch
+
+logger = logging.getLogger('rxv')
+
+TRACE_FORMAT_NAME = 'rxv-trace'
+TRACE_FORMAT_VERSION = 1
+
+
+class RequestsTransport(object):
+    """Transport based on a requests.Session."""
+
+    def __init__(self):
+        # created on first use, importing requests is slow
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    def get(self, url):
+        return self.session.get(url).content
+
+    def post(self, url, data):
+        return self.session.post(url, data=data, headers={"Content-Type": "text/xml"}).content
+
+
+class SocketTransport(object):
+    """Minimal HTTP/1.1 client keeping one persistent socket per host.
+
+    Request headers are formatted once per url, responses are read into
+    a single buffer, and a connection the receiver has closed in the
+    meantime is reopened transparently; a request the receiver may already
+    have seen is only sent again if it is a GET. Requests over one transport are
+    serialized, which is what the receivers' HTTP servers want anyway.
+    """
+
+    def __init__(self, timeout=10.0):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # (host, port) -> socket
+        self._sockets = {}
+        # (method, url) -> ((host, port), header bytes up to Content-Length)
+        self._heads = {}
+
+    def get(self, url):
+        return self._request('GET', url, b'')
+
+    def post(self, url, data):
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        return self._request('POST', url, data)
+
+    def close(self):
+        with self._lock:
+            for sock in self._sockets.values():
+                sock.close()
+            self._sockets.clear()
+
+    def _head(self, method, url):
+        head = self._heads.get((method, url))
+        if head is None:
+            parts = urlsplit(url)
+            address = (parts.hostname, parts.port or 80)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            head = (address, (
+                '{} {} HTTP/1.1\r\n'
+                'Host: {}\r\n'
+                'Content-Type: text/xml\r\n'
+                'Connection: keep-alive\r\n'
+                'Content-Length: '.format(method, path, parts.netloc)
+            ).encode('ascii'))
+            self._heads[(method, url)] = head
+        return head
+
+    def _request(self, method, url, body):
+        address, head = self._head(method, url)
+        message = head + str(len(body)).encode('ascii') + b'\r\n\r\n' + body
+        with self._lock:
+            sock = self._sockets.get(address)
+            if sock is not None:
+                try:
+                    return self._exchange(address, sock, message)
+                except _StaleConnection as e:
+                    # the receiver closed the idle connection. Once the request
+                    # went out it may have been applied, so only a GET is safe
+                    # to send again.
+                    if e.sent and b'cmd="GET"' not in body:
+                        raise socket.error("Connection to {}:{} closed".format(*address))
+                    logger.debug("Reconnecting to %s:%s", *address)
+            sock = self._connect(address)
+            try:
+                return self._exchange(address, sock, message)
+            except _StaleConnection:
+                raise socket.error("Connection to {}:{} closed".format(*address))
+
+    def _connect(self, address):
+        sock = socket.create_connection(address, self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sockets[address] = sock
+        return sock
+
+    def _drop(self, address):
+        sock = self._sockets.pop(address, None)
+        if sock is not None:
+            sock.close()
+
+    def _exchange(self, address, sock, message):
+        try:
+            sock.sendall(message)
+        except socket.timeout:
+            self._drop(address)
+            raise
+        except (socket.error, OSError):
+            self._drop(address)
+            raise _StaleConnection(sent=False)
+        try:
+            buf = sock.recv(65536)
+        except socket.timeout:
+            self._drop(address)
+            raise
+        except (socket.error, OSError):
+            self._drop(address)
+            raise _StaleConnection(sent=True)
+        if not buf:
+            self._drop(address)
+            raise _StaleConnection(sent=True)
+
+        try:
+            while b'\r\n\r\n' not in buf:
+                buf += self._recv(sock)
+            header_end = buf.index(b'\r\n\r\n')
+            headers = _parse_headers(buf[:header_end])
+            body = buf[header_end + 4:]
+
+            if headers.get('transfer-encoding', '').lower() == 'chunked':
+                body = self._read_chunked(sock, body)
+            elif 'content-length' in headers:
+                length = int(headers['content-length'])
+                while len(body) < length:
+                    body += self._recv(sock)
+                body = body[:length]
+            else:
+                # body ends when the connection is closed
+                while True:
+                    data = sock.recv(65536)
+                    if not data:
+                        break
+                    body += data
+                headers['connection'] = 'close'
+        except Exception:
+            self._drop(address)
+            raise
+
+        if headers.get('connection', '').lower() == 'close':
+            self._drop(address)
+        return body
+
+    @staticmethod
+    def _recv(sock):
+        data = sock.recv(65536)
+        if not data:
+            raise socket.error("Connection closed while reading response")
+        return data
+
+    def _read_chunked(self, sock, buf):
+        body = b''
+        while True:
+            while b'\r\n' not in buf:
+                buf += self._recv(sock)
+            line, buf = buf.split(b'\r\n', 1)
+            size = int(line.split(b';')[0], 16)
+            while len(buf) < size + 2:
+                buf += self._recv(sock)
+            if size == 0:
+                return body
+            body += buf[:size]
+            buf = buf[size + 2:]
+
+
+class RecordingTransport(object):
+    """Records the exchanges of another transport to a trace file.
+
+    The trace is gzip compressed: a JSON header line followed by one
+    JSON line per exchange holding the method, url path, request and
+    response bodies, the start time relative to the first exchange and
+    the time the receiver took to answer. Call close() to flush it.
+
+    :param inner: transport doing the actual work, RequestsTransport
+                  by default
+    """
+
+    def __init__(self, filename, inner=None):
+        self.inner = inner or RequestsTransport()
+        self._lock = threading.Lock()
+        self._started = None
+        self._file = io.TextIOWrapper(gzip.open(filename, 'wb'), encoding='utf-8')
+        # json.dumps() returns a byte str on Python 2, the wrapper takes unicode
+        self._file.write(u'{}\n'.format(json.dumps({
+            'format': TRACE_FORMAT_NAME,
+            'version': TRACE_FORMAT_VERSION,
+            'recorded_at': time.time(),
+        })))
+
+    def get(self, url):
+        return self._record('GET', url, b'', self.inner.get, url)
+
+    def post(self, url, data):
+        return self._record('POST', url, data, self.inner.post, url, data)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        close = getattr(self.inner, 'close', None)
+        if close is not None:
+            close()
+
+    def _record(self, method, url, data, send, *args):
+        started = time.time()
+        response = send(*args)
+        elapsed = time.time() - started
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        with self._lock:
+            if self._started is None:
+                self._started = started
+            self._file.write(u'{}\n'.format(json.dumps({
+                'method': method,
+                'path': urlsplit(url).path,
+                'request': data.decode('utf-8'),
+                'response': response.decode('utf-8'),
+                'start': round(started - self._started, 6),
+                'elapsed': round(elapsed, 6),
+            })))
+        return response
+
+
+class ReplayTransport(object):
+    """Serves the responses of a trace written by RecordingTransport.
+
+    Requests are matched on method, url path and body, so a trace can be
+    replayed against any ctrl_url. Repeated identical requests get the
+    recorded responses in their original order, the last one is repeated
+    once they are used up, which keeps polling loops running. A request
+    that was never recorded raises TraceMismatch.
+
+    :param speed: None to answer immediately, otherwise a factor on the
+                  recorded response times (1.0 is the original speed)
+    """
+
+    def __init__(self, filename, speed=None):
+        self.speed = speed
+        self._lock = threading.Lock()
+        self.header, exchanges = iter_trace_file(filename)
+        # (method, path, request) -> deque([(response, elapsed)])
+        self._responses = {}
+        for exchange in exchanges:
+            key = (exchange['method'], exchange['path'],
+                   exchange['request'].encode('utf-8'))
+            self._responses.setdefault(key, collections.deque()).append(
+                (exchange['response'].encode('utf-8'), exchange['elapsed']))
+
+    def get(self, url):
+        return self._replay('GET', url, b'')
+
+    def post(self, url, data):
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        return self._replay('POST', url, data)
+
+    def close(self):
+        pass
+
+    def _replay(self, method, url, data):
+        key = (method, urlsplit(url).path, data)
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                raise TraceMismatch(method, url, data)
+            if len(responses) > 1:
+                response, elapsed = responses.popleft()
+            else:
+                response, elapsed = responses[0]
+        if self.speed:
+            time.sleep(elapsed / self.speed)
+        return response
+
+
+def iter_trace_file(filename):
+    """Read a trace written by RecordingTransport.
+
+    Returns the header dict and a generator over the exchanges as dicts.
+
+    Raises ValueError if the file is not a supported trace.
+    """
+    f = io.TextIOWrapper(gzip.open(filename, 'rb'), encoding='utf-8')
+    try:
+        header = json.loads(f.readline())
+    except (ValueError, OSError, IOError):
+        f.close()
+        raise ValueError("{} is not an rxv trace".format(filename))
+    if header.get('format') != TRACE_FORMAT_NAME or header.get('version') != TRACE_FORMAT_VERSION:
+        f.close()
+        raise ValueError("Unsupported trace {} version {}".format(
+            header.get('format'), header.get('version')))
+
+    def exchanges():
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    return header, exchanges()
+
+
+class _StaleConnection(Exception):
+    """The connection failed before any part of the response arrived."""
+
+    def __init__(self, sent):
+        super(_StaleConnection, self).__init__()
+        # whether the request was handed to the socket before the failure
+        self.sent = sent
+
+
+def _parse_headers(head):
+    lines = head.decode('iso-8859-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return headers
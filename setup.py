@@ -31,6 +31,7 @@ setup(
     license='BSD',
     author_email='github@wuub.net',
     packages=find_packages(),
+    package_data={'rxv': ['capabilities.json']},
     install_requires=['requests', 'defusedxml'],
     tests_require=['tox'],
     zip_safe=False,
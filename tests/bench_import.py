@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+"""Measure how long a fresh interpreter takes to `import rxv`.
+
+Run from the repository root:
+
+    PYTHONPATH=. python tests/bench_import.py
+"""
+import subprocess
+import sys
+import timeit
+
+RUNS = 20
+
+
+def import_time(statement):
+    """Best wall clock time of a fresh interpreter running statement."""
+    return min(timeit.repeat(
+        lambda: subprocess.check_call([sys.executable, '-c', statement]),
+        number=1, repeat=RUNS))
+
+
+def main():
+    baseline = import_time('pass')
+    for statement in ['import rxv', 'import rxv; rxv.RXV', 'import rxv.ssdp']:
+        print("{:<24} {:6.1f} ms".format(
+            statement, (import_time(statement) - baseline) * 1000))
+
+
+if __name__ == '__main__':
+    main()
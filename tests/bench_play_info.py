@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""Compare Play_Info decoding against the per-field safe_get lookups.
+
+Run from the repository root:
+
+    PYTHONPATH=. python tests/bench_play_info.py
+"""
+import timeit
+from io import open
+
+from defusedxml import ElementTree as cElementTree
+
+import rxv
+from rxv.rxv import (ALBUM_OPTIONS, ARTIST_OPTIONS, SONG_OPTIONS,
+                     STATION_OPTIONS, decode_play_info)
+
+SAMPLES = [
+    ('NET_RADIO', 'rx-v1030-netradio-response.xml'),
+    ('Tuner', 'rx-v1030-tuner-response.xml'),
+    ('Spotify', 'rx-v1030-spotify-response.xml'),
+]
+
+
+def sample_content(name):
+    with open('tests/samples/%s' % name, encoding='utf-8') as f:
+        return f.read()
+
+
+def safe_get_status(src_name, res):
+    return rxv.rxv.PlayStatus(
+        rxv.RXV.safe_get(res, ["Playback_Info"]) == "Play" or src_name == "Tuner",
+        artist=rxv.RXV.safe_get(res, ARTIST_OPTIONS),
+        album=rxv.RXV.safe_get(res, ALBUM_OPTIONS),
+        song=rxv.RXV.safe_get(res, SONG_OPTIONS),
+        station=rxv.RXV.safe_get(res, STATION_OPTIONS)
+    )
+
+
+def main(number=20000):
+    for src_name, name in SAMPLES:
+        res = cElementTree.XML(sample_content(name))
+        old = timeit.timeit(lambda: safe_get_status(src_name, res), number=number)
+        new = timeit.timeit(lambda: decode_play_info(src_name, res), number=number)
+        print("{:<10} safe_get: {:6.2f} us  decode_play_info: {:6.2f} us".format(
+            src_name, old / number * 1e6, new / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
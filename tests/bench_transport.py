@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""Compare per-request cost of the requests and raw socket transports.
+
+Talks to a local keep-alive HTTP server so only client overhead is
+measured. Run from the repository root:
+
+    PYTHONPATH=. python tests/bench_transport.py
+"""
+import threading
+import time
+
+import rxv
+from rxv.transport import RequestsTransport, SocketTransport
+
+from test_transport import FakeReceiver
+
+REQUESTS = 2000
+
+
+def bench(name, transport, url):
+    rec = rxv.RXV(url, transport=transport, lazy=True)
+    rec.volume  # connect
+    wall, cpu = time.time(), time.process_time()
+    for _ in range(REQUESTS):
+        rec._request('GET', '<Volume><Lvl>GetParam</Lvl></Volume>')
+    wall, cpu = time.time() - wall, time.process_time() - cpu
+    print("{:<10} {:7.1f} us/request wall {:7.1f} us/request cpu".format(
+        name, wall / REQUESTS * 1e6, cpu / REQUESTS * 1e6))
+
+
+def main():
+    server = FakeReceiver()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    bench('requests', RequestsTransport(), server.ctrl_url)
+    bench('socket', SocketTransport(), server.ctrl_url)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
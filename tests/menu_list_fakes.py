@@ -52,6 +52,7 @@ class MenuListHandler:
         self.current_line = 1
 
         self.line_matcher = re.compile('<List_Control><Jump_Line>(\\d+)</Jump_Line></List_Control>')
+        self.direct_sel_matcher = re.compile('<Direct_Sel>Line_(\\d+)</Direct_Sel>')
 
         # key = (layer, name)
         # value = XML response
@@ -176,6 +177,7 @@ class MenuListHandler:
         """
         request_text = request.text or ''
         line_match = self.line_matcher.search(request_text)
+        direct_sel_match = self.direct_sel_matcher.search(request_text)
 
         def gen_response(content):
             resp = requests.Response()
@@ -191,6 +193,11 @@ class MenuListHandler:
         elif '<Cursor>Sel</Cursor>' in request_text:
             self.select()
             return gen_response(sample_content('rx-v479/cursor_select.xml'))
+        elif direct_sel_match:
+            # lines are counted from the current line, like RXV does
+            self.jump_to(self.current_line + int(direct_sel_match.group(1)) - 1)
+            self.select()
+            return gen_response(sample_content('rx-v479/cursor_select.xml'))
         elif line_match:
             self.jump_to(int(line_match.group(1)))
             return gen_response(sample_content('rx-v479/cursor_jump_to_line.xml'))
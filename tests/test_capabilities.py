@@ -0,0 +1,64 @@
+import glob
+import os
+import tempfile
+from io import open
+
+import requests_mock
+import testtools
+from defusedxml import ElementTree
+
+import rxv
+from rxv import capabilities
+
+CTRL_URL = 'http://10.0.0.4/YamahaRemoteControl/ctrl'
+DESC_XML = 'http://10.0.0.4/YamahaRemoteControl/desc.xml'
+
+
+def sample_content(name):
+    with open('tests/samples/%s' % name, encoding='utf-8') as f:
+        return f.read()
+
+
+class TestCapabilities(testtools.TestCase):
+
+    def test_database_is_up_to_date(self):
+        samples = glob.glob('tests/samples/*-desc.xml')
+        self.assertEqual(6, len(samples))
+        for sample in samples:
+            with open(sample, 'rb') as f:
+                caps = capabilities.from_desc_xml(ElementTree.fromstring(f.read()))
+            self.assertEqual(caps, capabilities.bundled(caps.model), sample)
+
+    def test_from_desc_xml(self):
+        caps = capabilities.from_desc_xml(
+            ElementTree.fromstring(sample_content('rx-v675-desc.xml').encode('utf-8')))
+        self.assertEqual('RX-V675', caps.model)
+        self.assertEqual(['Main_Zone', 'Zone_2'], caps.zones)
+        self.assertIn('Main_Zone,Volume,Lvl', caps.commands)
+        self.assertIn('Straight', caps.surround_programs['Main_Zone'])
+        self.assertEqual(False, caps.surround_programs['Zone_2'])
+        self.assertIn('Pause', caps.play_methods['SERVER'])
+
+    def test_save_and_load(self):
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, filename)
+        caps = capabilities.bundled('RX-V479')
+        capabilities.save(filename, [caps])
+        self.assertEqual({'RX-V479': caps}, capabilities.load(filename))
+
+    @requests_mock.mock()
+    def test_known_model_skips_desc(self, m):
+        rec = rxv.RXV(CTRL_URL, model_name='RX-V675')
+        self.assertEqual(['Main_Zone', 'Zone_2'], rec.zones())
+        self.assertIn('Straight', rec.surround_programs())
+        self.assertTrue(rec.supports_method('Main_Zone', 'Volume', 'Lvl'))
+        self.assertTrue(rec.supports_play_method('SERVER', 'Pause'))
+        self.assertEqual(0, len(m.request_history))
+
+    @requests_mock.mock()
+    def test_unknown_model_fetches_desc(self, m):
+        m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        rec = rxv.RXV(CTRL_URL, model_name='RX-V9999')
+        self.assertEqual(['Main_Zone', 'Zone_2'], rec.zones())
+        self.assertEqual(1, len(m.request_history))
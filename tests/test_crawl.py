@@ -0,0 +1,91 @@
+import threading
+
+import requests_mock
+import testtools
+
+import rxv
+from rxv.crawl import _prefixed, crawl_server_paths
+from tests.menu_list_fakes import MenuListHandler
+
+FAKE_IPS = ['10.0.0.1', '10.0.0.2']
+
+
+def sample_content(name):
+    with open('tests/samples/%s' % name, encoding='utf-8') as f:
+        return f.read()
+
+
+def match_request(request, text_match):
+    return text_match in (request.text or '')
+
+
+class TestCrawl(testtools.TestCase):
+
+    def setup_receivers(self, m):
+        handlers = {}
+        for ip in FAKE_IPS:
+            desc_uri = 'http://%s/YamahaRemoteControl/desc.xml' % ip
+            ctrl_uri = 'http://%s/YamahaRemoteControl/ctrl' % ip
+            handlers[ip] = MenuListHandler()
+            m.get(desc_uri, text=sample_content('rx-v479-desc.xml'))
+            m.post(ctrl_uri, additional_matcher=lambda r: match_request(r, '<Input_Sel_Item>GetParam</Input_Sel_Item>'), text=sample_content('rx-v479/get_inputs.xml'))
+            m.post(ctrl_uri, additional_matcher=lambda r: match_request(r, '<Input_Sel>SERVER</Input_Sel>'), text=sample_content('rx-v479/set_input_SERVER.xml'))
+            m.post(ctrl_uri, additional_matcher=lambda r: match_request(r, '<Input_Sel>GetParam</Input_Sel>'), text=sample_content('rx-v479/get_current_input_SERVER.xml'))
+
+        def match(request):
+            return handlers[request.hostname].match(request)
+
+        m.add_matcher(match)
+        return [rxv.RXV('http://%s/YamahaRemoteControl/ctrl' % ip) for ip in FAKE_IPS], handlers
+
+    @requests_mock.mock()
+    def test_crawl_matches_server_paths(self, m):
+        receivers, handlers = self.setup_receivers(m)
+        expected = receivers[0].server_paths()
+        actual = crawl_server_paths(receivers)
+        self.assertEqual(expected, actual)
+        self.assertEqual(30, len(actual))
+
+    @requests_mock.mock()
+    def test_crawl_uses_all_receivers(self, m):
+        receivers, handlers = self.setup_receivers(m)
+        started = threading.Barrier(len(receivers), timeout=5)
+        crawled = {}
+
+        def recording(rec):
+            iter_menu = rec._iter_menu
+
+            def wrapper(path_to_layer):
+                if rec.ctrl_url not in crawled:
+                    crawled[rec.ctrl_url] = []
+                    # both folders are taken before either is crawled
+                    started.wait()
+                entries = iter_menu(path_to_layer)
+                crawled[rec.ctrl_url].extend(_prefixed(path_to_layer, entries))
+                return entries
+            rec._iter_menu = wrapper
+
+        for rec in receivers:
+            recording(rec)
+        actual = crawl_server_paths(receivers)
+
+        self.assertEqual(30, len(actual))
+        for rec in receivers:
+            self.assertNotEqual([], crawled[rec.ctrl_url])
+            for path in crawled[rec.ctrl_url]:
+                self.assertIn(path, actual)
+
+    @requests_mock.mock()
+    def test_crawl_server_filter(self, m):
+        receivers, handlers = self.setup_receivers(m)
+        actual = crawl_server_paths(receivers, servers=["Other Server"])
+        self.assertEqual([("Other Server>Nothing to see here", "2>1")], actual)
+
+    @requests_mock.mock()
+    def test_crawl_deduplicates_receivers(self, m):
+        receivers, handlers = self.setup_receivers(m)
+        start = len(m.request_history)
+        actual = crawl_server_paths([receivers[0], receivers[0]])
+        self.assertEqual(30, len(actual))
+        hosts = set(r.hostname for r in m.request_history[start:])
+        self.assertEqual({FAKE_IPS[0]}, hosts)
@@ -0,0 +1,178 @@
+import threading
+
+import requests
+import testtools
+
+import rxv
+from rxv import events, ssdp
+from rxv.events import EventSubscriber, parse_propertyset
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+DEVICE_DESC = """<?xml version="1.0"?>
+<root xmlns="urn:schemas-upnp-org:device-1-0">
+  <device>
+    <deviceType>urn:schemas-upnp-org:device:MediaRenderer:1</deviceType>
+    <modelName>RX-V479</modelName>
+    <serviceList>
+      <service>
+        <serviceType>urn:schemas-upnp-org:service:RenderingControl:1</serviceType>
+        <serviceId>urn:upnp-org:serviceId:RenderingControl</serviceId>
+        <controlURL>/RenderingControl/ctrl</controlURL>
+        <eventSubURL>/RenderingControl/evt</eventSubURL>
+      </service>
+      <service>
+        <serviceType>urn:schemas-upnp-org:service:ConnectionManager:1</serviceType>
+        <serviceId>urn:upnp-org:serviceId:ConnectionManager</serviceId>
+        <controlURL>/ConnectionManager/ctrl</controlURL>
+        <eventSubURL></eventSubURL>
+      </service>
+    </serviceList>
+  </device>
+</root>"""
+
+PROPERTYSET = """<?xml version="1.0"?>
+<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0">
+  <e:property>
+    <LastChange>&lt;Event xmlns="urn:schemas-upnp-org:metadata-1-0/RCS/"&gt;&lt;InstanceID val="0"&gt;&lt;Volume channel="Master" val="42"/&gt;&lt;Mute channel="Master" val="0"/&gt;&lt;/InstanceID&gt;&lt;/Event&gt;</LastChange>
+  </e:property>
+</e:propertyset>"""
+
+
+class FakeUpnpDevice(BaseHTTPRequestHandler):
+    """Serves the device description and accepts GENA requests."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(200, DEVICE_DESC.encode('utf-8'))
+
+    def do_SUBSCRIBE(self):
+        device = self.server
+        if self.headers.get('SID'):
+            device.renewals.append(self.headers['SID'])
+            if self.headers['SID'] != 'uuid:sub-1' or device.expired:
+                return self._reply(412)
+            return self._reply(200, headers=[('SID', 'uuid:sub-1'), ('TIMEOUT', 'Second-300')])
+        device.callbacks.append(self.headers['CALLBACK'].strip('<>'))
+        self._reply(200, headers=[('SID', 'uuid:sub-1'), ('TIMEOUT', 'Second-300')])
+
+    def do_UNSUBSCRIBE(self):
+        self.server.unsubscribed.append(self.headers['SID'])
+        self._reply(200)
+
+
+class TestEvents(testtools.TestCase):
+
+    def setUp(self):
+        super(TestEvents, self).setUp()
+        self.device = HTTPServer(('127.0.0.1', 0), FakeUpnpDevice)
+        self.device.callbacks = []
+        self.device.renewals = []
+        self.device.unsubscribed = []
+        self.device.expired = False
+        thread = threading.Thread(target=self.device.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.device.server_close)
+        self.addCleanup(self.device.shutdown)
+        self.location = 'http://127.0.0.1:%d/desc.xml' % self.device.server_address[1]
+
+    def notify(self, sid='uuid:sub-1', seq=0, body=PROPERTYSET):
+        return requests.request('NOTIFY', self.device.callbacks[-1], data=body, headers={
+            'NT': 'upnp:event', 'NTS': 'upnp:propchange', 'SID': sid, 'SEQ': str(seq),
+        })
+
+    def test_upnp_services(self):
+        services = ssdp.upnp_services(self.location)
+        self.assertEqual(2, len(services))
+        self.assertEqual('urn:upnp-org:serviceId:RenderingControl', services[0].service_id)
+        self.assertEqual(self.location.replace('desc.xml', 'RenderingControl/evt'),
+                         services[0].event_sub_url)
+
+    def test_parse_propertyset(self):
+        properties = parse_propertyset(PROPERTYSET)
+        self.assertEqual('42', properties['Volume'])
+        self.assertEqual('0', properties['Mute'])
+
+    def test_subscribe_and_notify(self):
+        events = []
+        received = threading.Event()
+
+        def on_event(event):
+            events.append(event)
+            received.set()
+
+        subscriber = EventSubscriber(host='127.0.0.1', callback_host='127.0.0.1').start()
+        sids = subscriber.subscribe_device(self.location, on_event)
+        self.assertEqual(['uuid:sub-1'], sids)
+        self.assertEqual(1, len(self.device.callbacks))
+
+        self.assertEqual(200, self.notify(seq=3).status_code)
+        self.assertTrue(received.wait(1))
+        self.assertEqual('urn:upnp-org:serviceId:RenderingControl', events[0].service_id)
+        self.assertEqual(3, events[0].seq)
+        self.assertEqual('42', events[0].properties['Volume'])
+
+        self.assertEqual(412, self.notify(sid='uuid:unknown').status_code)
+
+        subscriber.renew('uuid:sub-1')
+        self.assertEqual(['uuid:sub-1'], self.device.renewals)
+
+        subscriber.stop()
+        self.assertEqual(['uuid:sub-1'], self.device.unsubscribed)
+
+    def test_renew_failing_subscribes_again(self):
+        self.patch(events, 'RETRY_INTERVAL', 0.01)
+        subscriber = EventSubscriber(host='127.0.0.1', callback_host='127.0.0.1').start()
+        self.addCleanup(subscriber.stop)
+        subscriber.subscribe_device(self.location, lambda e: None)
+        callback_url = subscriber._callback_url
+        failures = [OSError("Network is unreachable")]
+
+        def flaky_callback_url(*args):
+            if failures:
+                raise failures.pop()
+            return callback_url(*args)
+
+        subscriber._callback_url = flaky_callback_url
+        self.device.expired = True
+        subscriber.renew('uuid:sub-1')
+        for _ in range(100):
+            if len(self.device.callbacks) == 2:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual([], failures)
+        self.assertEqual(2, len(self.device.callbacks))
+        self.assertEqual(['uuid:sub-1'], list(subscriber._subscriptions))
+
+    def test_rxv_subscribe_events(self):
+        rec = rxv.RXV.__new__(rxv.RXV)
+        rec.ctrl_url = 'http://127.0.0.1/YamahaRemoteControl/ctrl'
+        rec.location = None
+        subscriber = EventSubscriber(host='127.0.0.1', callback_host='127.0.0.1').start()
+        self.addCleanup(subscriber.stop)
+        self.assertRaises(ValueError, rec.subscribe_events, lambda e: None, subscriber=subscriber)
+        self.assertIs(subscriber, rec.subscribe_events(lambda e: None, self.location, subscriber))
+        self.assertEqual(1, len(self.device.callbacks))
+
+        # discovered receivers know where they were found
+        rec.location = self.location
+        rec.subscribe_events(lambda e: None, subscriber=subscriber)
+        self.assertEqual(2, len(self.device.callbacks))
+
+    def test_rxv_details_without_location(self):
+        details = ssdp.RxvDetails('ctrl', 'desc', 'RX-V479', 'Living Room')
+        self.assertIsNone(details.location)
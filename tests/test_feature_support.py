@@ -4,6 +4,7 @@ from parameterized import parameterized
 import requests_mock
 import testtools
 import os
+import re
 
 import rxv
 
@@ -129,6 +130,45 @@ class TestFeaturesV675(testtools.TestCase):
             rxv.RXV.safe_get(res, rxv.rxv.STATION_OPTIONS)
         )
 
+    def test_decode_play_info(self):
+        from defusedxml import cElementTree as ET
+        res = ET.XML(sample_content('rx-v1030-tuner-response.xml'))
+        info = rxv.rxv.decode_play_info("Tuner", res)
+        self.assertTrue(info.playing)
+        self.assertEqual('ROCK M', info.artist)
+        self.assertEqual('RADIO & BOB!', info.album)
+        self.assertEqual('Black Stone Cherry - Burnin\'_', info.song)
+        self.assertEqual('RADIOBOB', info.station)
+        self.assertEqual('FM', info.band)
+        self.assertEqual(98.6, info.frequency)
+        self.assertEqual('MHz', info.frequency_unit)
+        self.assertIsNone(info.album_art_url)
+
+        res = ET.XML(sample_content('rx-v1030-netradio-response.xml'))
+        info = rxv.rxv.decode_play_info("NET_RADIO", res)
+        self.assertTrue(info.playing)
+        self.assertEqual('', info.artist)
+        self.assertEqual('Sober', info.song)
+        self.assertEqual('NDR 2 (HH)', info.station)
+        self.assertIsNone(info.band)
+        self.assertIsNone(info.frequency)
+
+    @requests_mock.mock()
+    def test_play_status(self, m):
+        rec = self.rec
+        m.post(rec.ctrl_url, text=sample_content('rx-v675-inputs-resp.xml'),
+               additional_matcher=lambda r: 'Input_Sel_Item' in r.text)
+        m.post(rec.ctrl_url, text=(
+            '<YAMAHA_AV rsp="GET" RC="0"><Main_Zone><Input>'
+            '<Input_Sel>NET RADIO</Input_Sel></Input></Main_Zone></YAMAHA_AV>'
+        ), additional_matcher=lambda r: '<Input_Sel>GetParam' in r.text)
+        m.post(rec.ctrl_url, text=sample_content('rx-v1030-netradio-response.xml'),
+               additional_matcher=lambda r: 'Play_Info' in r.text)
+
+        status = rec.play_status()
+        self.assertEqual(
+            rxv.rxv.PlayStatus(True, '', 'Undertow', 'Sober', 'NDR 2 (HH)'), status)
+
     @requests_mock.mock()
     def test_playback_support(self, m):
         rec = self.rec
@@ -167,3 +207,194 @@ class TestSurroundPrograms(testtools.TestCase):
             rec = rxv.RXV(FAKE_IP)
             programs = rec.surround_programs()
             self.assertIn("Standard", programs)
+
+
+OUTPUTS_RESPONSE = ('<YAMAHA_AV rsp="GET" RC="0"><System><Sound_Video><HDMI><Output>'
+                    '{}</Output></HDMI></Sound_Video></System></YAMAHA_AV>')
+ERROR_RESPONSE = '<YAMAHA_AV rsp="GET" RC="{}"></YAMAHA_AV>'
+PUT_RESPONSE = '<YAMAHA_AV rsp="PUT" RC="0"></YAMAHA_AV>'
+
+
+class TestHdmiOutputs(testtools.TestCase):
+
+    def setUp(self):
+        super(TestHdmiOutputs, self).setUp()
+        self.combined = True
+        self.error_rc = '3'
+        self.states = {'1': 'On', '2': 'Off'}
+        self.m = requests_mock.Mocker()
+        self.m.start()
+        self.addCleanup(self.m.stop)
+        self.m.post('http://%s/YamahaRemoteControl/ctrl' % FAKE_IP, text=self.respond)
+        self.rec = rxv.RXV(FAKE_IP, model_name='RX-V775')
+
+    def respond(self, request, context):
+        body = request.text
+        if 'cmd="PUT"' in body:
+            changes = [(p, s) for p, s in self.states.items() if '<OUT_%s>' % p in body]
+            if len(changes) > 1 and not self.combined:
+                return ERROR_RESPONSE.format(self.error_rc)
+            for port, _ in changes:
+                self.states[port] = 'On' if '<OUT_%s>On' % port in body else 'Off'
+            return PUT_RESPONSE
+        if '<Output>GetParam</Output>' in body:
+            if not self.combined:
+                return ERROR_RESPONSE.format(self.error_rc)
+            ports = sorted(self.states)
+        else:
+            ports = [p for p in self.states if '<OUT_%s>GetParam' % p in body]
+        return OUTPUTS_RESPONSE.format(''.join(
+            '<OUT_{0}>{1}</OUT_{0}>'.format(p, self.states[p]) for p in ports))
+
+    def test_outputs_in_one_request(self):
+        self.assertEqual({'hdmi1': 'on', 'hdmi2': 'off'}, self.rec.outputs)
+        self.assertEqual(1, len(self.m.request_history))
+
+    def test_outputs_fallback(self):
+        self.combined = False
+        self.assertEqual({'hdmi1': 'on', 'hdmi2': 'off'}, self.rec.outputs)
+        self.assertEqual(3, len(self.m.request_history))
+        self.assertEqual({'hdmi1': 'on', 'hdmi2': 'off'}, self.rec.outputs)
+        self.assertEqual(5, len(self.m.request_history))
+
+    def test_transient_error_is_not_remembered(self):
+        self.combined = False
+        self.error_rc = '1'
+        self.assertEqual({'hdmi1': 'on', 'hdmi2': 'off'}, self.rec.outputs)
+        self.rec.enable_outputs({'hdmi1': False, 'hdmi2': True})
+        self.assertEqual(6, len(self.m.request_history))
+        self.combined = True
+        self.assertEqual({'hdmi1': 'off', 'hdmi2': 'on'}, self.rec.outputs)
+        self.rec.enable_outputs({'hdmi1': True, 'hdmi2': False})
+        self.assertEqual(8, len(self.m.request_history))
+
+    def test_enable_outputs(self):
+        self.rec.enable_outputs({'hdmi1': False, 'HDMI2': True})
+        self.assertEqual(1, len(self.m.request_history))
+        self.assertEqual({'hdmi1': 'off', 'hdmi2': 'on'}, self.rec.outputs)
+        self.rec.enable_output('hdmi2', False)
+        self.assertEqual({'1': 'Off', '2': 'Off'}, self.states)
+        self.assertRaises(rxv.exceptions.UnknownPort, self.rec.enable_output, 'av1', True)
+
+    def test_enable_outputs_fallback(self):
+        self.combined = False
+        self.rec.enable_outputs({'hdmi1': False, 'hdmi2': True})
+        self.assertEqual({'1': 'Off', '2': 'On'}, self.states)
+        self.assertEqual(3, len(self.m.request_history))
+
+
+SOUND_STATUS_RESPONSE = (
+    '<YAMAHA_AV rsp="GET" RC="0"><{zone}><Basic_Status>'
+    '<Power_Control><Power>On</Power></Power_Control>'
+    '<Surround><Program_Sel><Current><Straight>{straight}</Straight>'
+    '<Enhancer>Off</Enhancer><Sound_Program>{program}</Sound_Program>'
+    '</Current></Program_Sel><_3D_Cinema_DSP>Auto</_3D_Cinema_DSP></Surround>'
+    '<Sound_Video><Tone>{manual}<Bass><Val>{bass}</Val><Exp>1</Exp><Unit>dB</Unit></Bass>'
+    '<Treble><Val>{treble}</Val><Exp>1</Exp><Unit>dB</Unit></Treble>{end_manual}</Tone>'
+    '<Adaptive_DRC>Off</Adaptive_DRC><Direct><Mode>{direct}</Mode></Direct>'
+    '<Extra_Bass>{extra_bass}</Extra_Bass></Sound_Video>'
+    '</Basic_Status></{zone}></YAMAHA_AV>')
+# state of the fake receiver -> pattern of a PUT changing it
+SOUND_SETTING_PUTS = {
+    'straight': re.compile(r'<Straight>(\w+)</Straight>'),
+    'program': re.compile(r'<Sound_Program>([^<]+)</Sound_Program>'),
+    'direct': re.compile(r'<Direct><Mode>(\w+)</Mode>'),
+    'bass': re.compile(r'<Bass><Val>(-?\d+)</Val>'),
+    'treble': re.compile(r'<Treble><Val>(-?\d+)</Val>'),
+    'extra_bass': re.compile(r'<Extra_Bass>(\w+)</Extra_Bass>'),
+}
+
+
+class TestSoundSettings(testtools.TestCase):
+
+    def setUp(self):
+        super(TestSoundSettings, self).setUp()
+        self.state = {'straight': 'Off', 'program': '5ch Stereo', 'direct': 'Off',
+                      'bass': '-15', 'treble': '0', 'extra_bass': 'Off'}
+        # bass and treble below Tone/Manual, as in Zone_2 of the RX-A2060
+        self.manual_tone = False
+        self.m = requests_mock.Mocker()
+        self.m.start()
+        self.addCleanup(self.m.stop)
+        self.m.post('http://%s/YamahaRemoteControl/ctrl' % FAKE_IP, text=self.respond)
+        self.rec = rxv.RXV(FAKE_IP, model_name='RX-V479')
+
+    def respond(self, request, context):
+        body = request.text
+        if 'cmd="PUT"' in body:
+            for name, pattern in SOUND_SETTING_PUTS.items():
+                m = pattern.search(body)
+                if m is not None:
+                    self.state[name] = m.group(1)
+            if '<Sound_Program>' in body:
+                self.state['straight'] = 'Off'
+            return PUT_RESPONSE
+        return SOUND_STATUS_RESPONSE.format(
+            zone='Zone_2' if '<Zone_2>' in body else 'Main_Zone',
+            manual='<Manual>' if self.manual_tone else '',
+            end_manual='</Manual>' if self.manual_tone else '',
+            **self.state)
+
+    def puts(self):
+        return [r.text for r in self.m.request_history if 'cmd="PUT"' in r.text]
+
+    def test_read_in_one_request(self):
+        settings = self.rec.sound_settings()
+        self.assertEqual(rxv.rxv.SoundSettings(
+            program='5ch Stereo', sound_program='5ch Stereo', straight=False,
+            direct=False, enhancer=False, bass=-1.5, treble=0.0, adaptive_drc='Off',
+            cinema_dsp_3d='Auto', dialogue_lift=None, dialogue_level=None,
+            extra_bass='Off'), settings)
+        self.assertEqual(1, len(self.m.request_history))
+
+    def test_surround_program(self):
+        self.assertEqual('5ch Stereo', self.rec.surround_program)
+        self.state['straight'] = 'On'
+        self.assertEqual('Straight', self.rec.surround_program)
+        self.state['direct'] = 'On'
+        self.assertEqual('Direct', self.rec.surround_program)
+        self.assertEqual(3, len(self.m.request_history))
+
+    def test_minimal_puts(self):
+        self.state['direct'] = 'On'
+        settings = self.rec.update_sound_settings(
+            program='5ch Stereo', bass=-1.5, treble=2, extra_bass='Auto')
+        self.assertEqual([
+            '<YAMAHA_AV cmd="PUT"><Main_Zone><Sound_Video><Direct><Mode>Off</Mode>'
+            '</Direct></Sound_Video></Main_Zone></YAMAHA_AV>',
+            '<YAMAHA_AV cmd="PUT"><Main_Zone><Sound_Video><Tone><Treble><Val>20</Val>'
+            '<Exp>1</Exp><Unit>dB</Unit></Treble></Tone></Sound_Video></Main_Zone></YAMAHA_AV>',
+            '<YAMAHA_AV cmd="PUT"><Main_Zone><Sound_Video><Extra_Bass>Auto</Extra_Bass>'
+            '</Sound_Video></Main_Zone></YAMAHA_AV>',
+        ], self.puts())
+        self.assertEqual('5ch Stereo', settings.program)
+        self.assertFalse(settings.direct)
+        self.assertEqual(2, settings.treble)
+        self.assertEqual(settings, self.rec.sound_settings())
+
+    def test_surround_program_setter(self):
+        self.rec.surround_program = 'Straight'
+        self.assertEqual(1, len(self.puts()))
+        self.assertIn('<Straight>On</Straight>', self.puts()[0])
+        self.assertEqual('Straight', self.rec.surround_program)
+        self.rec.surround_program = '5ch Stereo'
+        self.assertEqual(2, len(self.puts()))
+        self.assertIn('<Sound_Program>5ch Stereo</Sound_Program>', self.puts()[1])
+        self.assertEqual('5ch Stereo', self.rec.surround_program)
+        self.rec.surround_program = '5ch Stereo'
+        self.assertEqual(2, len(self.puts()))
+
+    def test_tone_of_zone(self):
+        self.manual_tone = True
+        zone2 = rxv.RXV(FAKE_IP, model_name='RX-A2060', zone='Zone_2')
+        self.assertEqual(-1.5, zone2.sound_settings().bass)
+        zone2.update_sound_settings(bass=3)
+        self.assertEqual(
+            '<YAMAHA_AV cmd="PUT"><Zone_2><Sound_Video><Tone><Manual><Bass><Val>30</Val>'
+            '<Exp>1</Exp><Unit>dB</Unit></Bass></Manual></Tone></Sound_Video></Zone_2>'
+            '</YAMAHA_AV>', self.puts()[0])
+        self.assertEqual(3, zone2.sound_settings().bass)
+
+    def test_unsupported_setting(self):
+        self.assertRaises(AssertionError, self.rec.update_sound_settings, dialogue_level=2)
+        self.assertRaises(AssertionError, self.rec.update_sound_settings, loudness=2)
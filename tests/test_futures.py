@@ -0,0 +1,148 @@
+import concurrent.futures
+import threading
+
+import requests_mock
+import testtools
+
+import rxv
+from rxv import futures
+from rxv.scheduler import AUTOMATION, current_priority, priority
+
+DESC_XML = 'http://10.0.0.%d/YamahaRemoteControl/desc.xml'
+CTRL_URL = 'http://10.0.0.%d/YamahaRemoteControl/ctrl'
+VOLUME_RESPONSE = ('<YAMAHA_AV rsp="GET" RC="0"><Main_Zone><Volume><Lvl>'
+                   '<Val>{}</Val><Exp>1</Exp><Unit>dB</Unit>'
+                   '</Lvl></Volume></Main_Zone></YAMAHA_AV>')
+PUT_RESPONSE = '<YAMAHA_AV rsp="PUT" RC="0"><Main_Zone></Main_Zone></YAMAHA_AV>'
+
+
+def sample_content(name):
+    with open('tests/samples/%s' % name, encoding='utf-8') as f:
+        return f.read()
+
+
+class TestFutures(testtools.TestCase):
+
+    def setUp(self):
+        super(TestFutures, self).setUp()
+        self.addCleanup(futures.shutdown)
+        self.m = requests_mock.Mocker()
+        self.m.start()
+        self.addCleanup(self.m.stop)
+        for host in (1, 2):
+            self.m.get(DESC_XML % host, text=sample_content('rx-v675-desc.xml'))
+            self.m.post(CTRL_URL % host, text=VOLUME_RESPONSE.format(-400 - host * 10),
+                        additional_matcher=lambda r: 'GetParam' in r.text)
+            self.m.post(CTRL_URL % host, text=PUT_RESPONSE,
+                        additional_matcher=lambda r: 'GetParam' not in r.text)
+        self.rx1 = rxv.RXV(CTRL_URL % 1)
+        self.rx2 = rxv.RXV(CTRL_URL % 2)
+
+    def test_operations(self):
+        self.assertEqual([-41.0, -42.0], rxv.gather(
+            self.rx1.submit('volume'), self.rx2.submit('volume')))
+        self.assertIsNone(self.rx1.submit('volume', -30).result())
+        self.assertIn('<Val>-300</Val>', self.m.request_history[-1].text)
+        self.assertEqual('Main_Zone', self.rx1.submit(lambda rx: rx.zone).result())
+        self.assertEqual(['Main_Zone', 'Zone_2'], self.rx1.submit('zones').result())
+        self.assertRaises(TypeError, self.rx1.submit('volume', -30, -20).result)
+
+    def test_serialized_per_receiver(self):
+        running = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def operation(rx, index):
+            with lock:
+                overlaps.append(bool(running))
+                running.append(index)
+            threading.Event().wait(0.01)
+            with lock:
+                running.remove(index)
+            return index
+
+        results = rxv.gather(*[self.rx1.submit(operation, i) for i in range(5)])
+        self.assertEqual(list(range(5)), results)
+        self.assertEqual([False] * 5, overlaps)
+
+    def test_parallel_across_receivers(self):
+        barrier = threading.Barrier(2, timeout=5)
+        rxv.gather(self.rx1.submit(lambda rx: barrier.wait()),
+                   self.rx2.submit(lambda rx: barrier.wait()), timeout=5)
+
+    def test_zone_controllers_share_worker(self):
+        zone2 = self.rx1.zone_controllers()[1]
+        threads = rxv.gather(self.rx1.submit(lambda rx: threading.current_thread()),
+                             zone2.submit(lambda rx: threading.current_thread()))
+        self.assertIs(threads[0], threads[1])
+
+    def test_keeps_priority(self):
+        with priority(AUTOMATION):
+            future = self.rx1.submit(lambda rx: current_priority())
+        self.assertEqual(AUTOMATION, future.result())
+
+    def test_gather_raises_first_error(self):
+        def fail(rx):
+            raise KeyError('x')
+
+        self.assertRaises(KeyError, rxv.gather,
+                          self.rx1.submit('volume'), self.rx2.submit(fail))
+
+    def test_gather_timeout(self):
+        event = threading.Event()
+        self.addCleanup(event.set)
+        self.assertRaises(futures.TimeoutError, rxv.gather,
+                          self.rx1.submit(lambda rx: event.wait(5)), timeout=0.01)
+        self.assertRaises(TypeError, rxv.gather, self.rx1.submit('volume'), timout=1)
+
+    def test_done_callback(self):
+        called = threading.Event()
+        done = []
+        future = self.rx1.submit('volume')
+        future.add_done_callback(lambda f: called.set())
+        self.assertEqual(-41.0, future.result(5))
+        self.assertTrue(called.wait(5))
+        # callbacks added later are called right away
+        future.add_done_callback(done.append)
+        self.assertEqual([future], done)
+        self.assertIsNone(future.exception())
+
+    def test_standard_futures(self):
+        future = self.rx1.submit('volume')
+        self.assertIsInstance(future, concurrent.futures.Future)
+        done, _ = concurrent.futures.wait([future], 5)
+        self.assertEqual(set([future]), done)
+        self.assertEqual([-41.0], [f.result() for f in
+                                   concurrent.futures.as_completed([future])])
+
+    def test_cancel_queued(self):
+        event = threading.Event()
+        self.addCleanup(event.set)
+        blocking = self.rx1.submit(lambda rx: event.wait(5))
+        ran = []
+        queued = self.rx1.submit(ran.append)
+        self.assertTrue(queued.cancel())
+        event.set()
+        blocking.result(5)
+        self.rx1.submit('volume').result(5)
+        self.assertTrue(queued.cancelled())
+        self.assertEqual([], ran)
+
+    def test_python2_fallback(self):
+        self.patch(futures, 'Future', futures._Future)
+        self.patch(futures, '_wait_all', futures._wait_futures)
+        self.patch(futures, 'TimeoutError', futures._TimeoutError)
+        futures.shutdown()
+        event = threading.Event()
+        self.addCleanup(event.set)
+        blocking = self.rx1.submit(lambda rx: event.wait(5))
+        queued = self.rx1.submit(lambda rx: 1 / 0)
+        self.assertIsInstance(blocking, futures._Future)
+        self.assertRaises(futures._TimeoutError, rxv.gather, blocking, timeout=0.01)
+        event.set()
+        self.assertTrue(rxv.gather(blocking, timeout=5)[0])
+        self.assertIsInstance(queued.exception(5), ZeroDivisionError)
+        self.assertFalse(queued.cancel())
+        cancelled = futures._Future()
+        self.assertTrue(cancelled.cancel())
+        self.assertRaises(futures._CancelledError, cancelled.result)
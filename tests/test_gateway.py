@@ -0,0 +1,95 @@
+import threading
+
+import requests_mock
+import testtools
+
+import rxv
+from rxv.gateway import Gateway
+
+RECEIVER_CTRL = 'http://10.0.0.0/YamahaRemoteControl/ctrl'
+RECEIVER_DESC = 'http://10.0.0.0/YamahaRemoteControl/desc.xml'
+
+VOLUME_RESPONSE = ('<YAMAHA_AV rsp="GET" RC="0"><Main_Zone><Volume><Lvl>'
+                   '<Val>{}</Val><Exp>1</Exp><Unit>dB</Unit>'
+                   '</Lvl></Volume></Main_Zone></YAMAHA_AV>')
+PUT_RESPONSE = '<YAMAHA_AV rsp="PUT" RC="0"><Main_Zone></Main_Zone></YAMAHA_AV>'
+
+
+def sample_content(name):
+    with open('tests/samples/%s' % name, encoding='utf-8') as f:
+        return f.read()
+
+
+class TestGateway(testtools.TestCase):
+
+    def setUp(self):
+        super(TestGateway, self).setUp()
+        self.volume = -450
+        self.mock = requests_mock.Mocker(real_http=True)
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.mock.get(RECEIVER_DESC, text=sample_content('rx-v675-desc.xml'))
+        self.mock.post(RECEIVER_CTRL, text=lambda r, c: VOLUME_RESPONSE.format(self.volume),
+                       additional_matcher=lambda r: 'GetParam' in r.text)
+        self.mock.post(RECEIVER_CTRL, text=self.put,
+                       additional_matcher=lambda r: 'GetParam' not in r.text)
+
+        self.gateway = Gateway(RECEIVER_CTRL, poll_interval=60).start()
+        self.addCleanup(self.gateway.stop)
+
+    def put(self, request, context):
+        self.volume = -400
+        return PUT_RESPONSE
+
+    def receiver_requests(self, text):
+        return len([r for r in self.mock.request_history
+                    if r.hostname == '10.0.0.0' and text in (r.text or '')])
+
+    def test_clients_share_cached_gets(self):
+        clients = [rxv.RXV(self.gateway.url) for _ in range(3)]
+        self.assertEqual([-45.0] * 3, [c.volume for c in clients])
+        self.assertEqual(1, self.receiver_requests('<Lvl>GetParam</Lvl>'))
+        self.assertEqual(['Main_Zone', 'Zone_2'], clients[0].zones())
+
+    def test_put_is_forwarded_and_invalidates(self):
+        client = rxv.RXV(self.gateway.url)
+        self.assertEqual(-45.0, client.volume)
+        client.volume = -40
+        self.assertEqual(1, self.receiver_requests('<Val>-400</Val>'))
+        self.assertEqual(-40.0, client.volume)
+        self.assertEqual(2, self.receiver_requests('<Lvl>GetParam</Lvl>'))
+
+    def test_poll_notifies_subscribers(self):
+        events = []
+        changed = threading.Event()
+
+        def on_change(request_body, response_body):
+            events.append(response_body)
+            changed.set()
+
+        self.gateway.subscribe(on_change)
+        client = rxv.RXV(self.gateway.url)
+        client.volume
+        self.gateway.poll()
+        self.assertEqual([], events)
+
+        self.volume = -300
+        self.gateway.poll()
+        self.assertTrue(changed.wait(1))
+        self.assertIn(b'<Val>-300</Val>', events[0])
+
+    def test_poll_racing_a_put_is_dropped(self):
+        client = rxv.RXV(self.gateway.url)
+        self.assertEqual(-45.0, client.volume)
+        upstream = self.gateway._upstream
+
+        def racing_upstream(body):
+            # the poll's GET is answered, then a client's PUT goes through
+            response = upstream(body)
+            self.gateway._upstream = upstream
+            client.volume = -40
+            return response
+
+        self.gateway._upstream = racing_upstream
+        self.gateway.poll()
+        self.assertEqual(-40.0, client.volume)
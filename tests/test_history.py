@@ -0,0 +1,112 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import testtools
+
+from rxv.history import History, HistoryEntry
+from rxv.rxv import BasicStatus, PlayStatus
+
+ON = BasicStatus('On', -45.0, 'Off', 'NET RADIO')
+LOUDER = ON._replace(volume=-30.0)
+STANDBY = ON._replace(on='Standby')
+SONG = PlayStatus(True, None, None, 'Song 1', 'Radio Paradise')
+
+
+class TestHistory(testtools.TestCase):
+
+    def test_only_changes_are_kept(self):
+        history = History()
+        self.assertTrue(history.record('Main_Zone', ON, at=100))
+        self.assertFalse(history.record('Main_Zone', ON, at=101))
+        self.assertTrue(history.record('Main_Zone', play_status=SONG, at=102))
+        self.assertFalse(history.record('Main_Zone', ON, SONG, at=103))
+        self.assertEqual(2, len(history))
+        self.assertEqual(
+            HistoryEntry(102, 'On', -45.0, 'Off', 'NET RADIO',
+                         True, None, None, 'Song 1', 'Radio Paradise'),
+            history.state_at('Main_Zone', 103))
+
+    def test_state_at(self):
+        history = History()
+        history.record('Main_Zone', ON, at=100)
+        history.record('Main_Zone', LOUDER, at=200)
+        history.record('Main_Zone', STANDBY, at=300)
+        self.assertIsNone(history.state_at('Main_Zone', 99))
+        self.assertIsNone(history.state_at('Zone_2', 150))
+        self.assertEqual(-45.0, history.state_at('Main_Zone', 100).volume)
+        self.assertEqual(-45.0, history.state_at('Main_Zone', 199.9).volume)
+        self.assertEqual(-30.0, history.state_at('Main_Zone', 200).volume)
+        self.assertEqual('Standby', history.state_at('Main_Zone', 1000).on)
+
+    def test_between(self):
+        history = History()
+        history.record('Main_Zone', ON, at=100)
+        history.record('Main_Zone', LOUDER, at=200)
+        history.record('Main_Zone', STANDBY, at=300)
+        history.record('Zone_2', ON, at=150)
+        self.assertEqual([200], [e.time for e in history.between('Main_Zone', 150, 300)])
+        self.assertEqual([100, 200, 300], [e.time for e in history.between('Main_Zone')])
+        self.assertEqual([150], [e.time for e in history.between('Zone_2', end=151)])
+        self.assertEqual(['Main_Zone', 'Zone_2'], history.zones())
+
+    def test_ring_overwrites_oldest(self):
+        history = History(capacity=3)
+        for i in range(5):
+            history.record('Main_Zone', ON._replace(volume=-50.0 + i), at=i)
+        self.assertEqual([(2, -48.0), (3, -47.0), (4, -46.0)],
+                         [(e.time, e.volume) for e in history.between('Main_Zone')])
+        self.assertIsNone(history.state_at('Main_Zone', 1))
+
+    def test_out_of_order(self):
+        history = History()
+        history.record('Main_Zone', ON, at=100)
+        self.assertTrue(history.record('Main_Zone', LOUDER, at=50))
+        self.assertEqual([(100, -45.0), (100, -30.0)],
+                         [(e.time, e.volume) for e in history.between('Main_Zone')])
+        self.assertEqual(-30.0, history.state_at('Main_Zone', 100).volume)
+
+    def test_strings_are_interned(self):
+        history = History()
+        for i in range(100):
+            history.record('Main_Zone', ON._replace(volume=-80.0 + i / 2), SONG, at=i)
+        # None and the distinct values of on, mute, input, playing, song and station
+        self.assertEqual(7, len(history._strings))
+
+    def test_save_and_load(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        filename = os.path.join(tmpdir, 'history.gz')
+
+        history = History(capacity=10)
+        history.record('Main_Zone', ON, at=1500000000.123)
+        history.record('Main_Zone', BasicStatus('On', None, 'Off', 'HDMI1'), SONG,
+                       at=1500000060.5)
+        history.record('Zone_2', STANDBY, at=1500000001)
+        history.save(filename)
+
+        loaded = History.load(filename)
+        self.assertEqual(10, loaded.capacity)
+        self.assertEqual(history.between('Main_Zone'), loaded.between('Main_Zone'))
+        self.assertEqual(history.between('Zone_2'), loaded.between('Zone_2'))
+        # continues where the saved one stopped
+        self.assertFalse(loaded.record('Zone_2', STANDBY, at=1500000100))
+
+    def test_load_rejects_other_files(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        filename = os.path.join(tmpdir, 'history.gz')
+        with open(filename, 'w') as f:
+            f.write('{}')
+        self.assertRaises(ValueError, History.load, filename)
+
+    def test_smaller_than_objects(self):
+        history = History(capacity=1000)
+        statuses = [ON._replace(volume=-80.0 + i / 2) for i in range(1000)]
+        for i, status in enumerate(statuses):
+            history.record('Main_Zone', status, at=i)
+        ring = history._rings['Main_Zone']
+        size = sum(sys.getsizeof(a) for a in (ring.times, ring.volumes, ring.codes))
+        objects = sum(sys.getsizeof(s) + sys.getsizeof(s.volume) for s in statuses)
+        self.assertLess(size * 2, objects)
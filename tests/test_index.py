@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+
+import requests_mock
+import testtools
+
+import rxv
+from rxv.index import ServerPathIndex, iter_index_file
+from tests.menu_list_fakes import MenuListHandler
+
+FAKE_IP = '10.0.0.0'
+DESC_XML_URI = 'http://%s/YamahaRemoteControl/desc.xml' % FAKE_IP
+CTRL_URI = 'http://%s/YamahaRemoteControl/ctrl' % FAKE_IP
+
+PATHS = [
+    ("Fancy Server>Radio>Stream 1", "1>2>1"),
+    ("Fancy Server>Radio>Stream 17", "1>2>17"),
+    ("Fancy Server>Some Fancy Song 1", "1>3"),
+    ("Other Server>Nothing to see here", "2>1"),
+]
+
+
+def sample_content(name):
+    with open('tests/samples/%s' % name, encoding='utf-8') as f:
+        return f.read()
+
+
+def match_request(request, text_match):
+    return text_match in (request.text or '')
+
+
+class TestServerPathIndex(testtools.TestCase):
+
+    def setUp(self):
+        super(TestServerPathIndex, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def test_lookups(self):
+        index = ServerPathIndex(PATHS)
+        self.assertEqual(4, len(index))
+        self.assertEqual("1>2>17", index.get("Fancy Server>Radio>Stream 17"))
+        self.assertEqual([1, 2, 17], index.resolve("Fancy Server>Radio>Stream 17"))
+        self.assertIsNone(index.resolve("Fancy Server>Radio>Stream 66"))
+        self.assertEqual(["Fancy Server", "Other Server"], index.servers())
+        self.assertEqual(
+            ["Fancy Server>Radio>Stream 1", "Fancy Server>Radio>Stream 17"],
+            [name for name, _ in index.prefix("Fancy Server>Radio>")])
+        self.assertEqual(
+            [("Other Server>Nothing to see here", "2>1")],
+            list(index.search("nothing")))
+
+    def test_save_load(self):
+        filename = os.path.join(self.tmpdir, 'paths.gz')
+        index = ServerPathIndex(PATHS, receiver=CTRL_URI, crawled_at=1234.5)
+        index.save(filename)
+
+        loaded = ServerPathIndex.load(filename)
+        self.assertEqual(list(index), list(loaded))
+        self.assertEqual(CTRL_URI, loaded.receiver)
+        self.assertEqual(1234.5, loaded.crawled_at)
+
+        header, entries = iter_index_file(filename)
+        self.assertEqual(1, header['version'])
+        self.assertEqual(4, header['entries'])
+        self.assertEqual(sorted(PATHS), list(entries))
+
+    def test_load_invalid(self):
+        filename = os.path.join(self.tmpdir, 'paths.gz')
+        with open(filename, 'w') as f:
+            f.write('garbage')
+        self.assertRaises(ValueError, ServerPathIndex.load, filename)
+
+    @requests_mock.mock()
+    def test_server_select_with_index(self, m):
+        menu_list_handler = MenuListHandler()
+        m.add_matcher(lambda r: menu_list_handler.match(r))
+
+        m.get(DESC_XML_URI, text=sample_content('rx-v479-desc.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel_Item>GetParam</Input_Sel_Item>'), text=sample_content('rx-v479/get_inputs.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel>SERVER</Input_Sel>'), text=sample_content('rx-v479/set_input_SERVER.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel>GetParam</Input_Sel>'), text=sample_content('rx-v479/get_current_input_SERVER.xml'))
+
+        rec = rxv.RXV(FAKE_IP)
+        index = ServerPathIndex.crawl(rec)
+        self.assertEqual(30, len(index))
+        self.assertEqual(CTRL_URI, index.receiver)
+
+        rec.server_select("Fancy Server>Radio>Stream 17", index=index)
+        self.assertEqual((4, "Stream 17"), menu_list_handler.selected)
@@ -0,0 +1,170 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import open
+
+import requests_mock
+import testtools
+
+import rxv
+from rxv.exceptions import Timeout
+from rxv.latency import INPUT, MAX_LATENCY, POWER_ON, LatencyProfiles
+
+CTRL_URL = 'http://10.0.0.3/YamahaRemoteControl/ctrl'
+DESC_XML = 'http://10.0.0.3/YamahaRemoteControl/desc.xml'
+PUT_RESPONSE = '<YAMAHA_AV rsp="PUT" RC="0"></YAMAHA_AV>'
+ERROR_RESPONSE = '<YAMAHA_AV rsp="GET" RC="2"></YAMAHA_AV>'
+CONFIG_RESPONSE = ('<YAMAHA_AV rsp="GET" RC="0"><SERVER><Config>'
+                   '<Feature_Availability>{}</Feature_Availability>'
+                   '</Config></SERVER></YAMAHA_AV>')
+
+
+def sample_content(name):
+    with open('tests/samples/%s' % name, encoding='utf-8') as f:
+        return f.read()
+
+
+class TestLatencyProfiles(testtools.TestCase):
+
+    def setUp(self):
+        super(TestLatencyProfiles, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.filename = os.path.join(self.tmpdir, 'latency.json')
+
+    def test_running_average(self):
+        profiles = LatencyProfiles()
+        self.assertIsNone(profiles.expected('RX-V479', POWER_ON))
+        profiles.observe('RX-V479', POWER_ON, 4.0)
+        self.assertEqual(4.0, profiles.expected('RX-V479', POWER_ON))
+        profiles.observe('RX-V479', POWER_ON, 2.0)
+        self.assertAlmostEqual(3.4, profiles.expected('RX-V479', POWER_ON))
+        self.assertIsNone(profiles.expected('RX-V479', INPUT))
+
+    def test_persisted(self):
+        LatencyProfiles(self.filename).observe('RX-V479', INPUT, 1.5)
+        self.assertEqual(1.5, LatencyProfiles(self.filename).expected('RX-V479', INPUT))
+
+    def test_persisted_without_os_replace(self):
+        def replace(src, dst):
+            raise AttributeError('replace')
+
+        # as on Python 2
+        self.patch(os, 'replace', replace)
+        profiles = LatencyProfiles(self.filename)
+        profiles.observe('RX-V479', INPUT, 1.5)
+        profiles.observe('RX-V479', INPUT, 1.5)
+        self.assertEqual(1.5, LatencyProfiles(self.filename).expected('RX-V479', INPUT))
+        self.assertEqual(['latency.json'], os.listdir(self.tmpdir))
+
+    def test_unreadable_file_is_ignored(self):
+        with open(self.filename, 'w') as f:
+            f.write(u'{"format": "something else"}')
+        profiles = LatencyProfiles(self.filename)
+        self.assertIsNone(profiles.expected('RX-V479', INPUT))
+        profiles.observe('RX-V479', INPUT, 1.0)
+        with open(self.filename) as f:
+            self.assertEqual('rxv-latency', json.load(f)['format'])
+
+
+class TestWaitUntilReady(testtools.TestCase):
+
+    def setUp(self):
+        super(TestWaitUntilReady, self).setUp()
+        self.boot_time = 0.5
+        # answer probes during the boot with an error instead of Not Ready
+        self.reject = False
+        self.powered_on = None
+        self.probes = []
+        m = requests_mock.Mocker()
+        m.start()
+        self.addCleanup(m.stop)
+        m.get(DESC_XML, text=sample_content('rx-v479-desc.xml'))
+        m.post(CTRL_URL, text=sample_content('rx-v479/get_power.xml'),
+               additional_matcher=lambda r: '<Power>GetParam</Power>' in r.text)
+        m.post(CTRL_URL, text=sample_content('rx-v479/get_inputs.xml'),
+               additional_matcher=lambda r: '<Input_Sel_Item>GetParam' in r.text)
+        m.post(CTRL_URL, text=sample_content('rx-v479/get_current_input_SERVER.xml'),
+               additional_matcher=lambda r: '<Input_Sel>GetParam' in r.text)
+        m.post(CTRL_URL, text=self.config,
+               additional_matcher=lambda r: '<Config>GetParam' in r.text)
+        m.post(CTRL_URL, text=self.put,
+               additional_matcher=lambda r: 'GetParam' not in r.text)
+        self.rec = rxv.RXV(CTRL_URL, model_name='RX-V479')
+        self.profiles = LatencyProfiles()
+
+    def put(self, request, context):
+        self.powered_on = time.time()
+        return PUT_RESPONSE
+
+    def config(self, request, context):
+        elapsed = time.time() - self.powered_on
+        self.probes.append(elapsed)
+        if self.reject and elapsed < self.boot_time:
+            return ERROR_RESPONSE
+        return CONFIG_RESPONSE.format('Ready' if elapsed >= self.boot_time else 'Not Ready')
+
+    def test_learns_boot_time(self):
+        self.rec.on = True
+        self.rec.wait_until_ready(profiles=self.profiles)
+        unlearned_probes = len(self.probes)
+        learned = self.profiles.expected('RX-V479', POWER_ON)
+        self.assertThat(learned, testtools.matchers.GreaterThan(0.49))
+
+        # probes once, sleeps through most of the boot, then probes a few times
+        self.probes = []
+        self.rec.on = True
+        self.rec.wait_until_ready(profiles=self.profiles)
+        self.assertGreater(self.probes[1], 0.8 * learned - 0.05)
+        self.assertLess(len(self.probes), unlearned_probes)
+
+    def test_rejected_probes_mean_not_ready(self):
+        self.reject = True
+        self.boot_time = 0.3
+        self.rec.on = True
+        self.rec.wait_until_ready(profiles=self.profiles)
+        self.assertGreater(len(self.probes), 1)
+        self.assertThat(self.profiles.expected('RX-V479', POWER_ON),
+                        testtools.matchers.GreaterThan(0.29))
+
+    def test_already_ready(self):
+        self.powered_on = time.time() - 10
+        self.rec.wait_until_ready(profiles=self.profiles)
+        self.assertEqual(1, len(self.probes))
+        self.assertIsNone(self.profiles.expected('RX-V479', POWER_ON))
+
+    def test_already_on(self):
+        self.rec.on = True
+        self.powered_on = time.time() - 10
+        self.rec.wait_until_ready(profiles=self.profiles)
+        self.assertEqual(1, len(self.probes))
+        self.assertIsNone(self.profiles.expected('RX-V479', POWER_ON))
+
+    def test_stale_transition_is_not_learned(self):
+        self.rec.on = True
+        self.rec._transition = (POWER_ON, time.time() - 3600)
+        self.boot_time = 0.2
+        self.rec.wait_until_ready(profiles=self.profiles)
+        self.assertIsNone(self.profiles.expected('RX-V479', POWER_ON))
+
+        # and an input change after it is learned as one
+        self.rec._transition = (POWER_ON, time.time() - 3600)
+        self.rec.input = 'AirPlay'
+        self.rec.wait_until_ready(profiles=self.profiles)
+        self.assertIsNone(self.profiles.expected('RX-V479', POWER_ON))
+        self.assertLess(self.profiles.expected('RX-V479', INPUT), 1)
+
+    def test_learned_latency_is_capped(self):
+        self.boot_time = 0.2
+        self.rec.on = True
+        self.rec._transition = (POWER_ON, time.time() - MAX_LATENCY + 0.05)
+        self.rec.wait_until_ready(profiles=self.profiles)
+        self.assertEqual(MAX_LATENCY, self.profiles.expected('RX-V479', POWER_ON))
+
+    def test_timeout(self):
+        self.boot_time = 10
+        self.rec.on = True
+        self.assertRaises(Timeout, self.rec.wait_until_ready, 0.3, self.profiles)
+        self.assertIsNone(self.rec._transition)
@@ -0,0 +1,124 @@
+import threading
+
+import testtools
+
+from rxv import RXV
+from rxv.exceptions import Timeout
+from rxv.macro import (MENU_READY, POWER_ON, READY, Condition, Macro, MacroError,
+                       Step, assign, call)
+from rxv.scheduler import AUTOMATION, current_priority
+
+
+class FakeRXV(object):
+    """Just enough of RXV for the macro engine, shared by zone copies."""
+
+    def __init__(self, log, not_ready=0):
+        self.zone = 'Main_Zone'
+        self.on = False
+        self.log = log
+        self.not_ready = [not_ready]
+
+    def is_ready(self):
+        self.log.append((self.zone, 'is_ready'))
+        self.not_ready[0] -= 1
+        return self.not_ready[0] < 0
+
+    def net_radio(self, path):
+        self.log.append((self.zone, 'net_radio', path, current_priority()))
+
+    _wait_for = RXV._wait_for
+    _span = RXV._span
+    _sleep = RXV._sleep
+    tracer = None
+
+
+class TestMacro(testtools.TestCase):
+
+    def setUp(self):
+        super(TestMacro, self).setUp()
+        self.log = []
+
+    def test_steps_wait_for_conditions(self):
+        rx = FakeRXV(self.log, not_ready=2)
+        results = Macro([
+            Step('power', assign('on', True)),
+            Step('station', call('net_radio', 'Bookmarks>X'), requires=[POWER_ON, READY]),
+        ]).run(rx)
+        self.assertEqual([('Main_Zone', 'is_ready')] * 3 +
+                         [('Main_Zone', 'net_radio', 'Bookmarks>X', AUTOMATION)], self.log)
+        self.assertEqual(['power', 'station'], [r.name for r in results])
+        self.assertLess(results[0].waited, 0.05)
+        self.assertGreater(results[1].waited, 0.1)
+        self.assertEqual([None, None], [r.error for r in results])
+
+    def test_zones_run_concurrently(self):
+        main_started = threading.Event()
+        zone2_done = threading.Event()
+
+        def main_zone(rx):
+            main_started.set()
+            # only finishes if Zone_2 does not wait for us
+            self.assertTrue(zone2_done.wait(5))
+
+        def zone_2(rx):
+            main_started.wait(5)
+            zone2_done.set()
+
+        results = Macro([
+            Step('main', main_zone),
+            Step('zone 2', zone_2, zone='Zone_2'),
+            Step('after both', call('net_radio', 'X'), after=['zone 2']),
+        ]).run(FakeRXV(self.log))
+        self.assertEqual(['Main_Zone', 'Zone_2', 'Main_Zone'], [r.zone for r in results])
+        self.assertEqual([('Main_Zone', 'net_radio', 'X', AUTOMATION)], self.log)
+
+    def test_failed_step_skips_dependents(self):
+        def fail(rx):
+            raise ValueError('nope')
+
+        macro = Macro([
+            Step('fail', fail),
+            Step('skipped', assign('on', True)),
+            Step('other zone', call('net_radio', 'X'), zone='Zone_2'),
+        ])
+        rx = FakeRXV(self.log)
+        e = self.assertRaises(MacroError, macro.run, rx)
+        self.assertIsInstance(e.results[0].error, ValueError)
+        self.assertIsInstance(e.results[1].error, MacroError)
+        self.assertIsNone(e.results[2].error)
+        self.assertFalse(rx.on)
+        self.assertEqual([('Zone_2', 'net_radio', 'X', AUTOMATION)], self.log)
+
+    def test_condition_timeout(self):
+        never = Condition('never', lambda rx: False)
+        e = self.assertRaises(MacroError, Macro([
+            Step('wait', assign('on', True), requires=[never], timeout=0.2),
+        ]).run, FakeRXV(self.log))
+        self.assertIsInstance(e.results[0].error, Timeout)
+
+    def test_invalid_steps(self):
+        self.assertRaises(ValueError, Macro, [Step('a', None), Step('a', None)])
+        self.assertRaises(ValueError, Macro, [Step('a', None, after=['b'])])
+        self.assertEqual('menu ready', MENU_READY.name)
+
+    def test_cycles_are_rejected(self):
+        self.assertRaises(ValueError, Macro, [
+            Step('a', None, zone='Zone_2', after=['b']),
+            Step('b', None, zone='Main_Zone', after=['a']),
+        ])
+        self.assertRaises(ValueError, Macro, [Step('a', None, after=['a'])])
+        # b follows a in the same zone, so a cannot wait for b
+        self.assertRaises(ValueError, Macro, [
+            Step('a', None, after=['b']),
+            Step('b', None),
+        ])
+        # only a cycle once the steps without a zone run in Main_Zone
+        macro = Macro([
+            Step('a', assign('on', True), after=['b']),
+            Step('b', assign('on', True), zone='Zone_2', after=['c']),
+            Step('c', assign('on', True), zone='Main_Zone'),
+        ])
+        rx = FakeRXV(self.log)
+        rx.zone = 'Zone_3'
+        self.assertEqual(3, len(macro.run(rx)))
+        self.assertRaises(ValueError, macro.run, FakeRXV(self.log))
@@ -1,9 +1,14 @@
+import subprocess
+import sys
+import threading
+import time
 from io import open
 
 import requests_mock
 import testtools
 
 import rxv
+from rxv.history import History
 
 FAKE_IP = '10.0.0.0'
 DESC_XML = 'http://%s/YamahaRemoteControl/desc.xml' % FAKE_IP
@@ -38,3 +43,360 @@ class TestDesc(testtools.TestCase):
         self.assertEqual(len(zones), 2, zones)
         self.assertEqual(zones[0].zone, "Main_Zone")
         self.assertEqual(zones[1].zone, "Zone_2")
+
+    @requests_mock.mock()
+    def test_lazy_desc(self, m):
+        m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        rec = rxv.RXV(FAKE_IP, lazy=True)
+        self.assertEqual(m.call_count, 0)
+        self.assertEqual(rec.zones(), ["Main_Zone", "Zone_2"])
+        self.assertEqual(m.call_count, 1)
+        rec.surround_programs()
+        self.assertEqual(m.call_count, 1)
+
+
+CTRL_URL = 'http://%s/YamahaRemoteControl/ctrl' % FAKE_IP
+NO_SCENES = ('<YAMAHA_AV rsp="GET" RC="0"><Main_Zone><Config>'
+             '<Feature_Availability>Ready</Feature_Availability>'
+             '</Config></Main_Zone></YAMAHA_AV>')
+
+
+class TestMetadataCache(testtools.TestCase):
+
+    @requests_mock.mock()
+    def test_negative_caching(self, m):
+        m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        m.post(CTRL_URL, text=NO_SCENES)
+        rec = rxv.RXV(CTRL_URL)
+        self.assertFalse(rec.scenes())
+        self.assertFalse(rec.scenes())
+        self.assertEqual(1, len([r for r in m.request_history if r.method == 'POST']))
+
+    @requests_mock.mock()
+    def test_refresh(self, m):
+        m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        m.post(CTRL_URL, text=sample_content('rx-v675-inputs-resp.xml'))
+        rec = rxv.RXV(CTRL_URL)
+        self.assertIn("NET RADIO", rec.inputs())
+        rec.inputs()
+        self.assertEqual(2, m.call_count)
+        rec.refresh('scenes')
+        rec.inputs()
+        self.assertEqual(2, m.call_count)
+        rec.refresh('inputs')
+        rec.inputs()
+        self.assertEqual(3, m.call_count)
+        rec.refresh()
+        rec.inputs()
+        self.assertEqual(4, m.call_count)
+
+    @requests_mock.mock()
+    def test_ttl(self, m):
+        m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        m.post(CTRL_URL, text=sample_content('rx-v675-inputs-resp.xml'))
+        rec = rxv.RXV(CTRL_URL, cache_ttl=60)
+        rec.inputs()
+        rec.inputs()
+        self.assertEqual(2, m.call_count)
+        key, (loaded_at, value) = next(
+            (k, v) for k, v in rec._cache.items() if k[0] == 'inputs')
+        rec._cache[key] = (loaded_at - 61, value)
+        rec.inputs()
+        self.assertEqual(3, m.call_count)
+
+        # a stale value is served while it is reloaded in the background
+        rec.cache_revalidate = True
+        loaded_at, value = rec._cache[key]
+        rec._cache[key] = (loaded_at - 61, value)
+        self.assertEqual(value, rec.inputs())
+        for _ in range(100):
+            if rec._cache[key][0] > loaded_at - 61:
+                break
+            time.sleep(0.01)
+        self.assertEqual(4, m.call_count)
+
+
+VOLUME_RESPONSE = ('<YAMAHA_AV rsp="GET" RC="0"><Main_Zone><Volume><Lvl>'
+                   '<Val>-450</Val><Exp>1</Exp><Unit>dB</Unit>'
+                   '</Lvl></Volume></Main_Zone></YAMAHA_AV>')
+PUT_RESPONSE = '<YAMAHA_AV rsp="PUT" RC="0"><Main_Zone></Main_Zone></YAMAHA_AV>'
+
+
+class TestSharedRequests(testtools.TestCase):
+
+    def posts(self, m, text):
+        return len([r for r in m.request_history if text in (r.text or '')])
+
+    @requests_mock.mock()
+    def test_concurrent_gets_are_merged(self, m):
+        m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        started = threading.Event()
+
+        def slow_volume(request, context):
+            started.set()
+            time.sleep(0.2)
+            return VOLUME_RESPONSE
+
+        m.post(CTRL_URL, text=slow_volume)
+        rec = rxv.RXV(CTRL_URL)
+
+        volumes = []
+        first = threading.Thread(target=lambda: volumes.append(rec.volume))
+        first.start()
+        started.wait()
+        others = [threading.Thread(target=lambda: volumes.append(rec.volume))
+                  for _ in range(4)]
+        for thread in others:
+            thread.start()
+        for thread in [first] + others:
+            thread.join()
+
+        self.assertEqual([-45.0] * 5, volumes)
+        self.assertEqual(1, self.posts(m, '<Lvl>GetParam</Lvl>'))
+
+    @requests_mock.mock()
+    def test_response_ttl(self, m):
+        m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        m.post(CTRL_URL, text=VOLUME_RESPONSE,
+               additional_matcher=lambda r: 'GetParam' in r.text)
+        m.post(CTRL_URL, text=PUT_RESPONSE,
+               additional_matcher=lambda r: 'GetParam' not in r.text)
+        rec = rxv.RXV(CTRL_URL, response_ttl=60)
+        rec.volume
+        rec.volume
+        self.assertEqual(1, self.posts(m, '<Lvl>GetParam</Lvl>'))
+
+        # writes are never merged or cached and drop cached reads
+        rec.mute = True
+        rec.mute = True
+        self.assertEqual(2, self.posts(m, '<Mute>On</Mute>'))
+        rec.volume
+        self.assertEqual(2, self.posts(m, '<Lvl>GetParam</Lvl>'))
+
+    @requests_mock.mock()
+    def test_write_of_other_zone_drops_read_in_flight(self, m):
+        m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        state = {'volume': '-450'}
+
+        def receiver(request, context):
+            if 'GetParam' not in request.text:
+                state['volume'] = '-300'
+                return PUT_RESPONSE
+            return VOLUME_RESPONSE.replace('-450', state['volume']).replace('Main_Zone', 'Zone_2')
+
+        m.post(CTRL_URL, text=receiver)
+        rec = rxv.RXV(CTRL_URL, response_ttl=60)
+        zone2 = rec.zone_controllers()[1]
+
+        answered = threading.Event()
+        written = threading.Event()
+        post = zone2._post
+
+        def slow_post(request_text):
+            # the response arrives, the write happens before it is stored
+            response = post(request_text)
+            answered.set()
+            written.wait(5)
+            return response
+
+        zone2._post = slow_post
+        volumes = []
+        reader = threading.Thread(target=lambda: volumes.append(zone2.volume))
+        reader.start()
+        answered.wait(5)
+        rec.mute = True
+        written.set()
+        reader.join()
+        zone2._post = post
+        self.assertEqual([-45.0], volumes)
+        self.assertEqual(-30.0, zone2.volume)
+
+    @requests_mock.mock()
+    def test_no_response_cache_by_default(self, m):
+        m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        m.post(CTRL_URL, text=VOLUME_RESPONSE)
+        rec = rxv.RXV(CTRL_URL)
+        rec.volume
+        rec.volume
+        self.assertEqual(2, self.posts(m, '<Lvl>GetParam</Lvl>'))
+
+
+BASIC_STATUS_RESPONSE = (
+    '<YAMAHA_AV rsp="GET" RC="0"><Main_Zone><Basic_Status>'
+    '<Power_Control><Power>On</Power></Power_Control>'
+    '<Volume><Lvl><Val>{}</Val><Exp>1</Exp><Unit>dB</Unit></Lvl><Mute>Off</Mute></Volume>'
+    '<Input><Input_Sel>HDMI1</Input_Sel></Input>'
+    '</Basic_Status></Main_Zone></YAMAHA_AV>')
+
+
+class TestShadowState(testtools.TestCase):
+
+    def setUp(self):
+        super(TestShadowState, self).setUp()
+        self.volume = -450
+        self.m = requests_mock.Mocker()
+        self.m.start()
+        self.addCleanup(self.m.stop)
+        self.m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        self.m.post(CTRL_URL, text=self.get_volume,
+                    additional_matcher=lambda r: '<Lvl>GetParam</Lvl>' in r.text)
+        self.m.post(CTRL_URL, text=lambda r, c: BASIC_STATUS_RESPONSE.format(self.volume),
+                    additional_matcher=lambda r: 'Basic_Status' in r.text)
+        self.m.post(CTRL_URL, text=PUT_RESPONSE,
+                    additional_matcher=lambda r: 'GetParam' not in r.text)
+
+    def get_volume(self, request, context):
+        response = VOLUME_RESPONSE.replace('-450', str(self.volume))
+        if 'Zone_2' in request.text:
+            response = response.replace('Main_Zone', 'Zone_2').replace(str(self.volume), '-600')
+        return response
+
+    def posts(self, text):
+        return len([r for r in self.m.request_history if text in (r.text or '')])
+
+    def test_disabled_by_default(self):
+        rec = rxv.RXV(CTRL_URL)
+        rec.volume = -40
+        rec.volume
+        self.assertEqual(1, self.posts('<Lvl>GetParam</Lvl>'))
+
+    def test_reads_and_writes_are_mirrored(self):
+        rec = rxv.RXV(CTRL_URL, shadow_ttl=60)
+        self.assertEqual(-45.0, rec.volume)
+        self.assertEqual(-45.0, rec.volume)
+        self.assertEqual(1, self.posts('<Lvl>GetParam</Lvl>'))
+
+        rec.volume = -40.7
+        self.assertEqual(-40.5, rec.volume)
+        self.assertEqual(1, self.posts('<Lvl>GetParam</Lvl>'))
+
+        # any other write may change the volume as well
+        rec.mute = True
+        self.assertEqual(True, rec.mute)
+        self.assertEqual(-45.0, rec.volume)
+        self.assertEqual(2, self.posts('<Lvl>GetParam</Lvl>'))
+        self.assertEqual(0, self.posts('<Mute>GetParam</Mute>'))
+
+    def test_zones_are_mirrored_separately(self):
+        rec = rxv.RXV(CTRL_URL, shadow_ttl=60)
+        zone2 = rec.zone_controllers()[1]
+        rec.volume = -40
+        self.assertEqual(-40.0, rec.volume)
+        self.assertEqual(0, self.posts('<Lvl>GetParam</Lvl>'))
+        self.assertEqual(-60.0, zone2.volume)
+        self.assertEqual(1, self.posts('<Lvl>GetParam</Lvl>'))
+
+    def test_reconcile(self):
+        rec = rxv.RXV(CTRL_URL, shadow_ttl=60)
+        rec.volume = -40
+        # changed on the front panel
+        self.volume = -300
+        self.assertEqual(-40.0, rec.volume)
+        self.assertEqual(['volume'], rec.reconcile())
+        self.assertEqual(-30.0, rec.volume)
+        self.assertEqual('HDMI1', rec.input)
+        self.assertEqual([], rec.reconcile())
+        self.assertEqual(0, self.posts('<Lvl>GetParam</Lvl>'))
+        self.assertEqual(0, self.posts('<Input_Sel>GetParam</Input_Sel>'))
+
+    def test_background_reconcile(self):
+        rec = rxv.RXV(CTRL_URL, shadow_ttl=60)
+        rec.volume = -40
+        self.volume = -300
+        rec.start_reconciling(0.01)
+        self.addCleanup(rec.stop_reconciling)
+        for _ in range(100):
+            if rec.volume == -30.0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(-30.0, rec.volume)
+
+
+def zone_status(zone, volume):
+    return BASIC_STATUS_RESPONSE.format(volume).replace(
+        'Main_Zone', zone)[len('<YAMAHA_AV rsp="GET" RC="0">'):-len('</YAMAHA_AV>')]
+
+
+class TestZonesStatus(testtools.TestCase):
+
+    def setUp(self):
+        super(TestZonesStatus, self).setUp()
+        self.m = requests_mock.Mocker()
+        self.m.start()
+        self.addCleanup(self.m.stop)
+        self.m.get(DESC_XML, text=sample_content('rx-v675-desc.xml'))
+        self.multi_zone = True
+        self.multi_zone_rc = '4'
+        self.m.post(CTRL_URL, text=self.basic_status)
+
+    def basic_status(self, request, context):
+        zones = [zone for zone in ('Main_Zone', 'Zone_2') if '<%s>' % zone in request.text]
+        if len(zones) > 1 and not self.multi_zone:
+            return '<YAMAHA_AV rsp="GET" RC="%s"></YAMAHA_AV>' % self.multi_zone_rc
+        body = ''.join(zone_status(zone, -450 if zone == 'Main_Zone' else -300)
+                       for zone in zones)
+        return '<YAMAHA_AV rsp="GET" RC="0">%s</YAMAHA_AV>' % body
+
+    def test_single_request(self):
+        rec = rxv.RXV(CTRL_URL)
+        statuses = rec.zones_status()
+        self.assertEqual({
+            'Main_Zone': rxv.rxv.BasicStatus('On', -45.0, 'Off', 'HDMI1'),
+            'Zone_2': rxv.rxv.BasicStatus('On', -30.0, 'Off', 'HDMI1'),
+        }, statuses)
+        self.assertEqual(1, len(self.m.request_history) - 1)
+        self.assertEqual(statuses['Main_Zone'], rec.basic_status)
+
+    def test_fallback(self):
+        self.multi_zone = False
+        rec = rxv.RXV(CTRL_URL)
+        self.assertEqual(-30.0, rec.zones_status()['Zone_2'].volume)
+        self.assertEqual(3, len(self.m.request_history) - 1)
+        # not tried again
+        self.assertEqual(-45.0, rec.zones_status()['Main_Zone'].volume)
+        self.assertEqual(5, len(self.m.request_history) - 1)
+
+    def test_transient_error_is_not_remembered(self):
+        self.multi_zone = False
+        self.multi_zone_rc = '1'
+        rec = rxv.RXV(CTRL_URL)
+        self.assertEqual(-30.0, rec.zones_status()['Zone_2'].volume)
+        self.assertEqual(3, len(self.m.request_history) - 1)
+        self.multi_zone = True
+        rec.zones_status()
+        self.assertEqual(4, len(self.m.request_history) - 1)
+
+    def test_fills_mirror(self):
+        rec = rxv.RXV(CTRL_URL, shadow_ttl=60)
+        zone2 = rec.zone_controllers()[1]
+        rec.zones_status()
+        self.assertEqual(-45.0, rec.volume)
+        self.assertEqual(-30.0, zone2.volume)
+        self.assertEqual(1, len(self.m.request_history) - 1)
+
+    def test_records_history(self):
+        history = History()
+        rec = rxv.RXV(CTRL_URL, history=history)
+        rec.zones_status()
+        rec.basic_status
+        self.assertEqual(2, len(history))
+        self.assertEqual(-30.0, history.state_at('Zone_2', time.time()).volume)
+        self.assertEqual('HDMI1', history.state_at('Main_Zone', time.time()).input)
+
+
+class TestImport(testtools.TestCase):
+
+    def test_import_is_lightweight(self):
+        # guards the startup time of short lived scripts, see
+        # tests/bench_import.py for timings
+        code = ('import sys, rxv; '
+                'print(" ".join(m for m in ("requests", "rxv.gateway", "rxv.events") '
+                'if m in sys.modules))')
+        heavy = subprocess.check_output([sys.executable, '-c', code]).decode().strip()
+        self.assertEqual('', heavy)
+
+    def test_ssdp_attribute(self):
+        # in a fresh interpreter, nothing else has imported rxv.ssdp yet
+        code = 'import rxv; print(rxv.ssdp.discover.__name__)'
+        name = subprocess.check_output([sys.executable, '-c', code]).decode().strip()
+        self.assertEqual('discover', name)
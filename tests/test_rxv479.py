@@ -1,6 +1,7 @@
 import testtools
 import rxv
 import requests_mock
+import threading
 import time
 from tests.menu_list_fakes import MenuListHandler
 
@@ -147,3 +148,198 @@ class TestRXV479(testtools.TestCase):
 
         rec = rxv.RXV(FAKE_IP)
         self.assertRaises(FileNotFoundError, rec.server_select, "Fancy Server>Radio>Stream 66")
+
+    @requests_mock.mock()
+    def test_browse(self, m):
+        menu_list_handler = MenuListHandler()
+        m.add_matcher(lambda r: menu_list_handler.match(r))
+
+        m.get(DESC_XML_URI, text=sample_content('rx-v479-desc.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel_Item>GetParam</Input_Sel_Item>'), text=sample_content('rx-v479/get_inputs.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel>GetParam</Input_Sel>'), text=sample_content('rx-v479/get_current_input_SERVER.xml'))
+
+        rec = rxv.RXV(FAKE_IP)
+        browser = rec.browse(prefetch=False)
+        self.assertEqual(1, len([r for r in m.request_history
+                                 if match_request(r, '<Input_Sel>GetParam</Input_Sel>')]))
+        self.assertEqual("SERVER", browser.page().name)
+
+        page = browser.select(1)
+        self.assertEqual("Fancy Server", page.name)
+        page = browser.select(2)
+        self.assertEqual("Radio", page.name)
+        self.assertEqual(1, page.current_line)
+        self.assertEqual("Stream 1", page.current_list.all["Line_1"])
+
+        page = browser.next_page()
+        self.assertEqual(9, page.current_line)
+        self.assertEqual("Stream 9", page.current_list.all["Line_1"])
+
+        # served from the cache, the receiver stays on the second page
+        page = browser.previous_page()
+        self.assertEqual("Stream 1", page.current_list.all["Line_1"])
+        self.assertEqual(9, menu_list_handler.current_line)
+
+        page = browser.page(20)
+        self.assertEqual(17, page.current_line)
+        self.assertEqual("Stream 17", page.current_list.all["Line_1"])
+
+        page = browser.home()
+        self.assertEqual("SERVER", page.name)
+
+    @requests_mock.mock()
+    def test_browse_prefetch(self, m):
+        menu_list_handler = MenuListHandler()
+        m.add_matcher(lambda r: menu_list_handler.match(r))
+
+        m.get(DESC_XML_URI, text=sample_content('rx-v479-desc.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel_Item>GetParam</Input_Sel_Item>'), text=sample_content('rx-v479/get_inputs.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel>GetParam</Input_Sel>'), text=sample_content('rx-v479/get_current_input_SERVER.xml'))
+
+        rec = rxv.RXV(FAKE_IP)
+        browser = rec.browse()
+        browser.select(1)
+        browser.select(2)
+        browser._prefetcher.join()
+        # the next page has been read ahead
+        self.assertIsNotNone(browser._cached(9))
+        calls = m.call_count
+        page = browser.next_page()
+        self.assertEqual("Stream 9", page.current_list.all["Line_1"])
+        browser._prefetcher.join()
+        self.assertEqual(17, menu_list_handler.current_line)
+        page = browser.next_page()
+        self.assertEqual("Stream 17", page.current_list.all["Line_1"])
+        browser._prefetcher.join()
+        # only the read ahead of the third page hit the receiver
+        self.assertEqual(calls + 2, m.call_count)
+
+    @requests_mock.mock()
+    def test_browse_prefetch_keeps_latest_request(self, m):
+        menu_list_handler = MenuListHandler()
+        m.add_matcher(lambda r: menu_list_handler.match(r))
+
+        m.get(DESC_XML_URI, text=sample_content('rx-v479-desc.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel_Item>GetParam</Input_Sel_Item>'), text=sample_content('rx-v479/get_inputs.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel>GetParam</Input_Sel>'), text=sample_content('rx-v479/get_current_input_SERVER.xml'))
+
+        rec = rxv.RXV(FAKE_IP)
+        browser = rec.browse()
+        browser.select(1)
+        browser.select(2)
+        browser._prefetcher.join()
+        browser.invalidate()
+
+        fetched = []
+        release = threading.Event()
+
+        def fetch(first_line):
+            fetched.append(first_line)
+            release.wait(5)
+
+        browser._fetch = fetch
+        browser.first_line = 9
+        browser._start_prefetch()
+        while not fetched:
+            time.sleep(0.01)
+        # paged on while the prefetcher is busy
+        browser.first_line = 17
+        browser._start_prefetch()
+        release.set()
+        browser._prefetcher.join()
+        self.assertEqual([17, 1, 9], fetched)
+
+    @requests_mock.mock()
+    def test_iter_server_paths(self, m):
+        menu_list_handler = MenuListHandler()
+        m.add_matcher(lambda r: menu_list_handler.match(r))
+
+        m.get(DESC_XML_URI, text=sample_content('rx-v479-desc.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel>GetParam</Input_Sel>'), text=sample_content('rx-v479/get_current_input_SERVER.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel_Item>GetParam</Input_Sel_Item>'), text=sample_content('rx-v479/get_inputs.xml'))
+
+        rec = rxv.RXV(FAKE_IP)
+        paths = rec.server_paths()
+        streamed = list(rec.iter_server_paths())
+        self.assertEqual(sorted(paths), sorted(streamed))
+        self.assertEqual(("Fancy Server>Music>Some Performer>Song Title 1", "1>1>1>1"), streamed[0])
+        self.assertEqual(("Other Server>Nothing to see here", "2>1"), streamed[-1])
+
+        # depth limited crawl below a subtree
+        self.assertEqual(
+            [("Fancy Server>Some Fancy Song {}".format(i), "1>{}".format(i + 2)) for i in range(1, 8)],
+            list(rec.iter_server_paths(root=[1], max_depth=1)))
+        self.assertEqual(
+            [("Fancy Server>Radio>Stream 20", "1>2>20")],
+            list(rec.iter_server_paths(root="1>2", resume_after="1>2>19")))
+
+        # resuming yields exactly the rest of the crawl
+        resumed = list(rec.iter_server_paths(resume_after="1>2>17"))
+        self.assertEqual(streamed[streamed.index(("Fancy Server>Radio>Stream 17", "1>2>17")) + 1:], resumed)
+
+        # the first page is yielded before the next one is read, after
+        # walking down to root once
+        count = len(m.request_history)
+        paths = rec.iter_server_paths(root="1>2")
+        self.assertEqual(("Fancy Server>Radio>Stream 1", "1>2>1"), next(paths))
+        requests = [r.text for r in m.request_history[count:]]
+        self.assertEqual(1, len([text for text in requests if 'Return to Home' in text]))
+        self.assertFalse([text for text in requests if '<Jump_Line>9</Jump_Line>' in text])
+        self.assertEqual(19, len(list(paths)))
+
+    def _mock_net_radio(self, m):
+        # the fake SERVER menu stands in for the NET RADIO one
+        menu_list_handler = MenuListHandler()
+        m.add_matcher(lambda r: menu_list_handler.match(r))
+        m.get(DESC_XML_URI, text=sample_content('rx-v479-desc.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel_Item>GetParam</Input_Sel_Item>'), text=sample_content('rx-v479/get_inputs.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel>NET RADIO</Input_Sel>'), text=sample_content('rx-v479/set_input_SERVER.xml'))
+        return menu_list_handler
+
+    @requests_mock.mock()
+    def test_net_radio(self, m):
+        menu_list_handler = self._mock_net_radio(m)
+        rec = rxv.RXV(FAKE_IP)
+        rec.net_radio("Fancy Server>Radio>Stream 17")
+        self.assertEqual((4, "Stream 17"), menu_list_handler.selected)
+        jumps = [r.text for r in m.request_history if 'Jump_Line' in (r.text or '')]
+        self.assertEqual(2, len(jumps))
+
+        # played again, the known lines are selected directly
+        count = len(m.request_history)
+        rec.net_radio("Fancy Server>Radio>Stream 17")
+        self.assertEqual((4, "Stream 17"), menu_list_handler.selected)
+        requests = [r.text for r in m.request_history[count:]]
+        jumps = [text for text in requests if 'Jump_Line' in text]
+        self.assertEqual(1, len(jumps))
+        self.assertIn('<Jump_Line>17</Jump_Line>', jumps[0])
+        self.assertEqual(11, len(requests))
+        # the menu is ready after the input change before going home
+        home = [i for i, text in enumerate(requests) if 'Return to Home' in text][0]
+        self.assertIn('<List_Info>GetParam</List_Info>', requests[home - 1])
+        self.assertIn('<Input_Sel>NET RADIO</Input_Sel>', requests[home - 2])
+
+    @requests_mock.mock()
+    def test_net_radio_menu_changed(self, m):
+        menu_list_handler = self._mock_net_radio(m)
+        rec = rxv.RXV(FAKE_IP)
+        rec.net_radio("Fancy Server>Music>Some Performer>Song Title 2")
+        self.assertEqual((4, "Song Title 2"), menu_list_handler.selected)
+
+        # Radio and Music swapped places
+        items = menu_list_handler.items[(2, 'Fancy Server')]
+        items[1], items[2] = items[2], items[1]
+        responses = menu_list_handler.responses
+        page = responses[(2, 'Fancy Server')][range(1, 9)]
+        responses[(2, 'Fancy Server')][range(1, 9)] = page.replace(
+            'Music', 'Swap').replace('Radio', 'Music').replace('Swap', 'Radio')
+        rec.net_radio("Fancy Server>Music>Some Performer>Song Title 2")
+        self.assertEqual((4, "Song Title 2"), menu_list_handler.selected)
+        self.assertEqual((1, 2, 1, 2), rec._cache[('net_radio_lines', None)][1][
+            "Fancy Server>Music>Some Performer>Song Title 2"])
+
+    @requests_mock.mock()
+    def test_net_radio_path_not_available(self, m):
+        self._mock_net_radio(m)
+        rec = rxv.RXV(FAKE_IP)
+        self.assertRaises(FileNotFoundError, rec.net_radio, "Fancy Server>Radio>Stream 66")
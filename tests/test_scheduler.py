@@ -0,0 +1,115 @@
+import threading
+import time
+
+import requests_mock
+import testtools
+
+import rxv
+from rxv.scheduler import (AUTOMATION, CRAWL, INTERACTIVE, POLL, Scheduler,
+                           current_priority, iter_at_priority, priority)
+
+CTRL_URL = 'http://10.0.0.2/YamahaRemoteControl/ctrl'
+VOLUME_RESPONSE = ('<YAMAHA_AV rsp="GET" RC="0"><Main_Zone><Volume><Lvl>'
+                   '<Val>-450</Val><Exp>1</Exp><Unit>dB</Unit>'
+                   '</Lvl></Volume></Main_Zone></YAMAHA_AV>')
+PUT_RESPONSE = '<YAMAHA_AV rsp="PUT" RC="0"><Main_Zone></Main_Zone></YAMAHA_AV>'
+
+
+def wait_until(predicate):
+    for _ in range(200):
+        if predicate():
+            return
+        time.sleep(0.005)
+    raise AssertionError("timed out")
+
+
+class TestScheduler(testtools.TestCase):
+
+    def setUp(self):
+        super(TestScheduler, self).setUp()
+        self.scheduler = Scheduler()
+        self.order = []
+        self.threads = []
+
+    def enqueue(self, name, level, client=None):
+        """Start a thread waiting for a slot, returns once it is queued."""
+        waiting = sum(self.scheduler.waiting())
+
+        def run():
+            with priority(level):
+                with self.scheduler.slot(client):
+                    self.order.append(name)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.threads.append(thread)
+        wait_until(lambda: sum(self.scheduler.waiting()) == waiting + 1)
+
+    def finish(self):
+        self.scheduler.release()
+        for thread in self.threads:
+            thread.join()
+
+    def test_free_slot(self):
+        with self.scheduler.slot():
+            self.assertEqual([0, 0, 0, 0], self.scheduler.waiting())
+        with self.scheduler.slot():
+            pass
+
+    def test_priority_classes(self):
+        self.scheduler.acquire()
+        self.enqueue('crawl', CRAWL)
+        self.enqueue('poll', POLL)
+        self.enqueue('automation', AUTOMATION)
+        self.enqueue('interactive', INTERACTIVE)
+        self.assertEqual([1, 1, 1, 1], self.scheduler.waiting())
+        self.finish()
+        self.assertEqual(['interactive', 'automation', 'poll', 'crawl'], self.order)
+
+    def test_clients_take_turns(self):
+        self.scheduler.acquire()
+        self.enqueue('a1', POLL, 'a')
+        self.enqueue('a2', POLL, 'a')
+        self.enqueue('a3', POLL, 'a')
+        self.enqueue('b1', POLL, 'b')
+        self.finish()
+        self.assertEqual(['a1', 'b1', 'a2', 'a3'], self.order)
+
+    def test_iter_at_priority(self):
+        def levels():
+            for _ in range(2):
+                yield current_priority()
+
+        seen = []
+        for level in iter_at_priority(CRAWL, levels()):
+            seen.append((level, current_priority()))
+        self.assertEqual([(CRAWL, INTERACTIVE)] * 2, seen)
+
+
+class TestRXVScheduling(testtools.TestCase):
+
+    @requests_mock.mock()
+    def test_interactive_overtakes_crawl(self, m):
+        m.post(CTRL_URL, text=VOLUME_RESPONSE, additional_matcher=lambda r: 'GetParam' in r.text)
+        m.post(CTRL_URL, text=PUT_RESPONSE, additional_matcher=lambda r: 'GetParam' not in r.text)
+        rec = rxv.RXV(CTRL_URL, lazy=True)
+        scheduler = rec._scheduler
+        # a request of some other client is on the wire
+        scheduler.acquire()
+
+        def crawl():
+            with priority(CRAWL):
+                rec.volume
+
+        crawler = threading.Thread(target=crawl)
+        crawler.start()
+        wait_until(lambda: scheduler.waiting()[CRAWL] == 1)
+        button = threading.Thread(target=lambda: setattr(rec, 'mute', True))
+        button.start()
+        wait_until(lambda: scheduler.waiting()[INTERACTIVE] == 1)
+        scheduler.release()
+        crawler.join()
+        button.join()
+
+        self.assertIn('<Mute>On</Mute>', m.request_history[0].text)
+        self.assertIn('<Lvl>GetParam</Lvl>', m.request_history[1].text)
@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import tempfile
+
+import requests_mock
+import testtools
+
+import rxv
+from rxv.tracing import HTTP, OPERATION, PARSE, WAIT, Tracer
+from tests.menu_list_fakes import MenuListHandler
+
+FAKE_IP = '10.0.0.0'
+DESC_XML_URI = 'http://%s/YamahaRemoteControl/desc.xml' % FAKE_IP
+CTRL_URI = 'http://%s/YamahaRemoteControl/ctrl' % FAKE_IP
+
+
+def sample_content(name):
+    with open('tests/samples/%s' % name, encoding='utf-8') as f:
+        return f.read()
+
+
+def match_request(request, text_match):
+    return text_match in (request.text or '')
+
+
+class TestTracer(testtools.TestCase):
+
+    def test_nesting(self):
+        tracer = Tracer()
+        with tracer.span('outer', path='A>B'):
+            with tracer.span('inner', HTTP):
+                pass
+            with tracer.span('sleep', WAIT):
+                pass
+        inner, sleep, outer = tracer.spans()
+        self.assertEqual(('outer', OPERATION, None, {'path': 'A>B'}),
+                         (outer.name, outer.category, outer.parent, outer.args))
+        self.assertEqual(outer.id, inner.parent)
+        self.assertEqual(outer.id, sleep.parent)
+        self.assertLessEqual(outer.start, inner.start)
+        self.assertGreaterEqual(outer.duration, inner.duration + sleep.duration)
+
+    def test_error(self):
+        tracer = Tracer()
+
+        def fail():
+            with tracer.span('failing'):
+                raise KeyError('x')
+
+        self.assertRaises(KeyError, fail)
+        self.assertEqual({'error': 'KeyError'}, tracer.spans()[0].args)
+        with tracer.span('next'):
+            pass
+        self.assertIsNone(tracer.spans()[1].parent)
+
+    def test_max_spans(self):
+        tracer = Tracer(max_spans=2)
+        for name in 'abc':
+            with tracer.span(name):
+                pass
+        self.assertEqual(['b', 'c'], [span.name for span in tracer.spans()])
+
+    def test_chrome_trace(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        filename = os.path.join(tmpdir, 'trace.json')
+        tracer = Tracer()
+        with tracer.span('outer', indices=[1, 2]):
+            with tracer.span('inner', HTTP):
+                pass
+        tracer.save(filename)
+
+        with open(filename) as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual(['M', 'X', 'X'], sorted(event['ph'] for event in events))
+        spans = dict((event['name'], event) for event in events if event['ph'] == 'X')
+        self.assertEqual('[1, 2]', spans['outer']['args']['indices'])
+        self.assertEqual(HTTP, spans['inner']['cat'])
+        self.assertLessEqual(spans['outer']['ts'], spans['inner']['ts'])
+
+
+class TestTracedOperations(testtools.TestCase):
+
+    @requests_mock.mock()
+    def test_server_select(self, m):
+        menu_list_handler = MenuListHandler()
+        m.add_matcher(lambda r: menu_list_handler.match(r))
+        m.get(DESC_XML_URI, text=sample_content('rx-v479-desc.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel_Item>GetParam</Input_Sel_Item>'), text=sample_content('rx-v479/get_inputs.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel>SERVER</Input_Sel>'), text=sample_content('rx-v479/set_input_SERVER.xml'))
+        m.post(CTRL_URI, additional_matcher=lambda r: match_request(r, '<Input_Sel>GetParam</Input_Sel>'), text=sample_content('rx-v479/get_current_input_SERVER.xml'))
+
+        tracer = Tracer()
+        rec = rxv.RXV(FAKE_IP, tracer=tracer)
+        rec.server_select([1, 2, 17])
+
+        spans = tracer.spans()
+        root = spans[-1]
+        self.assertEqual(('server_select', None), (root.name, root.parent))
+        by_id = dict((span.id, span) for span in spans)
+
+        def ancestors(span):
+            while span.parent is not None:
+                span = by_id[span.parent]
+                yield span
+
+        posts = [span for span in spans if span.category == HTTP]
+        self.assertEqual(len(m.request_history) - 1, len(posts))
+        self.assertIn('PUT Main_Zone,Input,Input_Sel', [span.args['request'] for span in posts])
+        for span in spans[:-1]:
+            self.assertIs(root, list(ancestors(span))[-1])
+        self.assertEqual(len(posts), len([s for s in spans if s.category == PARSE]))
+        self.assertIn('wait_for', [s.name for s in spans])
+        self.assertGreaterEqual(root.duration, sum(s.duration for s in posts))
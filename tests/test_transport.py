@@ -0,0 +1,215 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import requests_mock
+import testtools
+
+import rxv
+from rxv.exceptions import TraceMismatch
+from rxv.transport import (RecordingTransport, ReplayTransport, SocketTransport,
+                           iter_trace_file)
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+VOLUME_RESPONSE = ('<YAMAHA_AV rsp="GET" RC="0"><Main_Zone><Volume><Lvl>'
+                   '<Val>-450</Val><Exp>1</Exp><Unit>dB</Unit>'
+                   '</Lvl></Volume></Main_Zone></YAMAHA_AV>').encode('utf-8')
+
+
+def sample_content(name):
+    with open('tests/samples/%s' % name, 'rb') as f:
+        return f.read()
+
+
+class FakeReceiver(ThreadingMixIn, HTTPServer):
+    """Keep-alive HTTP server answering every POST with VOLUME_RESPONSE."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+        self.connections = 0
+        self.requests = []
+        self.chunked = False
+        # close the connection after this many requests on it
+        self.max_keep_alive = None
+        # hang up on the next request without answering it
+        self.hang_up = False
+
+    @property
+    def ctrl_url(self):
+        return 'http://127.0.0.1:{}/YamahaRemoteControl/ctrl'.format(self.server_address[1])
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+        self.served = 0
+
+    def do_GET(self):
+        body = sample_content('rx-v675-desc.xml')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, body))
+        self.served += 1
+        if self.server.hang_up:
+            self.server.hang_up = False
+            self.close_connection = True
+            return
+        self.send_response(200)
+        if self.server.max_keep_alive and self.served >= self.server.max_keep_alive:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        if self.server.chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(VOLUME_RESPONSE), 10):
+                chunk = VOLUME_RESPONSE[i:i + 10]
+                self.wfile.write('{:x}\r\n'.format(len(chunk)).encode('ascii') + chunk + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            self.send_header('Content-Length', str(len(VOLUME_RESPONSE)))
+            self.end_headers()
+            self.wfile.write(VOLUME_RESPONSE)
+
+
+class TestSocketTransport(testtools.TestCase):
+
+    def setUp(self):
+        super(TestSocketTransport, self).setUp()
+        self.server = FakeReceiver()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.transport = SocketTransport(timeout=5)
+        self.addCleanup(self.transport.close)
+
+    def test_reuses_connection(self):
+        for _ in range(3):
+            self.assertEqual(VOLUME_RESPONSE, self.transport.post(self.server.ctrl_url, '<x/>'))
+        self.assertEqual(1, self.server.connections)
+        self.assertEqual(('/YamahaRemoteControl/ctrl', b'<x/>'), self.server.requests[0])
+
+    def test_reconnects_after_close(self):
+        self.server.max_keep_alive = 1
+        for _ in range(3):
+            self.assertEqual(VOLUME_RESPONSE, self.transport.post(self.server.ctrl_url, '<x/>'))
+        self.assertEqual(3, self.server.connections)
+
+    def test_reconnects_stale_connection(self):
+        self.transport.post(self.server.ctrl_url, '<x/>')
+        # the receiver drops idle connections behind our back
+        for sock in self.transport._sockets.values():
+            sock.shutdown(2)
+        self.assertEqual(VOLUME_RESPONSE, self.transport.post(self.server.ctrl_url, '<x/>'))
+        self.assertEqual(2, self.server.connections)
+
+    def test_resends_get_after_hang_up(self):
+        self.transport.post(self.server.ctrl_url, '<x/>')
+        self.server.hang_up = True
+        get = '<YAMAHA_AV cmd="GET"><Main_Zone><Volume><Lvl>GetParam</Lvl></Volume></Main_Zone></YAMAHA_AV>'
+        self.assertEqual(VOLUME_RESPONSE, self.transport.post(self.server.ctrl_url, get))
+        self.assertEqual(3, len(self.server.requests))
+
+    def test_no_resend_of_put_after_hang_up(self):
+        self.transport.post(self.server.ctrl_url, '<x/>')
+        self.server.hang_up = True
+        put = '<YAMAHA_AV cmd="PUT"><Main_Zone><Volume><Up_Down>Up</Up_Down></Volume></Main_Zone></YAMAHA_AV>'
+        self.assertRaises(IOError, self.transport.post, self.server.ctrl_url, put)
+        self.assertEqual(2, len(self.server.requests))
+        # the next request opens a fresh connection
+        self.assertEqual(VOLUME_RESPONSE, self.transport.post(self.server.ctrl_url, put))
+
+    def test_chunked(self):
+        self.server.chunked = True
+        self.assertEqual(VOLUME_RESPONSE, self.transport.post(self.server.ctrl_url, '<x/>'))
+        self.assertEqual(VOLUME_RESPONSE, self.transport.post(self.server.ctrl_url, '<x/>'))
+        self.assertEqual(1, self.server.connections)
+
+    def test_rxv(self):
+        rec = rxv.RXV(self.server.ctrl_url, transport=self.transport)
+        self.assertEqual(-45.0, rec.volume)
+        self.assertIn(b'<Volume><Lvl>GetParam</Lvl></Volume>', self.server.requests[0][1])
+        # desc.xml and the control request share the connection
+        self.assertEqual(1, self.server.connections)
+
+
+class TestRecordReplay(testtools.TestCase):
+
+    def setUp(self):
+        super(TestRecordReplay, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.trace = os.path.join(self.tmpdir, 'session.trace.gz')
+
+    @requests_mock.mock()
+    def record(self, m, delay=0):
+        volumes = [VOLUME_RESPONSE, VOLUME_RESPONSE.replace(b'-450', b'-400')]
+        m.get('http://10.0.0.0/YamahaRemoteControl/desc.xml',
+              content=sample_content('rx-v675-desc.xml'))
+        m.post('http://10.0.0.0/YamahaRemoteControl/ctrl',
+               content=lambda r, c: time.sleep(delay) or (
+                   volumes.pop(0) if len(volumes) > 1 else volumes[0]))
+        transport = RecordingTransport(self.trace)
+        rec = rxv.RXV('http://10.0.0.0/YamahaRemoteControl/ctrl', transport=transport)
+        volumes = [rec.volume, rec.volume, rec.volume]
+        transport.close()
+        return volumes
+
+    def test_replay(self):
+        self.assertEqual([-45.0, -40.0, -40.0], self.record())
+        header, exchanges = iter_trace_file(self.trace)
+        self.assertEqual('rxv-trace', header['format'])
+        exchanges = list(exchanges)
+        self.assertEqual(['GET', 'POST', 'POST', 'POST'], [e['method'] for e in exchanges])
+        self.assertEqual(0, exchanges[0]['start'])
+
+        # another address, and more requests than were recorded
+        rec = rxv.RXV('http://10.0.0.1/YamahaRemoteControl/ctrl',
+                      transport=ReplayTransport(self.trace))
+        self.assertEqual([-45.0, -40.0, -40.0, -40.0], [rec.volume for _ in range(4)])
+        self.assertRaises(TraceMismatch, getattr, rec, 'on')
+
+    def test_replay_speed(self):
+        self.record(delay=0.1)
+        rec = rxv.RXV('http://10.0.0.0/YamahaRemoteControl/ctrl',
+                      transport=ReplayTransport(self.trace), lazy=True)
+        started = time.time()
+        rec.volume
+        self.assertLess(time.time() - started, 0.1)
+
+        rec = rxv.RXV('http://10.0.0.0/YamahaRemoteControl/ctrl',
+                      transport=ReplayTransport(self.trace, speed=1.0), lazy=True)
+        started = time.time()
+        rec.volume
+        self.assertGreaterEqual(time.time() - started, 0.1)
+
+    def test_not_a_trace(self):
+        filename = os.path.join(self.tmpdir, 'broken')
+        with open(filename, 'wb') as f:
+            f.write(b'nope')
+        self.assertRaises(ValueError, ReplayTransport, filename)